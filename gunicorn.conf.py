@@ -0,0 +1,45 @@
+"""
+Production server configuration: gunicorn -c gunicorn.conf.py
+
+Loads and warms the models once in the master and forks workers that
+share them copy-on-write (see src/prefork.py). Send HUP for a graceful
+restart of the workers (they finish in-flight requests first) and USR2
+followed by TERM to the old master to upgrade the code without downtime.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import config
+import prefork
+
+wsgi_app = 'app:app'
+pythonpath = 'src'
+bind = f'{config.HOST}:{config.PORT}'
+preload_app = True
+
+workers = prefork.worker_count()
+# Threads per worker for concurrent requests; inference threads are sized separately
+worker_class = 'gthread'
+threads = config.PREFORK_REQUEST_THREADS
+
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then, staggered so they do not all restart at once
+max_requests = config.PREFORK_MAX_REQUESTS
+max_requests_jitter = max(1, config.PREFORK_MAX_REQUESTS // 10) if config.PREFORK_MAX_REQUESTS else 0
+
+
+def on_starting(server):
+    # Runs in the master after the app is preloaded and before any fork
+    prefork.preload(server.cfg.workers)
+
+
+def when_ready(server):
+    prefork.report_memory_later(server)
+
+
+def post_fork(server, worker):
+    prefork.after_fork(server.cfg.workers)
@@ -10,14 +10,32 @@ import os
 src_dir = os.path.join(os.path.dirname(__file__), 'src')
 sys.path.insert(0, src_dir)
 
-from app import app
+import config
+from app import app, prerender_catalog, warmup_models
 
 if __name__ == '__main__':
+    config.ensure_directories()
+    config.print_banner()
+    asgi_mode = '--asgi' in sys.argv[1:]
+    if config.WARMUP_ON_STARTUP and not asgi_mode:
+        # Serve /healthz right away; /readyz turns 200 once warmup finishes
+        warmup_models(background=True)
+    if config.CATALOG_PRERENDER and not asgi_mode:
+        prerender_catalog(background=True)
+
     print("\n" + "="*60)
     print("  PERSONALIZED AI FASHION RECOMMENDATION")
     print("="*60)
     print("  Starting Flask Application...")
     print("  Access the app at: http://127.0.0.1:5000")
     print("="*60 + "\n")
-    
-    app.run(debug=False, host='127.0.0.1', port=5000, use_reloader=False)
+
+    if asgi_mode:
+        # Bounded inference executor with load shedding; warms up on startup, see src/asgi.py
+        try:
+            import uvicorn
+        except ImportError:
+            sys.exit("✗ ASGI mode needs uvicorn: pip install uvicorn")
+        uvicorn.run('asgi:app', host='127.0.0.1', port=5000, app_dir=src_dir)
+    else:
+        app.run(debug=False, host='127.0.0.1', port=5000, use_reloader=False)
@@ -1,17 +1,38 @@
-from io import BytesIO
-from flask import Flask, jsonify, request, render_template, send_file, session
+from flask import Flask, Response, g, jsonify, request, render_template, send_file, session, stream_with_context
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 import cv2
 import numpy as np
 import json
 import base64
-from PIL import Image
-from tensorflow.keras.preprocessing.image import img_to_array # type: ignore
+import atexit
 import os
-import requests
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-import tensorflow as tf
+import threading
+import time
+from concurrent.futures import Future
+from functools import wraps
+
+import config
+from utils.batching import MicroBatcher
+from utils.gender_backends import load_gender_backend
+from utils.metrics import (
+    BATCH_SIZE, QUEUE_WAIT_SECONDS, REGISTRY, REQUEST_SECONDS, REQUESTS_TOTAL, stage_timer
+)
+from utils.model_loader import load_face_detection_model
+from utils.model_registry import ModelRegistry
+from utils.profiling import ProfileStore, RequestProfiler, is_trusted_address, token_matches
+from utils.image_decode import ImageDecodeError, data_url_to_bytes, decode_image
+from utils.batch_upload import collect_batch_images
+from utils.inference_pool import InferencePool, InferenceWorkerError
+from utils.image_processor import IMAGE_MODES, analyze_faces, analyze_faces_batch, render_face_image
+from utils.assets import ASSET_MIMETYPES, ASSET_NAME_PATTERN, manifest_path
+from utils.catalog_store import FILTER_FIELDS, CatalogStore
+from utils.exports import ExportCache, ExportUnavailableError
+from utils.http_cache import FAST_LEVELS, Payload, etag_matches, json_with_fragments
+from utils.result_cache import ResultCache, content_key, perceptual_key
+from utils.result_store import DiskResultStore, ResultStore
+from utils.skin_tone import HUE_LABELS
+from utils.stub_models import StubFaceNet, StubGenderModel
 
 # Get the directory where the script is located
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -19,203 +40,437 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 # Create Flask app - No static or template folder for React
 app = Flask(__name__)
 CORS(app)
+if config.TRUSTED_PROXY_COUNT:
+    # Client address and scheme from the X-Forwarded-* headers of that many proxies
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=config.TRUSTED_PROXY_COUNT, x_proto=config.TRUSTED_PROXY_COUNT)
 app.secret_key = 'your_secret_key'  # Set a secret key for session management
+# Base64 form fields are ~4/3 the size of the image they carry
+SINGLE_IMAGE_MAX_CONTENT_LENGTH = config.MAX_FILE_SIZE * 4 // 3 + 64 * 1024
+app.config['MAX_CONTENT_LENGTH'] = max(SINGLE_IMAGE_MAX_CONTENT_LENGTH, config.BATCH_MAX_TOTAL_BYTES + 64 * 1024)
+
+@app.before_request
+def limit_request_size():
+    # Only the batch endpoint may use the full MAX_CONTENT_LENGTH
+    if request.endpoint != 'detect_faces_batch' and (request.content_length or 0) > SINGLE_IMAGE_MAX_CONTENT_LENGTH:
+        return jsonify({'error': 'Request too large'}), 413
+
+# Clothing catalog, compiled to SQLite and reloaded when the JSON file changes
+def load_catalog():
+    source = config.CATALOG_SOURCE
+    if not os.path.exists(source):
+        # Fallback to src directory
+        source = os.path.join(SCRIPT_DIR, 'clothing_styles.json')
+    return CatalogStore(source, config.CATALOG_DB, config.CATALOG_RELOAD_INTERVAL_SECONDS,
+                        manifest_path(config.ASSET_DIR), config.ASSET_URL_PREFIX)
+
+catalog = load_catalog()
+
+# Rendered JSON/PDF downloads, emptied whenever the catalog version changes
+export_cache = ExportCache(catalog, config.EXPORT_CACHE_CAPACITY)
+
+def prerender_catalog(background=False):
+    """
+    Compress every catalog response and render the downloads of every skin
+    tone and gender the classifier can emit.
+
+    Returns:
+        tuple: (groups, exports) prepared, or the started thread when `background`
+    """
+    if background:
+        thread = threading.Thread(target=prerender_catalog, name='catalog-prerender', daemon=True)
+        thread.start()
+        return thread
+    groups = catalog.current().precompress()
+    return groups, export_cache.prerender(HUE_LABELS)
+
+if config.CATALOG_PRERENDER:
+    catalog.add_reload_listener(lambda snapshot: prerender_catalog(background=True))
+
+@app.route('/get_clothing_styles', methods=['GET', 'POST'])
+def get_clothing_styles():
+    gender = request.values.get('gender')
+    skin_tone = request.values.get('skin_tone')
+    filters = {field: request.values[field] for field in FILTER_FIELDS if request.values.get(field)}
+    limit = request.values.get('limit')
+    cursor = request.values.get('cursor')
 
-def encode_image(frame):
-    _, buffer = cv2.imencode('.jpg', frame)
-    return base64.b64encode(buffer).decode('utf-8')
+    snapshot = catalog.current()
+    if not filters and limit is None and cursor is None:
+        # Whole (skin tone, gender) group: serialized and compressed once per catalog version
+        return snapshot.response_payload(skin_tone, gender).response(request)
 
-# Load clothing styles from JSON file
-def load_clothing_styles():
-    try:
-        # Try data folder first (organized structure)
-        clothing_styles_path = os.path.join(SCRIPT_DIR, '..', 'data', 'clothing_styles.json')
-        if os.path.exists(clothing_styles_path):
-            with open(clothing_styles_path, 'r') as file:
-                return json.load(file)
-        else:
-            # Fallback to src directory
-            clothing_styles_path = os.path.join(SCRIPT_DIR, 'clothing_styles.json')
-            with open(clothing_styles_path, 'r') as file:
-                return json.load(file)
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        print(f"Error loading clothing styles: {e}")
-        return {}
-
-clothing_styles = load_clothing_styles()
-
-@app.route('/get_clothing_styles', methods=['POST'])
-def get_clothing_styles():
-    gender = request.form.get('gender')
-    skin_tone = request.form.get('skin_tone')
     try:
-        styles = clothing_styles[skin_tone][gender]
-        return jsonify({'clothing_styles': styles})
-    except KeyError:
-        return jsonify({'clothing_styles': []})
+        if limit is not None:
+            if not limit.isdigit():
+                raise ValueError('limit must be an integer')
+            limit = int(limit)
+            if not 1 <= limit <= config.CATALOG_MAX_PAGE_SIZE:
+                raise ValueError(f"limit must be between 1 and {config.CATALOG_MAX_PAGE_SIZE}")
+        styles, next_cursor = snapshot.query(skin_tone, gender, filters, limit, cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    body = json.dumps({
+        'clothing_styles': styles,
+        'next_cursor': next_cursor,
+        'catalog_version': snapshot.version,
+    }, separators=(',', ':')).encode('utf-8')
+    return Payload(body, levels=FAST_LEVELS).response(request)
+
+def load_face_net():
+    if config.USE_STUB_MODELS:
+        return StubFaceNet(latency_ms=config.STUB_FACE_LATENCY_MS)
+    return load_face_detection_model(config.MODELS_DIR)
 
 def load_gender_model():
+    if config.USE_STUB_MODELS:
+        return StubGenderModel(config.STUB_GENDER_LATENCY_MS, config.STUB_GENDER_PER_ITEM_MS)
+    model = load_gender_backend(
+        config.MODELS_DIR,
+        config.GENDER_MODEL_BACKEND,
+        model_file=config.GENDER_MODEL_FILE,
+        num_threads=config.GENDER_MODEL_THREADS
+    )
+    if model is None:
+        print("⚠ Warning: Gender model could not be loaded. Gender detection will not work.")
+    return model
+
+def record_gender_batch(batch_size, waits):
+    BATCH_SIZE.observe(batch_size, 'gender')
+    for wait in waits:
+        QUEUE_WAIT_SECONDS.observe(wait, 'gender')
+
+def make_gender_batcher(gender_model):
+    # Batch gender predictions from concurrent requests into single calls
+    return MicroBatcher(
+        gender_model.predict_batch,
+        max_batch_size=config.GENDER_BATCH_MAX_SIZE,
+        max_wait_ms=config.GENDER_BATCH_MAX_WAIT_MS,
+        name='gender-batcher',
+        on_batch=record_gender_batch
+    )
+
+# Models are loaded on first use or by warmup_models(), not at import time
+models = ModelRegistry(
+    load_face_net,
+    load_gender_model,
+    make_gender_batcher
+)
+
+# With config.INFERENCE_PROCESSES > 0 the models run in worker processes instead
+inference_pool = None
+_inference_pool_lock = threading.Lock()
+
+def get_inference_pool():
+    """Start the inference worker processes on first use."""
+    global inference_pool
+    if inference_pool is None:
+        with _inference_pool_lock:
+            if inference_pool is None:
+                settings = {
+                    'models_dir': config.MODELS_DIR,
+                    'backend': config.GENDER_MODEL_BACKEND,
+                    'model_file': config.GENDER_MODEL_FILE,
+                    'threads': config.INFERENCE_THREADS_PER_PROCESS,
+                    'use_stub_models': config.USE_STUB_MODELS,
+                    'stub_face_latency_ms': config.STUB_FACE_LATENCY_MS,
+                    'stub_gender_latency_ms': config.STUB_GENDER_LATENCY_MS,
+                    'stub_gender_per_item_ms': config.STUB_GENDER_PER_ITEM_MS,
+                    'batch': config.INFERENCE_POOL_BATCH,
+                    'options': dict(
+                        confidence_threshold=config.FACE_DETECTION_CONFIDENCE,
+                        nms_threshold=config.FACE_NMS_THRESHOLD,
+                        top_k=config.MAX_FACES,
+                        gender_threshold=config.GENDER_PREDICTION_THRESHOLD
+                    ),
+                }
+                inference_pool = InferencePool(
+                    config.INFERENCE_PROCESSES,
+                    settings,
+                    # Decoded frames are at most DECODE_MAX_PIXELS BGR pixels
+                    slot_bytes=config.DECODE_MAX_PIXELS * 3,
+                    slots_per_worker=config.INFERENCE_POOL_SLOTS,
+                    request_timeout=config.INFERENCE_POOL_TIMEOUT_SECONDS
+                )
+                atexit.register(inference_pool.close)
+    return inference_pool
+
+def submit_or_fail(pool, frame):
+    """Queue a frame on the inference pool; a failure to queue becomes the future's exception."""
     try:
-        model_path = os.path.join(SCRIPT_DIR, 'static', 'models', 'Gender_Prediction_model.h5')
-        model = tf.keras.models.load_model(model_path)
-        print("✓ Successfully loaded Gender_Prediction_model.h5")
-        return model
+        return pool.submit(frame, timeout=config.INFERENCE_POOL_TIMEOUT_SECONDS)
     except Exception as e:
-        print(f"Error loading Gender_Prediction_model.h5: {e}")
-        try:
-            # Try alternative model
-            model_path = os.path.join(SCRIPT_DIR, 'static', 'models', 'GenderPredictionModel.h5')
-            model = tf.keras.models.load_model(model_path)
-            print("✓ Successfully loaded GenderPredictionModel.h5 as fallback")
-            return model
-        except Exception as e2:
-            print(f"Error loading GenderPredictionModel.h5: {e2}")
-            print("⚠ Warning: Gender model could not be loaded. Gender detection will not work.")
-            return None
-
-gender_model = load_gender_model()
-
-# Load the face detection model
-def load_face_detection_model(prototxt_path, model_path):
-    try:
-        if not os.path.exists(prototxt_path) or not os.path.exists(model_path):
-            raise FileNotFoundError("Face detection model files are missing.")
-        return cv2.dnn.readNetFromCaffe(prototxt_path, model_path)
-    except Exception as e:
-        print(f"Error loading face detection model: {e}")
-        raise
-
-prototxt_path = os.path.join(SCRIPT_DIR, 'static', 'models', 'deploy.prototxt.txt')
-model_path = os.path.join(SCRIPT_DIR, 'static', 'models', 'res10_300x300_ssd_iter_140000_fp16.caffemodel')
-try:
-    face_net = load_face_detection_model(prototxt_path, model_path)
-    print("✓ Face detection model loaded successfully!")
-except Exception as e:
-    print(f"Error loading face detection model: {e}")
-    face_net = None
-
-# Define a function to classify skin tone
-def classify_skin_tone(avg_rgb):
-    r, g, b = avg_rgb
-    hsv = cv2.cvtColor(np.uint8([[[r, g, b]]]), cv2.COLOR_BGR2HSV)[0][0]
-    hue = hsv[0]  # Extract Hue value (range 0-179 in OpenCV)
-
-    undertone = "Cool" if hue > 170 or hue < 30 else "Warm"
-    if hue >= 0 and hue < 10:
-        return f'Porcelain (Very Fair) - {undertone} Undertone'
-    elif hue >= 10 and hue < 20:
-        return f'Alabaster (Fair) - {undertone} Undertone'
-    elif hue >= 20 and hue < 30:
-        return f'Ivory (Light Fair) - {undertone} Undertone'
-    elif hue >= 30 and hue < 40:
-        return f'Cream (Light) - {undertone} Undertone'
-    elif hue >= 40 and hue < 50:
-        return f'Beige (Light-Medium) - {undertone} Undertone'
-    elif hue >= 50 and hue < 60:
-        return f'Golden Beige (Medium) - {undertone} Undertone'
-    elif hue >= 60 and hue < 70:
-        return f'Honey (Medium-Warm) - {undertone} Undertone'
-    elif hue >= 70 and hue < 80:
-        return f'Tan (Medium-Dark) - {undertone} Undertone'
-    elif hue >= 80 and hue < 90:
-        return f'Caramel (Dark) - {undertone} Undertone'
-    elif hue >= 90 and hue < 100:
-        return f'Honey Brown (Dark-Warm) - {undertone} Undertone'
-    elif hue >= 100 and hue < 110:
-        return f'Walnut (Deep Brown) - {undertone} Undertone'
-    elif hue >= 110 and hue < 120:
-        return f'Espresso (Very Deep Brown) - {undertone} Undertone'
-    elif hue >= 120 and hue < 130:
-        return f'Chestnut (Very Deep Brown-Cool) - {undertone} Undertone'
-    elif hue >= 130 and hue < 140:
-        return f'Mocha (Deep Brown-Warm) - {undertone} Undertone'
-    elif hue >= 140 and hue < 150:
-        return f'Mahogany (Very Deep Brown-Warm) - {undertone} Undertone'
-    elif hue >= 150 and hue < 160:
-        return f'Sable (Almost Black) - {undertone} Undertone'
-    elif hue >= 160 and hue < 170:
-        return f'Ebony (Black) - {undertone} Undertone'
-    else:
-        return f'Unknown Skin Tone - {undertone} Undertone'
+        future = Future()
+        future.set_exception(e)
+        return future
+
+def warmup_models(background=False):
+    """Load both models and run a dummy inference, optionally in a background thread."""
+    if config.INFERENCE_PROCESSES:
+        # Workers load and warm their own models as soon as they start
+        pool = get_inference_pool()
+        return pool if background else pool.wait_ready()
+    if background:
+        return models.start_warmup()
+    return models.warmup()
+
+def model_status():
+    if config.INFERENCE_PROCESSES:
+        pool = inference_pool
+        return {'ready': pool is not None and pool.ready,
+                'inference_pool': pool.stats() if pool is not None else None}
+    return models.status()
+
+# Recent detection results, for follow-up requests by result ID
+def load_result_store():
+    if config.RESULT_STORE_BACKEND == 'disk':
+        return DiskResultStore(config.RESULT_STORE_DIR, config.RESULT_STORE_CAPACITY,
+                               config.RESULT_STORE_TTL_SECONDS, config.RESULT_STORE_MAX_BYTES)
+    if config.RESULT_STORE_BACKEND != 'memory':
+        raise ValueError(f"Unknown RESULT_STORE_BACKEND '{config.RESULT_STORE_BACKEND}'. Choose from memory, disk")
+    return ResultStore(config.RESULT_STORE_CAPACITY, config.RESULT_STORE_TTL_SECONDS, config.RESULT_STORE_MAX_BYTES)
+
+result_store = load_result_store()
+
+# Cache analysis results of repeated images, keyed by image content
+result_cache = None
+if config.RESULT_CACHE_ENABLED:
+    result_cache = ResultCache(
+        max_bytes=config.RESULT_CACHE_MAX_BYTES,
+        ttl_seconds=config.RESULT_CACHE_TTL_SECONDS,
+        key_mode=config.RESULT_CACHE_KEY_MODE
+    )
+
+# Opt-in profiling of single requests, see profile_requested()
+request_profiler = RequestProfiler(ProfileStore(config.PROFILE_DIR, config.PROFILE_CAPACITY))
 
 # Define a function to get clothing styles based on skin tone and gender
-def get_clothing_styles(skin_tone, gender):
+def get_recommended_styles(skin_tone, gender):
+    return catalog.styles(skin_tone, gender, default=["No recommended clothing styles found"])
+
+def decode_upload(image_bytes):
+    with stage_timer('image_decode'):
+        return decode_image(
+            image_bytes,
+            max_bytes=config.MAX_FILE_SIZE,
+            max_pixels=config.MAX_IMAGE_PIXELS,
+            target_pixels=config.DECODE_MAX_PIXELS
+        )
+
+def predict_gender_batch(face_batch):
+    # Submit every crop before waiting so they share a micro-batch
+    gender_batcher = models.gender_batcher
+    futures = [gender_batcher.submit(face) for face in face_batch]
+    deadline = time.monotonic() + config.GENDER_BATCH_TIMEOUT_SECONDS
+    return np.stack([future.result(timeout=max(0.0, deadline - time.monotonic())) for future in futures])
+
+def analyze_frame(decoded):
+    if config.INFERENCE_PROCESSES:
+        faces = get_inference_pool().analyze(decoded.frame, timeout=config.INFERENCE_POOL_TIMEOUT_SECONDS)
+        return build_result(faces, decoded) if faces else None
+
+    face_net = models.face_net
+    if face_net is None:
+        raise RuntimeError("Face detection model is not loaded properly.")
+
+    faces = analyze_faces(
+        decoded.frame,
+        face_net,
+        predict_gender_batch if models.gender_batcher is not None else None,
+        confidence_threshold=config.FACE_DETECTION_CONFIDENCE,
+        nms_threshold=config.FACE_NMS_THRESHOLD,
+        top_k=config.MAX_FACES,
+        gender_threshold=config.GENDER_PREDICTION_THRESHOLD
+    )
+    if not faces:
+        return None
+
+    return build_result(faces, decoded)
+
+def build_result(faces, decoded):
+    # Report boxes in original image coordinates, keep frame boxes for rendering
+    frame_boxes = []
+    for face in faces:
+        frame_boxes.append(face['box'])
+        x, y, w, h = decoded.to_original(face['box'])
+        face['box'] = {'x': x, 'y': y, 'w': w, 'h': h}
+
+    # The most confident face drives the recommendations
+    primary = faces[0]
+    with stage_timer('recommendation'):
+        clothing_styles = catalog.styles(primary['skin_tone'], primary['gender'], default=[])
+    return {
+        'frame_boxes': frame_boxes,
+        'face_box': primary['box'],
+        'image_size': {'width': decoded.original_size[0], 'height': decoded.original_size[1]},
+        'gender': primary['gender'],
+        'skin_tone': primary['skin_tone'],
+        'faces': faces,
+        # Looked up in the in-process index
+        'clothing_styles': clothing_styles
+    }
+
+def get_image_options(values):
+    mode = values.get('mode') or config.RESPONSE_IMAGE_MODE
+    if mode not in IMAGE_MODES:
+        raise ValueError(f"Unknown image mode '{mode}'. Choose from {', '.join(IMAGE_MODES)}")
+    max_edge = min(int(values.get('max_edge', config.THUMBNAIL_MAX_EDGE)), config.THUMBNAIL_MAX_EDGE_LIMIT)
+    default_quality = config.THUMBNAIL_JPEG_QUALITY if mode == 'thumbnail' else config.JPEG_QUALITY
+    quality = max(1, min(int(values.get('quality', default_quality)), 100))
+    return mode, max_edge, quality
+
+def lookup_or_analyze(image_bytes):
+    """Return (cache key, cache entry, decoded image or None), running inference only on a cache miss."""
+    decoded = None
+    cache_key = None
+    entry = None
+
+    if result_cache is not None and result_cache.key_mode == 'exact':
+        with stage_timer('cache_lookup'):
+            cache_key = content_key(image_bytes)
+            entry = result_cache.get(cache_key)
+
+    if entry is None:
+        decoded = decode_upload(image_bytes)
+        if result_cache is not None and result_cache.key_mode == 'perceptual':
+            cache_key = perceptual_key(decoded.frame)
+            entry = result_cache.get(cache_key)
+
+    if entry is None:
+        entry = {'analysis': analyze_frame(decoded), 'result_id': None}
+        if result_cache is not None:
+            result_cache.put(cache_key, entry)
+
+    return cache_key, entry, decoded
+
+def recommendation_members(skin_tone, gender, known_etag=None):
+    """
+    Recommendation part of a detection response, as JSON members.
+
+    The list is embedded from the catalog's cached serialization, and left
+    out when the client already holds it (`known_etag`, the
+    `clothing_styles_etag` of an earlier response).
+
+    Returns:
+        tuple: (regular members, pre-serialized members) for json_with_fragments
+    """
+    snapshot = catalog.current()
+    payload = snapshot.response_payload(skin_tone, gender)
+    members = {'recommendation_id': snapshot.recommendation_id(skin_tone, gender),
+               'clothing_styles_etag': payload.etag()}
+    if etag_matches(known_etag, [payload.etag()]):
+        members['clothing_styles_unchanged'] = True
+        return members, {}
+    return members, {'clothing_styles': snapshot.styles_fragment(skin_tone, gender)}
+
+def process_image(image_bytes, mode=None, max_edge=None, quality=None, styles_etag=None):
     try:
-        skin_tone = skin_tone.split(' -')[0]  # Remove undertone information
-        return clothing_styles[skin_tone][gender]
-    except KeyError:
-        return ["No recommended clothing styles found"]
-
-def process_image(image_data):
-    try:
-        img_data = base64.b64decode(image_data.split(',')[1])
-        image = Image.open(BytesIO(img_data))
-        frame = np.array(image)
-
-        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-
-        if face_net is None:
-            raise RuntimeError("Face detection model is not loaded properly.")
-
-        h, w = frame.shape[:2]
-        frame_resized = cv2.resize(frame, (300, 300))
-        blob = cv2.dnn.blobFromImage(frame_resized, scalefactor=1.0, size=(300, 300), mean=(104.0, 177.0, 123.0))
-        face_net.setInput(blob)
-        detections = face_net.forward()
-
-        face_boxes = []
-        for i in range(0, detections.shape[2]):
-            confidence = detections[0, 0, i, 2]
-            if confidence > 0.6:
-                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                (start_x, start_y, end_x, end_y) = box.astype("int")
-                face_boxes.append((start_x, start_y, end_x - start_x, end_y - start_y))
-
-        if not face_boxes:
+        if mode is None:
+            mode, max_edge, quality = get_image_options({})
+        cache_key, entry, decoded = lookup_or_analyze(image_bytes)
+        result = entry['analysis']
+        if result is None:
+            g.outcome = 'no_face'
             return jsonify({'error': 'No face detected'})
 
-        x, y, w, h = face_boxes[0]
-        face_region = frame[y:y + h, x:x + w]
-
-        cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-
-        face_resized = cv2.resize(face_region, (128, 128))
-        face_array = img_to_array(face_resized) / 255.0
-        face_array = np.expand_dims(face_array, axis=0)
-
-        # Store detected gender and skin tone in session
-        if gender_model is not None:
-            session['detected_gender'] = 'Male' if gender_model.predict(face_array)[0][0] > 0.4 else 'Female'
-        else:
-            session['detected_gender'] = 'Unknown'
-        avg_rgb = cv2.mean(face_region)[:3]
-        session['detected_skin_tone'] = classify_skin_tone(avg_rgb)
-
-        print(f"Detected Gender: {session['detected_gender']}")
-        print(f"Detected Skin Tone: {session['detected_skin_tone']}")
-
-        # Make a request to the Flask route to get clothing styles
-        response = requests.post('http://localhost:5000/get_clothing_styles', data={
-            'gender': session['detected_gender'],
-            'skin_tone': session['detected_skin_tone'].split(' -')[0]  # Send only the skin tone without undertone
-        })
-
-        if response.status_code == 200:
-            recommended_clothing_styles = response.json().get('clothing_styles', [])
-        else:
-            recommended_clothing_styles = []
-
-        return jsonify({
-            'detected_face_image': encode_image(frame),
-            'gender': session['detected_gender'],
-            'skin_tone': session['detected_skin_tone'],
-            'clothing_styles': recommended_clothing_styles
+        # Keep the frame available for /result_image; a cache hit may outlive it
+        stored = result_store.get(entry['result_id']) if entry['result_id'] else None
+        if stored is None:
+            if decoded is None:
+                decoded = decode_upload(image_bytes)
+            stored = dict(result, frame=decoded.frame)
+            entry['result_id'] = result_store.put(stored)
+        result_id = entry['result_id']
+
+        # Browser clients can download exports without passing the ID along
+        session['result_id'] = result_id
+
+        print(f"Detected Gender: {result['gender']}")
+        print(f"Detected Skin Tone: {result['skin_tone']}")
+
+        image_key = (mode, max_edge, quality)
+        image = (entry.get('images') or {}).get(image_key)
+        if image is None and mode != 'boxes':
+            with stage_timer('encode_image'):
+                image = render_face_image(stored['frame'], result['frame_boxes'], mode, max_edge, quality)
+            if result_cache is not None:
+                result_cache.add_image(cache_key, image_key, image)
+
+        members, fragments = recommendation_members(result['skin_tone'], result['gender'], styles_etag)
+        members.update({
+            'result_id': result_id,
+            'image_mode': mode,
+            'detected_face_image': base64.b64encode(image).decode('utf-8') if image is not None else None,
+            'face_box': result['face_box'],
+            'image_size': result['image_size'],
+            'gender': result['gender'],
+            'skin_tone': result['skin_tone'],
+            'faces': result['faces'],
         })
+        return Response(json_with_fragments(members, fragments), mimetype='application/json')
+    except ImageDecodeError as e:
+        return jsonify({'error': str(e), 'detected_face_image': None}), e.status_code
+    except (TimeoutError, InferenceWorkerError) as e:
+        return jsonify({'error': str(e) or 'Inference timed out', 'detected_face_image': None}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def trusted_client():
+    # The token is required: behind a same-host proxy every client comes from loopback
+    if not token_matches(request.headers.get('X-Profile-Token'), config.PROFILE_TOKEN):
+        return False
+    networks = config.PROFILE_TRUSTED_NETWORKS
+    return not networks or is_trusted_address(request.remote_addr, networks)
+
+def profile_requested():
+    """
+    Check for an X-Profile header or ?profile= flag from a trusted client.
+
+    Returns:
+        str: None, 'cprofile', or 'trace' to add a TensorFlow trace
+    """
+    if not config.PROFILING_ENABLED:
+        return None
+    flag = (request.headers.get('X-Profile') or request.args.get('profile') or '').lower()
+    if flag not in ('1', 'true', 'yes', 'trace') or not trusted_client():
+        return None
+    return 'trace' if flag == 'trace' else 'cprofile'
+
+def call_view(view, args, kwargs):
+    profile = profile_requested()
+    if profile is None:
+        return app.make_response(view(*args, **kwargs))
+
+    with request_profiler.profile(request.endpoint, trace=profile == 'trace') as info:
+        response = app.make_response(view(*args, **kwargs))
+    if 'id' in info:
+        response.headers['X-Profile-Id'] = info['id']
+    else:
+        response.headers['X-Profile-Error'] = info['error']
+    return response
+
+def instrumented(view):
+    """Record latency and outcome (success, no_face, rejected, error) of a detection endpoint."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            response = call_view(view, args, kwargs)
+            if response.status_code >= 500:
+                outcome = 'error'
+            elif response.status_code >= 400:
+                outcome = 'rejected'
+            else:
+                outcome = g.get('outcome', 'success')
+            return response
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, request.endpoint)
+            REQUESTS_TOTAL.inc(request.endpoint, outcome)
+    return wrapper
+
 # Define a route for detecting face and processing
 @app.route('/detect_face', methods=['POST'])
+@instrumented
 def detect_face():
     try:
         image_data = request.form['image']
@@ -224,7 +479,22 @@ def detect_face():
                 'error': 'No image data provided',
                 'detected_face_image': None
             }), 400
-        return process_image(image_data)
+        mode, max_edge, quality = get_image_options(request.values)
+        with stage_timer('base64_decode'):
+            image_bytes = data_url_to_bytes(image_data, max_bytes=config.MAX_FILE_SIZE)
+        return process_image(image_bytes, mode, max_edge, quality, request.values.get('styles_etag'))
+
+    except ImageDecodeError as e:
+        return jsonify({
+            'error': str(e),
+            'detected_face_image': None
+        }), e.status_code
+
+    except ValueError as e:
+        return jsonify({
+            'error': str(e),
+            'detected_face_image': None
+        }), 400
 
     except Exception as e:
         return jsonify({
@@ -233,6 +503,7 @@ def detect_face():
         }), 500
 
 @app.route('/upload_image', methods=['POST'])
+@instrumented
 def upload_image():
     try:
         image_file = request.files['image']
@@ -242,10 +513,16 @@ def upload_image():
                 'detected_face_image': None
             }), 400
 
-        image_data = base64.b64encode(image_file.read()).decode('utf-8')
-        image_data = f'data:image/jpeg;base64,{image_data}'
+        mode, max_edge, quality = get_image_options(request.values)
+        # Read one byte past the limit so oversized files are rejected without buffering them
+        return process_image(memoryview(image_file.stream.read(config.MAX_FILE_SIZE + 1)),
+                             mode, max_edge, quality, request.values.get('styles_etag'))
 
-        return process_image(image_data)
+    except ValueError as e:
+        return jsonify({
+            'error': str(e),
+            'detected_face_image': None
+        }), 400
 
     except Exception as e:
         return jsonify({
@@ -253,35 +530,273 @@ def upload_image():
             'detected_face_image': None
         }), 500
 
-@app.route('/generate_clothing_styles_json', methods=['GET'])
-def generate_clothing_styles_json():
+def batch_record(index, name, faces=None, decoded=None, error=None, include_styles=False):
+    record = {'index': index, 'name': name}
+    if error is not None:
+        record['error'] = error
+        return record
+    if not faces:
+        record['error'] = 'No face detected'
+        return record
+    result = build_result(faces, decoded)
+    # No frame: batch results are kept for recommendations and exports only
+    record['result_id'] = result_store.put(result)
+    for key in ('image_size', 'gender', 'skin_tone', 'faces'):
+        record[key] = result[key]
+    if include_styles:
+        record['clothing_styles'] = result['clothing_styles']
+    return record
+
+def analyze_batch_chunk(chunk, include_styles):
+    """Analyze (index, name, read) items together, yielding one record per image."""
+    decoded_items = []
+    for index, name, read in chunk:
+        try:
+            decoded_items.append((index, name, decode_upload(memoryview(read()))))
+        except ImageDecodeError as e:
+            yield batch_record(index, name, error=str(e))
+        except Exception as e:
+            yield batch_record(index, name, error=f'Could not read image: {e}')
+    if not decoded_items:
+        return
+
+    if config.INFERENCE_PROCESSES:
+        # Spread the chunk across the worker processes
+        pool = get_inference_pool()
+        futures = [submit_or_fail(pool, decoded.frame) for _, _, decoded in decoded_items]
+        for future, (index, name, decoded) in zip(futures, decoded_items):
+            try:
+                faces = future.result(timeout=config.INFERENCE_POOL_TIMEOUT_SECONDS)
+                yield batch_record(index, name, faces, decoded, include_styles=include_styles)
+            except Exception as e:
+                yield batch_record(index, name, error=str(e))
+        return
+
+    face_net = models.face_net
+    predict_fn = predict_gender_batch if models.gender_batcher is not None else None
+    options = dict(
+        confidence_threshold=config.FACE_DETECTION_CONFIDENCE,
+        nms_threshold=config.FACE_NMS_THRESHOLD,
+        top_k=config.MAX_FACES,
+        gender_threshold=config.GENDER_PREDICTION_THRESHOLD
+    )
     try:
-        # Retrieve gender and skin tone from session
-        gender = session.get('detected_gender')
-        skin_tone = session.get('detected_skin_tone')
-
-        if not gender or not skin_tone:
-            return jsonify({'error': 'Gender or skin tone not detected'}), 400
-
-        # Get clothing styles based on gender and skin tone
-        clothing_styles_list = get_clothing_styles(skin_tone, gender)
-
-        # Create a JSON file with the clothing styles
-        clothing_styles_json = {
-            'gender': gender,
-            'skin_tone': skin_tone,
-            'clothing_styles': clothing_styles_list
-        }
+        faces_per_image = analyze_faces_batch(
+            [decoded.frame for _, _, decoded in decoded_items], face_net, predict_fn, **options)
+    except Exception:
+        # Fall back to one image at a time so a bad image only fails itself
+        faces_per_image = None
 
-        json_filename = os.path.join(SCRIPT_DIR, 'clothing_styles1.json')
-        with open(json_filename, 'w') as json_file:
-            json.dump(clothing_styles_json, json_file, indent=4)
+    for position, (index, name, decoded) in enumerate(decoded_items):
+        try:
+            if faces_per_image is not None:
+                faces = faces_per_image[position]
+            else:
+                faces = analyze_faces(decoded.frame, face_net, predict_fn, **options)
+            yield batch_record(index, name, faces, decoded, include_styles=include_styles)
+        except Exception as e:
+            yield batch_record(index, name, error=str(e))
+
+@app.route('/detect_faces_batch', methods=['POST'])
+@instrumented
+def detect_faces_batch():
+    try:
+        if not config.INFERENCE_PROCESSES and models.face_net is None:
+            raise RuntimeError("Face detection model is not loaded properly.")
+        batch = collect_batch_images(
+            request.files.getlist('images') + request.files.getlist('archive'),
+            config.ALLOWED_EXTENSIONS,
+            max_images=config.BATCH_MAX_IMAGES,
+            max_total_bytes=config.BATCH_MAX_TOTAL_BYTES,
+            max_file_size=config.MAX_FILE_SIZE
+        )
+        if not batch:
+            return jsonify({'error': 'No images provided'}), 400
+        include_styles = request.values.get('include_styles', '').lower() in ('1', 'true', 'yes')
+    except ImageDecodeError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        # Send the JSON file to the client
-        return send_file(json_filename, as_attachment=True)
+    def generate():
+        chunk_size = max(1, config.BATCH_CHUNK_SIZE)
+        items = batch.items
+        try:
+            for start in range(0, len(items), chunk_size):
+                chunk = [(start + offset, name, read)
+                         for offset, (name, read) in enumerate(items[start:start + chunk_size])]
+                for record in analyze_batch_chunk(chunk, include_styles):
+                    yield json.dumps(record) + '\n'
+        finally:
+            batch.close()
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['X-Accel-Buffering'] = 'no'  # Let proxies pass lines through as they are produced
+    return response
+
+@app.route('/result_image/<result_id>', methods=['GET'])
+def result_image(result_id):
+    try:
+        result = result_store.get(result_id)
+        if result is None:
+            return jsonify({'error': 'Unknown or expired result ID'}), 404
+        if result.get('frame') is None:
+            return jsonify({'error': 'No image stored for this result'}), 404
+        options = request.args.to_dict()
+        options.setdefault('mode', 'full')
+        mode, max_edge, quality = get_image_options(options)
+        if mode == 'boxes':
+            return jsonify({'error': "Mode 'boxes' has no image"}), 400
+        image = render_face_image(result['frame'], result['frame_boxes'], mode, max_edge, quality)
+        return Response(image, mimetype='image/jpeg')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
+@app.route(f"{config.ASSET_URL_PREFIX.rstrip('/')}/<path:name>", methods=['GET'])
+def catalog_asset(name):
+    # Content-addressed names: a URL always returns the same bytes
+    if not ASSET_NAME_PATTERN.fullmatch(name):
+        return jsonify({'error': 'Unknown asset'}), 404
+    path = os.path.join(config.ASSET_DIR, *name.split('/'))
+    if not os.path.isfile(path):
+        return jsonify({'error': 'Unknown asset'}), 404
+    digest, extension = name.split('/')[1].split('.')
+    response = send_file(path, mimetype=ASSET_MIMETYPES[extension], conditional=True, etag=digest,
+                         max_age=config.ASSET_CACHE_MAX_AGE_SECONDS)
+    response.headers['Cache-Control'] = f'public, max-age={config.ASSET_CACHE_MAX_AGE_SECONDS}, immutable'
+    return response
+
+@app.route('/results/<result_id>', methods=['GET'])
+def get_result(result_id):
+    # Stored detection output; recommendations come from the current catalog
+    result = result_store.get(result_id)
+    if result is None:
+        return jsonify({'error': 'Unknown or expired result ID'}), 404
+    members, fragments = recommendation_members(result['skin_tone'], result['gender'],
+                                                request.args.get('styles_etag'))
+    members.update({
+        'result_id': result_id,
+        'face_box': result['face_box'],
+        'image_size': result['image_size'],
+        'gender': result['gender'],
+        'skin_tone': result['skin_tone'],
+        'faces': result['faces'],
+        'has_image': result.get('frame') is not None,
+    })
+    return Response(json_with_fragments(members, fragments), mimetype='application/json')
+
+def send_export(fmt):
+    # ?result_id=..., or the last detection of this browser session
+    result_id = request.args.get('result_id') or session.get('result_id')
+    if not result_id:
+        return jsonify({'error': 'Gender or skin tone not detected'}), 400
+    result = result_store.get(result_id)
+    if result is None:
+        return jsonify({'error': 'Unknown or expired result ID'}), 404
+    try:
+        body, mimetype, filename = export_cache.get(result['skin_tone'], result['gender'], fmt)
+    except ExportUnavailableError as e:
+        return jsonify({'error': str(e)}), 501
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    response = Response(body, mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+@app.route('/generate_clothing_styles_json', methods=['GET'])
+def generate_clothing_styles_json():
+    return send_export('json')
+
+@app.route('/generate_clothing_styles_pdf', methods=['GET'])
+def generate_clothing_styles_pdf():
+    return send_export('pdf')
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    # The process is up and serving requests
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    # Ready once the models are loaded
+    status = model_status()
+    if not status['ready'] and not config.WARMUP_ON_STARTUP:
+        # Loading is lazy: the first probe starts it, since no traffic arrives before ready
+        warmup_models(background=True)
+    return jsonify(status), 200 if status['ready'] else 503
+
+def gender_queue_depth():
+    gender_batcher = models.peek('gender_batcher')
+    return gender_batcher.queue_depth() if gender_batcher is not None else 0
+
+def result_cache_stat(name):
+    return lambda: result_cache.stats()[name] if result_cache is not None else None
+
+REGISTRY.gauge('fashion_inference_queue_depth', 'Samples waiting for a gender batch', gender_queue_depth)
+REGISTRY.gauge('fashion_models_ready', 'Whether models are loaded and warmed', lambda: int(model_status()['ready']))
+REGISTRY.gauge('fashion_catalog_styles', 'Styles in the current clothing catalog', lambda: len(catalog))
+REGISTRY.gauge('fashion_export_cache_hits_total', 'Downloads served from the export cache',
+               lambda: export_cache.hits, kind='counter')
+REGISTRY.gauge('fashion_export_cache_misses_total', 'Downloads rendered on request',
+               lambda: export_cache.misses, kind='counter')
+REGISTRY.gauge('fashion_result_cache_entries', 'Entries in the result cache', result_cache_stat('entries'))
+REGISTRY.gauge('fashion_result_cache_bytes', 'Approximate result cache size', result_cache_stat('bytes'))
+REGISTRY.gauge('fashion_result_cache_hits_total', 'Result cache hits', result_cache_stat('hits'), kind='counter')
+REGISTRY.gauge('fashion_result_cache_misses_total', 'Result cache misses', result_cache_stat('misses'),
+               kind='counter')
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Prometheus text exposition format
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/profiles', methods=['GET'])
+def list_profiles():
+    if not trusted_client():
+        return jsonify({'error': 'Forbidden'}), 403
+    store = request_profiler.store
+    return jsonify({'profiles': [store.metadata(profile_id) for profile_id in reversed(store.list_ids())]})
+
+@app.route('/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    # format=text (cumulative-time summary), pstats (for snakeviz/pstats) or trace (TensorFlow trace zip)
+    if not trusted_client():
+        return jsonify({'error': 'Forbidden'}), 403
+    store = request_profiler.store
+    profile_format = request.args.get('format', 'text')
+    if profile_format == 'trace':
+        archive = store.trace_archive(profile_id)
+        if archive is None:
+            return jsonify({'error': 'No TensorFlow trace for this profile'}), 404
+        return Response(archive, mimetype='application/zip',
+                        headers={'Content-Disposition': f'attachment; filename={profile_id}-trace.zip'})
+    if profile_format not in ('text', 'pstats'):
+        return jsonify({'error': "format must be 'text', 'pstats' or 'trace'"}), 400
+
+    path = store.file(profile_id, 'summary.txt' if profile_format == 'text' else 'profile.pstats')
+    if path is None:
+        return jsonify({'error': 'Unknown or evicted profile ID'}), 404
+    if profile_format == 'pstats':
+        return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                         download_name=f'{profile_id}.pstats')
+    return send_file(path, mimetype='text/plain')
+
+@app.route('/inference_stats', methods=['GET'])
+def inference_stats():
+    return jsonify({
+        'gender_batcher': models.peek('gender_batcher').stats() if models.peek('gender_batcher') else None,
+        'result_cache': result_cache.stats() if result_cache is not None else None,
+        'inference_pool': inference_pool.stats() if inference_pool is not None else None,
+        'export_cache': export_cache.stats(),
+        'result_store': result_store.stats()
+    })
 
 if __name__ == '__main__':
+    config.ensure_directories()
+    if config.WARMUP_ON_STARTUP:
+        warmup_models()
+    if config.CATALOG_PRERENDER:
+        prerender_catalog(background=True)
     app.run(debug=False, port=5000)
\ No newline at end of file
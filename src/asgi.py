@@ -0,0 +1,416 @@
+"""
+ASGI serving mode with admission control.
+
+Serves the Flask app through an ASGI server such as uvicorn:
+
+    uvicorn asgi:app --app-dir src --host 127.0.0.1 --port 5000
+
+or `python run.py --asgi`. Inference endpoints (config.ASGI_INFERENCE_PATHS)
+run on a fixed pool of threads behind a bounded admission queue. When the
+queue is full the request is answered right away with 503 (or 429) and a
+Retry-After header, and a request whose deadline passes while it waits is
+dropped before inference starts. Under overload the server therefore sheds
+load quickly instead of building an unbounded backlog. Every other route
+runs on a separate small thread pool so health checks and metrics stay
+responsive while inference is saturated.
+
+Live camera clients connect to the WebSocket at config.STREAM_PATH and send
+binary JPEG frames. Only the newest frame of a connection is kept; frames
+that arrive while the previous one is analyzed replace each other. Each
+connection tracks its faces across frames (utils.realtime) and receives
+incremental JSON updates (see utils.camera_stream). Stream frames share the
+inference admission queue with HTTP requests; when it is full a frame is
+skipped instead of the connection being closed.
+"""
+import asyncio
+import io
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from app import app as flask_app, catalog, models, predict_gender_batch, prerender_catalog, warmup_models
+from utils.admission import AdmissionController, DeadlineExpired
+from utils.camera_stream import CameraStream
+from utils.image_decode import ImageDecodeError, decode_image
+from utils.metrics import REGISTRY, REQUEST_SECONDS, REQUESTS_TOTAL, stage_timer
+from utils.realtime import RealtimeEngine
+
+STREAM_ENDPOINT = 'ws_camera'
+
+
+class RequestTooLarge(Exception):
+    """Raised when the request body exceeds the configured limit."""
+
+
+def build_environ(scope, body):
+    """
+    Build a WSGI environ for an ASGI HTTP request.
+
+    Args:
+        scope (dict): ASGI HTTP scope
+        body (bytes): Complete request body
+
+    Returns:
+        dict: WSGI environ
+    """
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name not in ('CONTENT_LENGTH', 'TRANSFER_ENCODING'):
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    # The body is already buffered, chunked or not
+    environ['CONTENT_LENGTH'] = str(len(body))
+    return environ
+
+
+def run_wsgi(wsgi_app, environ, send_sync):
+    """
+    Call a WSGI app on the current thread and relay its response.
+
+    The response is sent chunk by chunk, so streamed responses such as the
+    NDJSON batch endpoint keep streaming.
+
+    Args:
+        wsgi_app (callable): WSGI application
+        environ (dict): WSGI environ
+        send_sync (callable): Sends one ASGI message and waits for it
+    """
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info is not None and response.get('sent'):
+            raise exc_info[1].with_traceback(exc_info[2])
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                               for name, value in headers]
+        return write
+
+    def send_start():
+        if not response.get('sent'):
+            response['sent'] = True
+            send_sync({'type': 'http.response.start', 'status': response['status'],
+                       'headers': response['headers']})
+
+    def write(data):
+        if data:
+            send_start()
+            send_sync({'type': 'http.response.body', 'body': bytes(data), 'more_body': True})
+
+    result = wsgi_app(environ, start_response)
+    try:
+        for chunk in result:
+            write(chunk)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    send_start()
+    send_sync({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+
+def decode_stream_frame(data):
+    with stage_timer('image_decode'):
+        return decode_image(
+            data,
+            max_bytes=config.STREAM_MAX_FRAME_BYTES,
+            max_pixels=config.MAX_IMAGE_PIXELS,
+            target_pixels=config.STREAM_DECODE_MAX_PIXELS
+        )
+
+
+def make_camera_stream():
+    """Create the tracking state of a new camera connection; may load the models."""
+    face_net = models.face_net
+    if face_net is None:
+        raise RuntimeError("Face detection model is not loaded properly.")
+    engine = RealtimeEngine(
+        face_net,
+        predict_gender_batch if models.gender_batcher is not None else None,
+        detect_every=config.REALTIME_DETECT_EVERY,
+        min_track_score=config.REALTIME_MIN_TRACK_SCORE,
+        confidence_threshold=config.FACE_DETECTION_CONFIDENCE,
+        nms_threshold=config.FACE_NMS_THRESHOLD,
+        max_faces=config.MAX_FACES,
+        gender_threshold=config.GENDER_PREDICTION_THRESHOLD,
+        smoothing=config.REALTIME_SMOOTHING
+    )
+    return CameraStream(engine, catalog, decode_stream_frame)
+
+
+class FashionASGI:
+    """ASGI application wrapping the Flask app with admission control."""
+
+    def __init__(self, wsgi_app, controller, max_body_size, stream_factory=None):
+        """
+        Args:
+            wsgi_app (callable): The Flask WSGI app
+            controller (AdmissionController): Runs inference requests
+            max_body_size (int): Largest accepted request body in bytes
+            stream_factory (callable): Creates a `CameraStream` per WebSocket
+                connection; None refuses WebSocket connections
+        """
+        self.wsgi_app = wsgi_app
+        self.controller = controller
+        self.max_body_size = max_body_size
+        self.stream_factory = stream_factory
+        self.streams = 0
+        self.inference_paths = set(config.ASGI_INFERENCE_PATHS)
+        self.light_executor = ThreadPoolExecutor(config.ASGI_LIGHT_WORKERS, thread_name_prefix='light')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            await self.handle_http(scope, receive, send)
+        elif scope['type'] == 'lifespan':
+            await self.handle_lifespan(receive, send)
+        elif scope['type'] == 'websocket':
+            await self.handle_websocket(scope, receive, send)
+
+    async def handle_lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                config.ensure_directories()
+                if config.WARMUP_ON_STARTUP:
+                    # /readyz turns 200 once warmup finishes
+                    warmup_models(background=True)
+                if config.CATALOG_PRERENDER:
+                    prerender_catalog(background=True)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.controller.shutdown()
+                self.light_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def deadline_for(self, scope, arrived):
+        """
+        Deadline of a request: the X-Request-Timeout header (seconds),
+        capped at config.ASGI_MAX_DEADLINE_SECONDS, or the default.
+        """
+        timeout = config.ASGI_REQUEST_DEADLINE_SECONDS
+        for name, value in scope.get('headers', []):
+            if name == b'x-request-timeout':
+                try:
+                    timeout = float(value)
+                except ValueError:
+                    pass
+                break
+        timeout = min(max(timeout, 0.0), config.ASGI_MAX_DEADLINE_SECONDS)
+        return arrived + timeout
+
+    async def read_body(self, scope, receive):
+        for name, value in scope.get('headers', []):
+            if name == b'content-length' and value.isdigit() and int(value) > self.max_body_size:
+                raise RequestTooLarge()
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > self.max_body_size:
+                raise RequestTooLarge()
+            chunks.append(chunk)
+            if not message.get('more_body', False):
+                return b''.join(chunks)
+
+    async def send_error(self, send, status, message, retry_after=None):
+        headers = [(b'content-type', b'application/json')]
+        if retry_after is not None:
+            headers.append((b'retry-after', str(retry_after).encode('ascii')))
+        body = json.dumps({'error': message, 'detected_face_image': None}).encode('utf-8')
+        headers.append((b'content-length', str(len(body)).encode('ascii')))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def handle_http(self, scope, receive, send):
+        arrived = time.monotonic()
+        loop = asyncio.get_running_loop()
+        endpoint = scope['path'].strip('/')
+        inference = scope['path'] in self.inference_paths
+
+        # Shed before reading the body so rejections stay cheap
+        if inference and not self.controller.try_admit():
+            REQUESTS_TOTAL.inc(endpoint, 'shed')
+            await self.send_error(send, config.ASGI_OVERLOAD_STATUS, 'Server is overloaded, retry later',
+                                  self.controller.retry_after())
+            return
+
+        try:
+            body = await self.read_body(scope, receive)
+        except RequestTooLarge:
+            if inference:
+                self.controller.release()
+            await self.send_error(send, 413, 'Request body is too large')
+            return
+        if body is None:
+            # Client went away while sending
+            if inference:
+                self.controller.release()
+            return
+
+        environ = build_environ(scope, body)
+        deadline = self.deadline_for(scope, arrived)
+
+        def send_sync(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def call():
+            run_wsgi(self.wsgi_app, environ, send_sync)
+
+        if not inference:
+            await loop.run_in_executor(self.light_executor, call)
+            return
+        try:
+            await self.controller.run(call, deadline)
+        except DeadlineExpired as e:
+            REQUESTS_TOTAL.inc(endpoint, 'expired')
+            await self.send_error(send, 503, str(e), e.retry_after)
+
+
+    async def handle_websocket(self, scope, receive, send):
+        message = await receive()
+        if message['type'] != 'websocket.connect':
+            return
+        if self.stream_factory is None or scope['path'] != config.STREAM_PATH:
+            await send({'type': 'websocket.close', 'code': 1008})
+            return
+        if self.streams >= config.STREAM_MAX_CONNECTIONS:
+            # 1013: try again later
+            await send({'type': 'websocket.close', 'code': 1013})
+            return
+
+        self.streams += 1
+        try:
+            await send({'type': 'websocket.accept'})
+            await self.stream_camera(receive, send)
+        finally:
+            self.streams -= 1
+
+    async def stream_camera(self, receive, send):
+        loop = asyncio.get_running_loop()
+        try:
+            stream = await loop.run_in_executor(self.light_executor, self.stream_factory)
+        except Exception as e:
+            print(f"✗ Camera stream could not start: {e}")
+            await send({'type': 'websocket.close', 'code': 1011})
+            return
+
+        state = {'latest': None, 'count': 0, 'reset': False, 'closed': False, 'close_code': None}
+        wake = asyncio.Event()
+
+        async def read_frames():
+            # Keep only the newest frame: anything not yet analyzed is replaced
+            while True:
+                message = await receive()
+                if message['type'] == 'websocket.disconnect':
+                    break
+                data = message.get('bytes')
+                if data is None:
+                    try:
+                        command = json.loads(message.get('text') or '{}')
+                    except ValueError:
+                        command = {}
+                    if isinstance(command, dict) and command.get('type') == 'reset':
+                        state['reset'] = True
+                        wake.set()
+                    continue
+                if len(data) > config.STREAM_MAX_FRAME_BYTES:
+                    # 1009: message too big
+                    state['close_code'] = 1009
+                    break
+                if state['latest'] is not None:
+                    stream.dropped += 1
+                    REQUESTS_TOTAL.inc(STREAM_ENDPOINT, 'dropped')
+                state['count'] += 1
+                state['latest'] = (state['count'], time.monotonic(), data)
+                wake.set()
+            state['closed'] = True
+            wake.set()
+
+        reader = asyncio.ensure_future(read_frames())
+        try:
+            while True:
+                await wake.wait()
+                wake.clear()
+                if state['closed']:
+                    break
+                if state['reset']:
+                    state['reset'] = False
+                    stream.reset()
+                if state['latest'] is None:
+                    continue
+                (number, arrived, data), state['latest'] = state['latest'], None
+                update = await self.analyze_stream_frame(stream, data, number, arrived)
+                if state['closed']:
+                    break
+                await send({'type': 'websocket.send', 'text': json.dumps(update)})
+        finally:
+            reader.cancel()
+        if state['close_code'] is not None:
+            await send({'type': 'websocket.close', 'code': state['close_code']})
+
+    async def analyze_stream_frame(self, stream, data, number, arrived):
+        """
+        Run one stream frame through the inference admission queue.
+
+        Returns:
+            dict: The update from `CameraStream.process`, or a 'skipped' or
+                'error' message for that frame
+        """
+        if not self.controller.try_admit():
+            REQUESTS_TOTAL.inc(STREAM_ENDPOINT, 'shed')
+            return {'type': 'skipped', 'frame': number, 'reason': 'overloaded',
+                    'retry_after': self.controller.retry_after()}
+        try:
+            update = await self.controller.run(lambda: stream.process(data, number),
+                                               arrived + config.STREAM_FRAME_DEADLINE_SECONDS)
+        except DeadlineExpired:
+            REQUESTS_TOTAL.inc(STREAM_ENDPOINT, 'expired')
+            return {'type': 'skipped', 'frame': number, 'reason': 'expired'}
+        except ImageDecodeError as e:
+            REQUESTS_TOTAL.inc(STREAM_ENDPOINT, 'rejected')
+            return {'type': 'error', 'frame': number, 'error': str(e)}
+        except Exception as e:
+            REQUESTS_TOTAL.inc(STREAM_ENDPOINT, 'error')
+            print(f"✗ Error analyzing stream frame: {e}")
+            return {'type': 'error', 'frame': number, 'error': 'Error processing frame'}
+
+        REQUESTS_TOTAL.inc(STREAM_ENDPOINT, 'success' if update['faces'] else 'no_face')
+        REQUEST_SECONDS.observe(time.monotonic() - arrived, STREAM_ENDPOINT)
+        return update
+
+
+controller = AdmissionController(config.ASGI_INFERENCE_WORKERS, config.ASGI_ADMISSION_QUEUE)
+REGISTRY.gauge('fashion_admission_queue_depth', 'Inference requests waiting for a worker',
+               lambda: controller.queue_depth)
+REGISTRY.gauge('fashion_admission_running', 'Inference requests running', lambda: controller.in_flight)
+
+app = FashionASGI(flask_app, controller, flask_app.config['MAX_CONTENT_LENGTH'], make_camera_stream)
+REGISTRY.gauge('fashion_camera_streams', 'Open camera stream connections', lambda: app.streams)
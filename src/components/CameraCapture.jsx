@@ -1,8 +1,20 @@
 import React, { useRef, useState, useEffect, useCallback } from 'react';
 import { FiCamera, FiCheck } from 'react-icons/fi';
 import { useCamera } from '../hooks/useCamera';
+import { useLiveAnalysis } from '../hooks/useLiveAnalysis';
 import './CameraCapture.css';
 
+// Position of a box given in video pixels on a <video> shown with object-fit: cover
+function overlayStyle(video, box) {
+  const scale = Math.max(video.clientWidth / video.videoWidth, video.clientHeight / video.videoHeight);
+  return {
+    left: (video.clientWidth - video.videoWidth * scale) / 2 + box.x * scale,
+    top: (video.clientHeight - video.videoHeight * scale) / 2 + box.y * scale,
+    width: box.w * scale,
+    height: box.h * scale,
+  };
+}
+
 function CameraCapture({ onImageCapture, disabled }) {
   const videoRef = useRef(null);
   const canvasRef = useRef(null);
@@ -10,12 +22,16 @@ function CameraCapture({ onImageCapture, disabled }) {
   const [captured, setCaptured] = useState(null);
   const [showCamera, setShowCamera] = useState(false);
   const [cameraLoading, setCameraLoading] = useState(false);
+  const [cameraReady, setCameraReady] = useState(false);
+  // Live boxes and labels while the camera is open and nothing is captured
+  const { live, transport } = useLiveAnalysis(videoRef, showCamera && cameraReady && !captured);
 
   const startCameraAfterRender = useCallback(async () => {
     try {
       console.log('🎥 Starting camera with video ref ready...');
       const success = await startCamera(videoRef);
       console.log('✅ Camera started:', success);
+      setCameraReady(success);
       
       if (!success) {
         console.error('❌ Camera failed to start');
@@ -49,6 +65,7 @@ function CameraCapture({ onImageCapture, disabled }) {
 
   const handleStopCamera = () => {
     stopCamera();
+    setCameraReady(false);
     setShowCamera(false);
     setCaptured(null);
   };
@@ -138,8 +155,25 @@ function CameraCapture({ onImageCapture, disabled }) {
               onPlay={() => console.log('Video is playing')}
               onError={(e) => console.error('Video error:', e)}
             />
+            {live && videoRef.current && videoRef.current.videoWidth > 0 && live.faces.map((face) => (
+              <div key={face.id} className="live-face-box" style={overlayStyle(videoRef.current, face.box)}>
+                {face.gender && (
+                  <span className="live-face-label">
+                    {face.gender}{face.skin_tone ? ` · ${face.skin_tone}` : ''}
+                  </span>
+                )}
+              </div>
+            ))}
           </div>
 
+          {live && !captured && (
+            <div className="live-status">
+              Live analysis over {transport === 'websocket' ? 'WebSocket' : 'HTTP'}
+              {live.processingMs != null && ` · ${Math.round(live.processingMs)} ms`}
+              {live.recommendation && ` · ${live.recommendation.clothing_styles.length} recommended styles`}
+            </div>
+          )}
+
           {!captured && (
             <div className="camera-controls">
               <button
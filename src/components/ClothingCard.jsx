@@ -1,10 +1,35 @@
 import React from 'react';
+import { API_BASE_URL } from '../services/api';
 import './ClothingCard.css';
 
+// Local thumbnails (see tools/build_assets.py) as a srcset for one format
+function srcSet(image, format) {
+  return image.thumbnails
+    .filter((thumb) => thumb.format === format)
+    .map((thumb) => `${API_BASE_URL}${thumb.url} ${thumb.width}w`)
+    .join(', ');
+}
+
 function ClothingCard({ style }) {
+  const image = style.image;
   return (
     <div className="clothing-card">
-      {style['img-url'] && (
+      {image ? (
+        <picture>
+          <source type="image/webp" srcSet={srcSet(image, 'webp')} sizes="320px" />
+          <img
+            src={`${API_BASE_URL}${image.original}`}
+            srcSet={srcSet(image, 'jpeg')}
+            sizes="320px"
+            width={image.width}
+            height={image.height}
+            loading="lazy"
+            alt={style.item || 'Clothing'}
+            className="clothing-image"
+            onError={(e) => (e.target.style.display = 'none')}
+          />
+        </picture>
+      ) : style['img-url'] && (
         <img
           src={style['img-url']}
           alt={style.item || 'Clothing'}
@@ -21,18 +21,134 @@ HOST = '127.0.0.1'
 # Upload configuration
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'bmp'}
+MAX_IMAGE_PIXELS = 50_000_000  # Reject larger source images outright
+DECODE_MAX_PIXELS = 2_000_000  # Decode large images at 1/2, 1/4 or 1/8 scale to fit this
+
+# Clothing catalog: the JSON source is compiled to an indexed SQLite file
+CATALOG_SOURCE = os.path.join(DATA_DIR, 'clothing_styles.json')
+CATALOG_DB = os.path.join(DATA_DIR, 'clothing_styles.sqlite')
+CATALOG_RELOAD_INTERVAL_SECONDS = 2.0  # How often the source is checked for changes, None = never
+CATALOG_MAX_PAGE_SIZE = 100  # Largest `limit` of /get_clothing_styles
+
+# Catalog images mirrored locally by tools/build_assets.py and served from ASSET_URL_PREFIX
+ASSET_DIR = os.path.join(DATA_DIR, 'assets')
+ASSET_URL_PREFIX = '/assets'
+ASSET_THUMBNAIL_WIDTHS = (160, 320, 640)  # Never upscaled past the original width
+ASSET_THUMBNAIL_FORMATS = ('webp', 'jpeg')
+ASSET_THUMBNAIL_QUALITY = 80
+ASSET_FETCH_TIMEOUT_SECONDS = 15
+ASSET_MAX_BYTES = 10 * 1024 * 1024  # Largest source image accepted
+ASSET_CACHE_MAX_AGE_SECONDS = 365 * 24 * 3600  # File names change with their content
+
+# Recommendation downloads (JSON/PDF), rendered in memory per (skin tone, gender, format)
+EXPORT_CACHE_CAPACITY = 256  # Rendered exports kept in memory
+CATALOG_PRERENDER = True  # Compress catalog responses and render all exports at startup and after reloads
+
+# Batch detection (/detect_faces_batch)
+BATCH_MAX_IMAGES = 200
+BATCH_MAX_TOTAL_BYTES = 200 * 1024 * 1024
+BATCH_CHUNK_SIZE = 8  # Images decoded and run through the models together
+
+# Response image configuration
+RESPONSE_IMAGE_MODE = 'full'  # 'boxes', 'crop', 'thumbnail' or 'full'
+JPEG_QUALITY = 95
+THUMBNAIL_MAX_EDGE = 320
+THUMBNAIL_MAX_EDGE_LIMIT = 1280
+THUMBNAIL_JPEG_QUALITY = 80
+
+# Detection results kept server-side for follow-up requests by result ID
+RESULT_STORE_BACKEND = 'memory'  # 'memory' (this process) or 'disk' (shared by all workers on this host)
+RESULT_STORE_DIR = os.path.join(PROJECT_ROOT, 'results')  # Used by the 'disk' backend
+RESULT_STORE_CAPACITY = 256  # Results kept, least recently used are dropped first
+RESULT_STORE_MAX_BYTES = 256 * 1024 * 1024  # Mostly decoded frames
+RESULT_STORE_TTL_SECONDS = 1800  # Results unused for this long expire
+
+# Result cache for repeated images
+RESULT_CACHE_ENABLED = True
+RESULT_CACHE_KEY_MODE = 'exact'  # 'exact' (image bytes) or 'perceptual' (near-duplicate frames)
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+RESULT_CACHE_TTL_SECONDS = 600
 
 # Model configuration
 FACE_DETECTION_CONFIDENCE = 0.6
+FACE_NMS_THRESHOLD = 0.4  # IoU above which overlapping face boxes are merged
+MAX_FACES = 10  # Faces analyzed per image
 GENDER_PREDICTION_THRESHOLD = 0.4
 
-# Ensure directories exist
-os.makedirs(MODELS_DIR, exist_ok=True)
-os.makedirs(DATA_DIR, exist_ok=True)
-os.makedirs(STATIC_DIR, exist_ok=True)
-os.makedirs(TEMPLATES_DIR, exist_ok=True)
+# Gender model runtime: 'keras', 'tflite', 'onnx' or 'opencv'
+GENDER_MODEL_BACKEND = 'keras'
+GENDER_MODEL_FILE = None  # e.g. 'Gender_Prediction_model_int8.tflite'
+GENDER_MODEL_THREADS = None  # CPU threads for tflite/onnx, None = runtime default
+
+# Multi-process inference (utils.inference_pool); 0 runs the models in the app process
+INFERENCE_PROCESSES = 0
+INFERENCE_THREADS_PER_PROCESS = 1  # OpenCV/TensorFlow threads in each worker
+INFERENCE_POOL_SLOTS = 4  # Shared-memory frame slots (frames in flight) per worker
+INFERENCE_POOL_BATCH = 4  # Queued frames a worker analyzes together
+INFERENCE_POOL_TIMEOUT_SECONDS = 30.0  # Longest wait for a result; a worker holding a request longer is restarted
+
+# Deterministic stand-in models (utils.stub_models) for load tests without model files
+USE_STUB_MODELS = False
+STUB_FACE_LATENCY_MS = 15.0  # Simulated detector time per image
+STUB_GENDER_LATENCY_MS = 4.0  # Simulated fixed cost per gender batch
+STUB_GENDER_PER_ITEM_MS = 1.0  # Simulated extra cost per face
+
+# Gender inference micro-batching
+GENDER_BATCH_MAX_SIZE = 16  # Faces per predict call
+GENDER_BATCH_MAX_WAIT_MS = 5.0  # Longest wait for a batch to fill
+GENDER_BATCH_TIMEOUT_SECONDS = 30.0  # Longest wait for a batched prediction (503 afterwards)
+
+# Per-request profiling (X-Profile header or ?profile=1, with the profiling token)
+PROFILING_ENABLED = True
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')  # Sent as X-Profile-Token; unset disables profiling and /profiles
+PROFILE_TRUSTED_NETWORKS = ()  # Optionally also require a client network, e.g. ('10.0.0.0/8',); () = any
+PROFILE_DIR = os.path.join(PROJECT_ROOT, 'profiles')
+PROFILE_CAPACITY = 20  # Oldest profiles are deleted beyond this
+
+# ASGI serving mode (src/asgi.py)
+ASGI_INFERENCE_WORKERS = 4  # Threads running detection requests
+ASGI_ADMISSION_QUEUE = 16  # Detection requests allowed to wait for a thread
+ASGI_INFERENCE_PATHS = ('/detect_face', '/upload_image', '/detect_faces_batch')
+ASGI_LIGHT_WORKERS = 8  # Threads for every other route
+ASGI_OVERLOAD_STATUS = 503  # Or 429; sent with Retry-After when the queue is full
+ASGI_REQUEST_DEADLINE_SECONDS = 30.0  # Dropped if not started by then (clients give up at 60s)
+ASGI_MAX_DEADLINE_SECONDS = 60.0  # Cap for the X-Request-Timeout header
+
+# Camera streaming over WebSocket (ASGI mode only)
+STREAM_PATH = '/ws/camera'
+STREAM_MAX_CONNECTIONS = 32
+STREAM_MAX_FRAME_BYTES = 1 * 1024 * 1024
+STREAM_DECODE_MAX_PIXELS = 640 * 480  # Live frames are analyzed at about VGA resolution
+STREAM_FRAME_DEADLINE_SECONDS = 1.0  # A frame not started by then is skipped
+
+# Reverse proxies in front of the app (e.g. nginx before gunicorn) whose
+# X-Forwarded-For / X-Forwarded-Proto headers are trusted; 0 = none, use the socket address
+TRUSTED_PROXY_COUNT = 0
+
+# Pre-fork production server (gunicorn -c gunicorn.conf.py)
+PREFORK_WORKERS = None  # None = one per CPU core
+PREFORK_REQUEST_THREADS = 4  # Concurrent requests per worker
+PREFORK_INFERENCE_THREADS = None  # OpenCV/TensorFlow threads per worker, None = cores / workers
+PREFORK_MAX_REQUESTS = 10000  # Recycle a worker after this many requests, 0 = never
+
+# Real-time video (tools/realtime.py)
+REALTIME_DETECT_EVERY = 5  # Run the face detector at least every K frames, track in between
+REALTIME_MIN_TRACK_SCORE = 0.6  # Template match score below which the detector runs early
+REALTIME_SMOOTHING = 0.3  # Weight of the newest gender score / skin colour per track
+
+# Startup
+WARMUP_ON_STARTUP = True  # Load and warm both models before serving traffic
+
+
+def ensure_directories():
+    """Create the model, data, static and template directories if missing."""
+    for path in (MODELS_DIR, DATA_DIR, STATIC_DIR, TEMPLATES_DIR):
+        os.makedirs(path, exist_ok=True)
+
 
-print(f"""
+def print_banner():
+    """Print the resolved directory configuration."""
+    print(f"""
 ╔════════════════════════════════════════════╗
 ║  Fashion Recommendation Configuration     ║
 ╠════════════════════════════════════════════╣
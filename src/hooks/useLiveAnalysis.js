@@ -0,0 +1,115 @@
+import { useEffect, useState } from 'react';
+import { detectFace } from '../services/api';
+import { openCameraStream } from '../services/cameraStream';
+
+// Fallback when the live WebSocket is unavailable (server not in ASGI mode)
+const HTTP_FRAME_INTERVAL_MS = 1000;
+const HTTP_FRAME_MAX_WIDTH = 640;
+
+// Same key as the server's recommendation_id, for responses without one
+function recommendationId(skinTone, gender) {
+  if (!skinTone || !gender) return null;
+  return `${skinTone.split(' -')[0].trim().toLowerCase()}|${gender.trim().toLowerCase()}`;
+}
+
+function captureFrame(video, canvas) {
+  if (!video.videoWidth || !video.videoHeight) return null;
+  const scale = Math.min(1, HTTP_FRAME_MAX_WIDTH / video.videoWidth);
+  canvas.width = Math.round(video.videoWidth * scale);
+  canvas.height = Math.round(video.videoHeight * scale);
+  canvas.getContext('2d').drawImage(video, 0, 0, canvas.width, canvas.height);
+  return canvas.toDataURL('image/jpeg', 0.7);
+}
+
+/**
+ * Analyze a camera feed continuously while `active`.
+ *
+ * Streams frames over the `/ws/camera` WebSocket; if it cannot connect or
+ * drops, falls back to posting one frame per second to `/detect_face`.
+ *
+ * @param {React.RefObject<HTMLVideoElement>} videoRef - Playing camera feed
+ * @param {boolean} active - Analyze while true
+ * @returns {{ live: Object|null, transport: string }} - Latest
+ *   { faces, recommendation, processingMs } and 'websocket' or 'http'
+ */
+export function useLiveAnalysis(videoRef, active) {
+  const [live, setLive] = useState(null);
+  const [transport, setTransport] = useState('websocket');
+
+  useEffect(() => {
+    if (!active) {
+      setLive(null);
+      setTransport('websocket');
+    }
+  }, [active]);
+
+  useEffect(() => {
+    if (!active || transport !== 'websocket' || !videoRef.current) return undefined;
+    const stream = openCameraStream(videoRef.current, {
+      onUpdate: setLive,
+      onError: (err) => {
+        console.warn('⚠ Live stream unavailable, analyzing over HTTP instead:', err.message);
+        setTransport('http');
+      },
+    });
+    return () => stream.close();
+  }, [active, transport, videoRef]);
+
+  useEffect(() => {
+    if (!active || transport !== 'http') return undefined;
+    const canvas = document.createElement('canvas');
+    let cancelled = false;
+    let timer = null;
+    let stylesEtag = null;
+    let recommendation = null;
+
+    const analyzeNext = async () => {
+      const started = performance.now();
+      const video = videoRef.current;
+      const frame = video && captureFrame(video, canvas);
+      if (frame) {
+        try {
+          const data = await detectFace(frame, { mode: 'boxes', stylesEtag });
+          // Boxes refer to the frame as sent, map them back to the video
+          const scale = video.videoWidth / canvas.width || 1;
+          if (!data.clothing_styles_unchanged) {
+            // Matches the WebSocket's ids, so switching transport does not refetch
+            const id = 'recommendation_id' in data ? data.recommendation_id : recommendationId(data.skin_tone, data.gender);
+            recommendation = id ? { id, clothing_styles: data.clothing_styles } : null;
+          }
+          stylesEtag = data.clothing_styles_etag;
+          if (!cancelled) {
+            setLive({
+              faces: data.faces.map((face, index) => ({
+                ...face,
+                id: index,
+                box: {
+                  x: face.box.x * scale,
+                  y: face.box.y * scale,
+                  w: face.box.w * scale,
+                  h: face.box.h * scale,
+                },
+              })),
+              recommendation,
+              processingMs: Math.round(performance.now() - started),
+            });
+          }
+        } catch (err) {
+          // 'No face detected' or a failed request: clear the overlay, keep trying
+          if (!cancelled) setLive({ faces: [], recommendation, processingMs: null });
+        }
+      }
+      if (!cancelled) {
+        timer = setTimeout(analyzeNext, Math.max(0, HTTP_FRAME_INTERVAL_MS - (performance.now() - started)));
+      }
+    };
+
+    analyzeNext();
+    return () => {
+      cancelled = true;
+      if (timer !== null) clearTimeout(timer);
+    };
+  }, [active, transport, videoRef]);
+
+  return { live, transport };
+}
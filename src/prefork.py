@@ -0,0 +1,140 @@
+"""
+Pre-fork production serving helpers, used by gunicorn.conf.py.
+
+The master process imports the app, loads and warms the models that can
+safely cross a fork, freezes the garbage collector and then forks the
+workers. Model weights loaded before the fork stay shared copy-on-write
+between all workers instead of being loaded once per worker.
+
+Which models are loaded in the master depends on the gender backend:
+OpenCV DNN and single-threaded TFLite hold no runtime threads and are
+shared; Keras (TensorFlow) and ONNX Runtime start thread pools that do not
+survive a fork, so each worker loads those itself after forking.
+"""
+import gc
+import os
+import threading
+import time
+
+import config
+
+# Gender backends that may be loaded before forking
+FORK_SAFE_GENDER_BACKENDS = ('opencv', 'tflite')
+
+
+def worker_count():
+    """Workers to fork: config.PREFORK_WORKERS or one per core."""
+    return config.PREFORK_WORKERS or os.cpu_count() or 1
+
+
+def threads_per_worker(workers):
+    """
+    Inference threads per worker so that all workers together use each core once.
+
+    Returns:
+        int: config.PREFORK_INFERENCE_THREADS, or cores divided by workers
+    """
+    if config.PREFORK_INFERENCE_THREADS:
+        return config.PREFORK_INFERENCE_THREADS
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def share_gender_model(threads):
+    # A multi-threaded TFLite interpreter owns a thread pool
+    backend = 'stub' if config.USE_STUB_MODELS else config.GENDER_MODEL_BACKEND
+    return backend in ('stub', 'opencv') or (backend in FORK_SAFE_GENDER_BACKENDS and threads == 1)
+
+
+def preload(workers):
+    """
+    Load and warm shareable models in the master, then freeze the GC.
+
+    Call once in the master before any worker is forked.
+    """
+    import cv2
+    from app import models, prerender_catalog
+
+    threads = threads_per_worker(workers)
+    # No OpenCV thread pool in the master; workers size their own after the fork
+    cv2.setNumThreads(0)
+    config.GENDER_MODEL_THREADS = threads
+
+    started = time.perf_counter()
+    include_gender = share_gender_model(threads)
+    if models.warmup(include_gender=include_gender):
+        shared = 'face detector and gender model' if include_gender else 'face detector'
+        print(f"✓ Preloaded {shared} in the master in {time.perf_counter() - started:.1f}s")
+    else:
+        print(f"⚠ Warning: Preloading models failed: {models.warmup_error}")
+    if workers > 1 and config.RESULT_STORE_BACKEND == 'memory':
+        print("⚠ Warning: Result IDs are only valid in the worker that created them; "
+              "set RESULT_STORE_BACKEND = 'disk' to share them")
+    if config.CATALOG_PRERENDER:
+        # Prepared once here, every worker inherits the caches
+        groups, exports = prerender_catalog()
+        print(f"✓ Pre-compressed {groups} catalog responses and rendered {exports} exports")
+
+    # Keep the collector from touching (and so copying) every preloaded object in each worker
+    gc.collect()
+    gc.freeze()
+    print(f"✓ Forking {workers} workers with {threads} inference thread(s) each")
+
+
+def after_fork(workers):
+    """
+    Prepare a freshly forked worker: size its thread pools and finish warmup.
+
+    Call in every worker right after the fork, before it serves requests.
+    """
+    import cv2
+    from app import catalog, models
+
+    threads = threads_per_worker(workers)
+    cv2.setNumThreads(threads)
+    if not config.USE_STUB_MODELS and config.GENDER_MODEL_BACKEND == 'keras':
+        # Must happen before TensorFlow initializes in this worker
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    models.after_fork()
+    catalog.after_fork()
+    if not models.warmup():
+        print(f"⚠ Warning: Worker {os.getpid()} warmup failed: {models.warmup_error}")
+
+
+def memory_report(master_pid, worker_pids):
+    """
+    Summarize how much memory the workers share with the master.
+
+    Returns:
+        str: Report lines, or None where /proc/<pid>/smaps_rollup is missing
+    """
+    from utils.metrics import process_memory_breakdown
+
+    mb = 1024 * 1024
+    lines = []
+    totals = {'rss': 0, 'pss': 0, 'shared': 0, 'private': 0}
+    for label, pid in [('master', master_pid)] + [(f'worker {pid}', pid) for pid in worker_pids]:
+        memory = process_memory_breakdown(pid)
+        if memory is None:
+            return None
+        for key in totals:
+            totals[key] += memory[key]
+        lines.append(f"  {label:<14} RSS {memory['rss'] / mb:7.1f} MB  PSS {memory['pss'] / mb:7.1f} MB  "
+                     f"shared {memory['shared'] / mb:7.1f} MB  private {memory['private'] / mb:7.1f} MB")
+    saved = totals['rss'] - totals['pss']
+    lines.append(f"  {'total':<14} RSS {totals['rss'] / mb:7.1f} MB  PSS {totals['pss'] / mb:7.1f} MB  "
+                 f"(sharing saves {saved / mb:.1f} MB)")
+    return '\n'.join(lines)
+
+
+def report_memory_later(server, delay=10.0):
+    """Print the memory report from a gunicorn arbiter once workers have warmed up."""
+    def report():
+        time.sleep(delay)
+        text = memory_report(server.pid, sorted(server.WORKERS.keys()))
+        if text is not None:
+            print("Memory after startup (PSS counts shared pages once):\n" + text, flush=True)
+
+    threading.Thread(target=report, name='memory-report', daemon=True).start()
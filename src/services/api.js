@@ -1,6 +1,6 @@
 import axios from 'axios';
 
-const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:5000';
+export const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:5000';
 
 const apiClient = axios.create({
   baseURL: API_BASE_URL,
@@ -10,12 +10,18 @@ const apiClient = axios.create({
 /**
  * Send image to Flask backend for face detection and processing
  * @param {string} imageData - Base64 encoded image data
+ * @param {Object} [options]
+ * @param {string} [options.mode] - Response image: 'boxes' (none), 'crop', 'thumbnail' or 'full'
+ * @param {string} [options.stylesEtag] - `clothing_styles_etag` of an earlier response;
+ *   the style list is left out when it is unchanged
  * @returns {Promise<Object>} - Detection results
  */
-export async function detectFace(imageData) {
+export async function detectFace(imageData, { mode, stylesEtag } = {}) {
   try {
     const formData = new FormData();
     formData.append('image', imageData);
+    if (mode) formData.append('mode', mode);
+    if (stylesEtag) formData.append('styles_etag', stylesEtag);
 
     const response = await apiClient.post('/detect_face', formData, {
       headers: {
@@ -36,13 +42,30 @@ export async function detectFace(imageData) {
   }
 }
 
+/**
+ * Fetch a stored detection result (no inference is re-run)
+ * @param {string} resultId - `result_id` of a detection response
+ * @returns {Promise<Object>} - Gender, skin tone, faces and current recommendations
+ */
+export async function getResult(resultId) {
+  try {
+    const response = await apiClient.get(`/results/${encodeURIComponent(resultId)}`);
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching result:', error);
+    throw new Error(error.response?.data?.error || 'Failed to fetch result');
+  }
+}
+
 /**
  * Download clothing styles as JSON
+ * @param {string} resultId - `result_id` of the detection to export
  * @returns {Promise<Blob>} - JSON blob
  */
-export async function downloadClothingStyles() {
+export async function downloadClothingStyles(resultId) {
   try {
     const response = await apiClient.get('/generate_clothing_styles_json', {
+      params: { result_id: resultId },
       responseType: 'blob',
     });
     return response.data;
@@ -52,4 +75,22 @@ export async function downloadClothingStyles() {
   }
 }
 
+/**
+ * Download clothing styles as a PDF report
+ * @param {string} resultId - `result_id` of the detection to export
+ * @returns {Promise<Blob>} - PDF blob
+ */
+export async function downloadClothingStylesPdf(resultId) {
+  try {
+    const response = await apiClient.get('/generate_clothing_styles_pdf', {
+      params: { result_id: resultId },
+      responseType: 'blob',
+    });
+    return response.data;
+  } catch (error) {
+    console.error('Error downloading clothing styles PDF:', error);
+    throw new Error('Failed to download clothing styles PDF');
+  }
+}
+
 export default apiClient;
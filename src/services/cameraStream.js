@@ -0,0 +1,122 @@
+import { API_BASE_URL } from './api';
+
+/**
+ * Stream frames from a <video> element to the live analysis WebSocket.
+ *
+ * Frames are downscaled and sent as binary JPEG, with at most one frame in
+ * flight: the next frame is captured when the previous result arrives, so a
+ * slow server lowers the frame rate instead of building a backlog. Updates
+ * from the server are incremental; this helper merges them and reports the
+ * full current state.
+ *
+ * Requires the server to run in ASGI mode (`python run.py --asgi`).
+ *
+ * @param {HTMLVideoElement} video - Playing camera feed
+ * @param {Object} options
+ * @param {Function} options.onUpdate - Called with { faces, recommendation, frame, processingMs }
+ * @param {Function} [options.onError] - Called with an Error when the stream fails
+ * @param {number} [options.maxWidth=640] - Width frames are scaled down to
+ * @param {number} [options.quality=0.7] - JPEG quality (0-1)
+ * @param {number} [options.maxFps=15] - Upper bound on frames sent per second
+ * @returns {{ close: Function, reset: Function }}
+ */
+export function openCameraStream(video, { onUpdate, onError, maxWidth = 640, quality = 0.7, maxFps = 15 }) {
+  const url = `${API_BASE_URL.replace(/^http/, 'ws')}/ws/camera`;
+  const socket = new WebSocket(url);
+  const canvas = document.createElement('canvas');
+  const faces = new Map();
+  let recommendation = null;
+  let lastSent = 0;
+  let timer = null;
+  let closed = false;
+
+  const sendFrame = () => {
+    timer = null;
+    if (closed || socket.readyState !== WebSocket.OPEN) return;
+    if (!video.videoWidth || !video.videoHeight) {
+      timer = setTimeout(sendFrame, 100);
+      return;
+    }
+    const scale = Math.min(1, maxWidth / video.videoWidth);
+    canvas.width = Math.round(video.videoWidth * scale);
+    canvas.height = Math.round(video.videoHeight * scale);
+    canvas.getContext('2d').drawImage(video, 0, 0, canvas.width, canvas.height);
+    canvas.toBlob((blob) => {
+      if (blob && !closed && socket.readyState === WebSocket.OPEN) {
+        lastSent = performance.now();
+        socket.send(blob);
+      }
+    }, 'image/jpeg', quality);
+  };
+
+  const scheduleNext = () => {
+    if (timer !== null || closed) return;
+    const wait = Math.max(0, 1000 / maxFps - (performance.now() - lastSent));
+    timer = setTimeout(sendFrame, wait);
+  };
+
+  socket.onopen = sendFrame;
+
+  socket.onmessage = (event) => {
+    const message = JSON.parse(event.data);
+    if (message.type === 'result') {
+      // Box sizes refer to the frame as sent, map them back to the video
+      const scale = video.videoWidth / canvas.width || 1;
+      for (const face of message.faces) {
+        const known = faces.get(face.id) || {};
+        faces.set(face.id, {
+          ...known,
+          ...face,
+          box: {
+            x: face.box.x * scale,
+            y: face.box.y * scale,
+            w: face.box.w * scale,
+            h: face.box.h * scale,
+          },
+        });
+      }
+      for (const id of message.lost || []) {
+        faces.delete(id);
+      }
+      if (message.recommendation) {
+        recommendation = message.recommendation.id ? message.recommendation : null;
+      }
+      onUpdate({
+        faces: Array.from(faces.values()),
+        recommendation,
+        frame: message.frame,
+        processingMs: message.processing_ms,
+      });
+    } else if (message.type === 'error') {
+      console.error('Camera stream frame failed:', message.error);
+    }
+    // 'skipped' frames (server busy) just move on to the next frame
+    scheduleNext();
+  };
+
+  socket.onerror = () => {
+    if (onError) onError(new Error('Camera stream connection failed'));
+  };
+
+  socket.onclose = (event) => {
+    if (!closed && onError) {
+      onError(new Error(`Camera stream closed (code ${event.code})`));
+    }
+    closed = true;
+  };
+
+  return {
+    close() {
+      closed = true;
+      if (timer !== null) clearTimeout(timer);
+      socket.close();
+    },
+    reset() {
+      faces.clear();
+      recommendation = null;
+      if (socket.readyState === WebSocket.OPEN) {
+        socket.send(JSON.stringify({ type: 'reset' }));
+      }
+    },
+  };
+}
@@ -285,9 +285,14 @@ function updateUI(data) {
     const card = document.createElement('div');
     card.className = 'clothing-card';
 
+    // Prefer the locally served thumbnail (tools/build_assets.py) over the remote original
+    const thumbnails = style.image ? style.image.thumbnails.filter((thumb) => thumb.format === 'jpeg') : [];
+    const thumbnail = thumbnails.find((thumb) => thumb.width >= 320) || thumbnails[thumbnails.length - 1];
+    const imageUrl = thumbnail ? thumbnail.url : (style['img-url'] || '');
+
     card.innerHTML = `
       <div class="card-content">
-        <img src="${style['img-url'] || ''}" alt="${style.item || 'Clothing'}" onerror="this.style.display='none'">
+        <img src="${imageUrl}" alt="${style.item || 'Clothing'}" onerror="this.style.display='none'">
         <p><strong>Item:</strong> ${style.item || 'N/A'} <i class="fas fa-tshirt icon"></i></p>
         <p><strong>Fabric:</strong> ${style.fabric || 'N/A'} <i class="fas fa-fabric icon"></i></p>
         <p><strong>Color:</strong> ${style.color || 'N/A'} <i class="fas fa-palette icon"></i></p>
@@ -1,10 +1,25 @@
 """Fashion Recommendation Utilities Package"""
-from .model_loader import load_gender_model, load_face_detection_model
-from .image_processor import process_image, classify_skin_tone
-
-__all__ = [
-    'load_gender_model',
-    'load_face_detection_model',
-    'process_image',
-    'classify_skin_tone'
-]
+import importlib
+
+# Re-exports are resolved on first access so that importing a single
+# submodule (e.g. utils.recommendations) does not pull in OpenCV
+_EXPORTS = {
+    'load_gender_model': 'model_loader',
+    'load_face_detection_model': 'model_loader',
+    'classify_skin_tone': 'skin_tone',
+    'classify_face_skin_tones': 'skin_tone',
+    'detect_faces': 'image_processor',
+    'extract_face_region': 'image_processor',
+    'prepare_face_for_gender_prediction': 'image_processor',
+    'draw_face_rectangle': 'image_processor',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+    globals()[name] = value
+    return value
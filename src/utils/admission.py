@@ -0,0 +1,158 @@
+"""Bounded executor with admission control and request deadlines"""
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Overloaded(Exception):
+    """Raised when the admission queue is full."""
+
+    def __init__(self, retry_after):
+        super().__init__('Server is overloaded, retry later')
+        self.retry_after = retry_after
+
+
+class DeadlineExpired(Exception):
+    """Raised when a request's deadline passed before a worker picked it up."""
+
+    def __init__(self, retry_after):
+        super().__init__('Request deadline expired before inference started')
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Run blocking work on a fixed number of threads behind a bounded queue.
+
+    At most `max_workers` jobs run at once and at most `max_queue` more
+    wait for a thread. Anything beyond that is rejected immediately with
+    `Overloaded`, so that under a burst the server answers quickly instead
+    of letting requests pile up until clients time out. A job whose deadline
+    has passed by the time a thread picks it up is dropped with
+    `DeadlineExpired` without running.
+    """
+
+    def __init__(self, max_workers=4, max_queue=16, name='inference'):
+        """
+        Args:
+            max_workers (int): Threads running jobs
+            max_queue (int): Jobs allowed to wait for a thread
+            name (str): Thread name prefix
+        """
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._running = 0
+        # Moving average of job run time, for Retry-After hints
+        self._service_time = None
+
+        self.shed = 0
+        self.expired = 0
+        self.completed = 0
+
+    @property
+    def queue_depth(self):
+        """Admitted jobs still waiting for a thread."""
+        with self._lock:
+            return self._admitted - self._running
+
+    @property
+    def in_flight(self):
+        """Jobs currently running."""
+        with self._lock:
+            return self._running
+
+    def retry_after(self):
+        """
+        Estimate how long until a new job could start.
+
+        Returns:
+            int: Seconds, at least 1
+        """
+        with self._lock:
+            waiting = self._admitted - self._running
+            service_time = self._service_time or 1.0
+        return max(1, math.ceil((waiting + 1) * service_time / self.max_workers))
+
+    def try_admit(self):
+        """
+        Reserve a place for one job.
+
+        Returns:
+            bool: False when the queue is full; the caller must shed the job
+        """
+        with self._lock:
+            if self._admitted >= self.max_workers + self.max_queue:
+                self.shed += 1
+                return False
+            self._admitted += 1
+            return True
+
+    def release(self):
+        """Give back a place reserved by `try_admit` without running a job."""
+        with self._lock:
+            self._admitted -= 1
+
+    async def run(self, fn, deadline=None):
+        """
+        Run `fn()` on a worker thread using a place reserved by `try_admit`.
+
+        Args:
+            fn (callable): Blocking work
+            deadline (float): `time.monotonic()` value after which the job
+                is dropped if it has not started yet
+
+        Returns:
+            Whatever `fn` returns
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, fn, deadline)
+
+    def _call(self, fn, deadline):
+        with self._lock:
+            expired = deadline is not None and time.monotonic() > deadline
+            if expired:
+                self._admitted -= 1
+                self.expired += 1
+            else:
+                self._running += 1
+        if expired:
+            raise DeadlineExpired(self.retry_after())
+
+        started = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._running -= 1
+                self._admitted -= 1
+                self.completed += 1
+                self._service_time = elapsed if self._service_time is None else (
+                    0.9 * self._service_time + 0.1 * elapsed)
+
+    def stats(self):
+        """
+        Get admission statistics.
+
+        Returns:
+            dict: Limits, current depth and shed/expired counters
+        """
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'running': self._running,
+                'queue_depth': self._admitted - self._running,
+                'completed': self.completed,
+                'shed': self.shed,
+                'expired': self.expired,
+                'mean_service_seconds': self._service_time,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,344 @@
+"""Incremental mirror of catalog images with precomputed thumbnails"""
+import hashlib
+import json
+import os
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from .assets import ASSET_NAME_PATTERN, MANIFEST_VERSION, load_manifest, manifest_path
+
+# Thumbnail encoders: format -> (file extension, OpenCV quality flag)
+THUMBNAIL_ENCODERS = {
+    'webp': ('webp', cv2.IMWRITE_WEBP_QUALITY),
+    'jpeg': ('jpg', cv2.IMWRITE_JPEG_QUALITY),
+}
+
+
+class AssetError(Exception):
+    """A catalog image could not be fetched or processed."""
+
+
+def sniff_extension(data):
+    """
+    Identify a supported image format from its first bytes.
+
+    Returns:
+        str: 'jpg', 'png' or 'webp', or None if unsupported
+    """
+    if data[:3] == b'\xff\xd8\xff':
+        return 'jpg'
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'png'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def content_name(data, extension):
+    """Content-addressed asset name: 'ab/ab12...ef.ext'."""
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    return f'{digest[:2]}/{digest}.{extension}'
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return f'{stat.st_mtime_ns}:{stat.st_size}'
+
+
+class AssetBuilder:
+    """
+    Mirror catalog images into a local, content-addressed asset directory.
+
+    Each image is taken from `source_dir` when a file with the URL's base
+    name exists there, and downloaded otherwise (never when `offline`). The
+    original and every thumbnail are stored under a name derived from their
+    own content, so a file never changes once written and can be cached by
+    clients forever. manifest.json maps each normalized URL to its files.
+
+    Rebuilds are incremental: an image is only fetched again when its local
+    source file changed (or with `refresh`, as a conditional request), and
+    thumbnails are only re-encoded when the thumbnail settings changed.
+    """
+
+    def __init__(self, asset_dir, widths=(160, 320, 640), formats=('webp', 'jpeg'), quality=80,
+                 source_dir=None, offline=False, timeout=15, max_bytes=10 * 1024 * 1024,
+                 max_pixels=40_000_000):
+        """
+        Args:
+            asset_dir (str): Output directory, holds manifest.json
+            widths (tuple): Thumbnail widths in pixels; never upscaled
+            formats (tuple): Thumbnail formats, keys of THUMBNAIL_ENCODERS
+            quality (int): Thumbnail encoder quality (0-100)
+            source_dir (str): Local image directory, checked before downloading
+            offline (bool): Never download; images must be in source_dir or already mirrored
+            timeout (float): Download timeout in seconds
+            max_bytes (int): Largest accepted source image
+            max_pixels (int): Largest accepted source image resolution
+        """
+        for fmt in formats:
+            if fmt not in THUMBNAIL_ENCODERS:
+                raise ValueError(f"Unknown thumbnail format '{fmt}'. Choose from {', '.join(THUMBNAIL_ENCODERS)}")
+        self.asset_dir = asset_dir
+        self.widths = tuple(sorted(set(int(width) for width in widths)))
+        self.formats = tuple(formats)
+        self.quality = int(quality)
+        self.source_dir = source_dir
+        self.offline = offline
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        # Items made with other settings get their thumbnails re-encoded
+        self.spec = f"w={','.join(map(str, self.widths))};f={','.join(self.formats)};q={self.quality}"
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    # Files
+
+    def path(self, name):
+        return os.path.join(self.asset_dir, *name.split('/'))
+
+    def _has(self, name):
+        return bool(name) and os.path.exists(self.path(name))
+
+    def _write(self, name, data):
+        # Content-addressed: an existing file already has these bytes
+        path = self.path(name)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+
+    # Sources
+
+    def local_source(self, url):
+        """Path of the file in source_dir named like the URL, or None."""
+        if not self.source_dir:
+            return None
+        name = os.path.basename(urllib.parse.unquote(urllib.parse.urlsplit(url).path))
+        path = os.path.join(self.source_dir, name)
+        return path if name and os.path.isfile(path) else None
+
+    def _http(self):
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                self._session = requests.Session()
+            return self._session
+
+    def download(self, url, etag=None, last_modified=None):
+        """
+        Download an image, conditionally when validators are given.
+
+        Returns:
+            tuple: (bytes or None if not modified, {'etag', 'last_modified'})
+
+        Raises:
+            AssetError: On network errors, HTTP errors or oversized images
+        """
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        try:
+            with self._http().get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+                if response.status_code == 304:
+                    return None, {'etag': etag, 'last_modified': last_modified}
+                if response.status_code != 200:
+                    raise AssetError(f'HTTP {response.status_code}')
+                chunks = []
+                size = 0
+                for chunk in response.iter_content(64 * 1024):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise AssetError(f'larger than {self.max_bytes} bytes')
+                    chunks.append(chunk)
+                validators = {'etag': response.headers.get('ETag'),
+                              'last_modified': response.headers.get('Last-Modified')}
+                return b''.join(chunks), validators
+        except AssetError:
+            raise
+        except Exception as e:
+            raise AssetError(f'download failed: {e}') from e
+
+    # Images
+
+    def decode(self, data):
+        extension = sniff_extension(data)
+        if extension is None:
+            raise AssetError('not a JPEG, PNG or WebP image')
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise AssetError('image could not be decoded')
+        if image.shape[0] * image.shape[1] > self.max_pixels:
+            raise AssetError(f'more than {self.max_pixels} pixels')
+        return image, extension
+
+    def make_thumbnails(self, image):
+        """
+        Encode and store every configured thumbnail of an image.
+
+        Returns:
+            list: [{'name', 'width', 'height', 'format'}]
+        """
+        height, width = image.shape[:2]
+        thumbnails = []
+        for target in sorted({min(target, width) for target in self.widths}):
+            scaled_height = max(1, round(height * target / width))
+            scaled = image if target == width else cv2.resize(
+                image, (target, scaled_height), interpolation=cv2.INTER_AREA)
+            for fmt in self.formats:
+                extension, quality_flag = THUMBNAIL_ENCODERS[fmt]
+                ok, encoded = cv2.imencode(f'.{extension}', scaled, [quality_flag, self.quality])
+                if not ok:
+                    raise AssetError(f'{fmt} encoding failed')
+                name = content_name(encoded.tobytes(), extension)
+                self._write(name, encoded.tobytes())
+                thumbnails.append({'name': name, 'width': target, 'height': scaled_height, 'format': fmt})
+        return thumbnails
+
+    def _complete(self, entry):
+        return (entry is not None and self._has(entry.get('original'))
+                and all(self._has(thumb['name']) for thumb in entry.get('thumbnails', ())))
+
+    def process(self, url, entry=None, refresh=False):
+        """
+        Bring one image up to date.
+
+        Args:
+            url (str): Normalized image URL
+            entry (dict): Its current manifest item, if any
+            refresh (bool): Re-validate downloaded images with the origin
+
+        Returns:
+            tuple: (status, manifest item); status is 'unchanged',
+            'thumbnails' (re-encoded from the stored original) or 'fetched'
+
+        Raises:
+            AssetError: If the image cannot be fetched or processed
+        """
+        complete = self._complete(entry)
+        source_path = self.local_source(url)
+        data = None
+
+        if source_path is not None:
+            source = {'file': os.path.basename(source_path), 'signature': file_signature(source_path)}
+            if not (complete and entry.get('source') == source):
+                with open(source_path, 'rb') as file:
+                    data = file.read(self.max_bytes + 1)
+                if len(data) > self.max_bytes:
+                    raise AssetError(f'larger than {self.max_bytes} bytes')
+        elif complete and (self.offline or not refresh):
+            source = entry.get('source')
+        elif self.offline:
+            raise AssetError('not in the source directory (offline)')
+        else:
+            validators = (entry.get('source') or {}) if complete else {}
+            data, source = self.download(url, validators.get('etag'), validators.get('last_modified'))
+
+        if data is None:
+            # Same original as before; only the thumbnail settings may differ
+            if entry.get('spec') == self.spec:
+                return 'unchanged', entry
+            with open(self.path(entry['original']), 'rb') as file:
+                image, _ = self.decode(file.read())
+            return 'thumbnails', dict(entry, source=source, spec=self.spec, thumbnails=self.make_thumbnails(image))
+
+        image, extension = self.decode(data)
+        original = content_name(data, extension)
+        if complete and original == entry['original'] and entry.get('spec') == self.spec:
+            # Touched but identical file
+            return 'unchanged', dict(entry, source=source)
+        self._write(original, data)
+        return 'fetched', {
+            'original': original,
+            'width': int(image.shape[1]),
+            'height': int(image.shape[0]),
+            'bytes': len(data),
+            'source': source,
+            'spec': self.spec,
+            'thumbnails': self.make_thumbnails(image),
+        }
+
+    # Whole catalog
+
+    def build(self, urls, refresh=False, workers=8, prune=False, progress=None):
+        """
+        Mirror a set of images and rewrite the manifest.
+
+        Items of URLs no longer in `urls` are dropped from the manifest; with
+        `prune`, files no item refers to are deleted too. An image that fails
+        keeps its previous manifest item, if any.
+
+        Args:
+            urls (iterable): Normalized image URLs
+            refresh (bool): Re-validate downloaded images with the origin
+            workers (int): Images processed in parallel
+            prune (bool): Delete unreferenced files
+            progress (callable): Called with (url, status, error) per image
+
+        Returns:
+            dict: Counts per status, 'failed' {url: error} and 'removed' files
+        """
+        os.makedirs(self.asset_dir, exist_ok=True)
+        previous = load_manifest(manifest_path(self.asset_dir))['items']
+        urls = sorted(set(url for url in urls if url))
+        summary = {'unchanged': 0, 'thumbnails': 0, 'fetched': 0, 'failed': {}, 'removed': 0}
+        items = {}
+
+        def run(url):
+            try:
+                return url, self.process(url, previous.get(url), refresh), None
+            except (AssetError, OSError) as e:
+                return url, None, str(e)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for url, result, error in executor.map(run, urls):
+                if error is not None:
+                    summary['failed'][url] = error
+                    if url in previous:
+                        items[url] = previous[url]
+                else:
+                    status, items[url] = result
+                    summary[status] += 1
+                if progress is not None:
+                    progress(url, result[0] if result else 'failed', error)
+
+        self.write_manifest(items)
+        if prune:
+            summary['removed'] = self.prune(items)
+        return summary
+
+    def write_manifest(self, items):
+        """Replace the manifest, unless it already has these items (which would trigger a catalog reload)."""
+        manifest = {'version': MANIFEST_VERSION, 'spec': self.spec, 'items': items}
+        path = manifest_path(self.asset_dir)
+        if load_manifest(path) == manifest:
+            return
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(manifest, file, indent=1, sort_keys=True)
+        os.replace(temp_path, path)
+
+    def prune(self, items):
+        """Delete asset files that no manifest item refers to."""
+        referenced = set()
+        for entry in items.values():
+            referenced.add(entry['original'])
+            referenced.update(thumb['name'] for thumb in entry.get('thumbnails', ()))
+        removed = 0
+        for directory, _, files in os.walk(self.asset_dir):
+            for file_name in files:
+                path = os.path.join(directory, file_name)
+                name = os.path.relpath(path, self.asset_dir).replace(os.sep, '/')
+                if (ASSET_NAME_PATTERN.fullmatch(name) or name.endswith('.tmp')) and name not in referenced:
+                    os.remove(path)
+                    removed += 1
+        return removed
@@ -0,0 +1,94 @@
+"""Locally mirrored catalog images: URL normalization and the asset manifest"""
+import json
+import os
+import re
+import urllib.parse
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# Content-addressed file names: two-character fan-out directory, 32 hex digits
+ASSET_NAME_PATTERN = re.compile(r'[0-9a-f]{2}/[0-9a-f]{32}\.(?:jpg|png|webp)')
+
+ASSET_MIMETYPES = {'jpg': 'image/jpeg', 'png': 'image/png', 'webp': 'image/webp'}
+
+
+def normalize_image_url(url):
+    """
+    Normalize a catalog image URL.
+
+    Strips surrounding whitespace (the catalog has stray spaces), defaults
+    protocol-relative URLs to https, lower-cases the scheme and host and
+    percent-encodes characters that are not valid in a URL.
+
+    Args:
+        url (str): URL as written in the catalog
+
+    Returns:
+        str: Normalized URL, '' for a blank value
+    """
+    url = str(url or '').strip()
+    if not url:
+        return ''
+    if url.startswith('//'):
+        url = 'https:' + url
+    parts = urllib.parse.urlsplit(url)
+    return urllib.parse.urlunsplit((
+        parts.scheme.lower(),
+        parts.netloc.lower(),
+        urllib.parse.quote(parts.path, safe="/%:@!$&'()*+,;=-._~"),
+        urllib.parse.quote(parts.query, safe="=&%:@!$'()*+,;/?-._~"),
+        '',
+    ))
+
+
+def manifest_path(asset_dir):
+    return os.path.join(asset_dir, MANIFEST_NAME)
+
+
+def load_manifest(path):
+    """
+    Read an asset manifest.
+
+    Args:
+        path (str): manifest.json written by tools/build_assets.py
+
+    Returns:
+        dict: Manifest, with an empty 'items' mapping if the file is missing
+            or unreadable
+    """
+    try:
+        with open(path, 'rb') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return {'version': MANIFEST_VERSION, 'items': {}}
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('items'), dict):
+        return {'version': MANIFEST_VERSION, 'items': {}}
+    return manifest
+
+
+def style_image(entry, url_prefix):
+    """
+    Describe the local copies of one catalog image for API responses.
+
+    Args:
+        entry (dict): Manifest item, or None
+        url_prefix (str): Path the asset endpoint is mounted at, e.g. '/assets'
+
+    Returns:
+        dict: {'original', 'width', 'height', 'thumbnails': [{'url', 'width',
+            'height', 'format'}]} smallest first, or None without an entry
+    """
+    if not entry or not entry.get('original'):
+        return None
+    prefix = url_prefix.rstrip('/')
+    return {
+        'original': f"{prefix}/{entry['original']}",
+        'width': entry['width'],
+        'height': entry['height'],
+        'thumbnails': [
+            {'url': f"{prefix}/{thumb['name']}", 'width': thumb['width'], 'height': thumb['height'],
+             'format': thumb['format']}
+            for thumb in sorted(entry.get('thumbnails', ()), key=lambda thumb: (thumb['width'], thumb['format']))
+        ],
+    }
@@ -0,0 +1,121 @@
+"""Collect images from multipart and zip batch uploads"""
+import io
+import os
+import zipfile
+
+from .image_decode import ImageDecodeError, ImageTooLargeError
+
+ZIP_MIMETYPES = {'application/zip', 'application/x-zip-compressed'}
+
+
+class BatchLimitError(ImageTooLargeError):
+    """Raised when a batch upload exceeds the per-batch limits."""
+
+
+def _is_zip(file_storage):
+    filename = (file_storage.filename or '').lower()
+    return filename.endswith('.zip') or file_storage.mimetype in ZIP_MIMETYPES
+
+
+def _file_reader(stream, max_file_size):
+    # Read one byte past the limit so oversized files fail decoding without buffering them
+    return lambda: stream.read(max_file_size + 1)
+
+
+def _detach_stream(file_storage):
+    """
+    Take ownership of an uploaded file's stream.
+
+    Flask closes request files when the view returns, which is before a
+    streamed response has read them.
+    """
+    stream = file_storage.stream
+    file_storage.stream = io.BytesIO()
+    return stream
+
+
+class BatchImages:
+    """
+    Images of a batch upload, readable after the request has finished.
+
+    Attributes:
+        items (list): (name, read) pairs where `read()` returns image bytes
+    """
+
+    def __init__(self, items, streams):
+        self.items = items
+        self._streams = streams
+
+    def __len__(self):
+        return len(self.items)
+
+    def close(self):
+        """Close the uploaded file streams."""
+        for stream in self._streams:
+            stream.close()
+        self._streams = []
+
+
+def _zip_reader(archive, info, max_file_size):
+    def read():
+        if info.file_size > max_file_size:
+            raise ImageTooLargeError(f'Image exceeds the {max_file_size} byte limit')
+        with archive.open(info) as member:
+            return member.read(max_file_size + 1)
+    return read
+
+
+def collect_batch_images(files, allowed_extensions, max_images, max_total_bytes, max_file_size):
+    """
+    List the images of a batch upload without reading their contents.
+
+    Multipart files are taken as-is; zip archives contribute every member
+    whose extension is allowed. Limits are checked up front, using the
+    declared sizes of zip members, so a rejected batch costs no decoding.
+
+    Args:
+        files (list): werkzeug FileStorage objects
+        allowed_extensions (set): Lower-case extensions accepted inside zips
+        max_images (int): Maximum number of images in the batch
+        max_total_bytes (int): Maximum uncompressed size of the batch
+        max_file_size (int): Maximum size of a single image
+
+    Returns:
+        BatchImages: The images; call `close()` once they have been read
+    """
+    items = []
+    streams = []
+    total_bytes = 0
+    try:
+        for file_storage in files:
+            if not file_storage:
+                continue
+            stream = _detach_stream(file_storage)
+            streams.append(stream)
+            if not _is_zip(file_storage):
+                items.append((file_storage.filename, _file_reader(stream, max_file_size)))
+                continue
+            try:
+                archive = zipfile.ZipFile(stream)
+            except zipfile.BadZipFile:
+                raise ImageDecodeError(f"'{file_storage.filename}' is not a valid zip archive") from None
+            for info in archive.infolist():
+                extension = os.path.splitext(info.filename)[1].lower().lstrip('.')
+                if info.is_dir() or extension not in allowed_extensions:
+                    continue
+                total_bytes += info.file_size
+                if total_bytes > max_total_bytes:
+                    raise BatchLimitError(f'Batch exceeds the {max_total_bytes} byte limit')
+                items.append((info.filename, _zip_reader(archive, info, max_file_size)))
+
+            if len(items) > max_images:
+                break
+
+        if len(items) > max_images:
+            raise BatchLimitError(f'Batch exceeds the {max_images} image limit')
+    except Exception:
+        # Nothing will read these images, so nothing else would close them
+        for stream in streams:
+            stream.close()
+        raise
+    return BatchImages(items, streams)
@@ -0,0 +1,172 @@
+"""Dynamic micro-batching for model inference"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Collect single samples from concurrent callers into batched predictions.
+
+    Callers submit one sample at a time. A background thread waits for the
+    first pending sample, then keeps collecting until either `max_batch_size`
+    samples are queued or `max_wait_ms` has passed since that first sample
+    arrived. The batch is run through `predict_fn` in a single call and each
+    output row is handed back to the caller that submitted the sample.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=5.0, name='micro-batcher', on_batch=None):
+        """
+        Args:
+            predict_fn (callable): Takes an array of shape (N, ...) and returns
+                an array whose first dimension is N
+            max_batch_size (int): Upper bound on samples per predict call
+            max_wait_ms (float): Longest time the oldest queued sample waits
+                for the batch to fill up
+            name (str): Name of the worker thread
+            on_batch (callable): Called after every batch with the batch
+                size and the list of per-sample queue waits in seconds
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self.on_batch = on_batch
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._closed = False
+
+        self._batches = 0
+        self._items = 0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+        self._batch_size_max = 0
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, sample):
+        """
+        Queue one sample for batched prediction.
+
+        Args:
+            sample (np.ndarray): A single sample without the batch dimension
+
+        Returns:
+            Future: Resolves to the prediction row for this sample
+        """
+        if self._closed:
+            raise RuntimeError(f"{self.name} is closed")
+        self._ensure_started()
+        future = Future()
+        self._queue.put((sample, future, time.perf_counter()))
+        return future
+
+    def predict(self, sample, timeout=None):
+        """
+        Submit one sample and block until its prediction is ready.
+
+        Args:
+            sample (np.ndarray): A single sample without the batch dimension
+            timeout (float): Seconds to wait, or None to wait forever
+
+        Returns:
+            np.ndarray: Prediction row for this sample
+        """
+        return self.submit(sample).result(timeout=timeout)
+
+    def close(self):
+        """Stop the worker thread once the queued samples are processed."""
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        """
+        Get batching statistics.
+
+        Returns:
+            dict: Batch counts, batch occupancy and queue-wait times
+        """
+        with self._stats_lock:
+            batches = self._batches
+            items = self._items
+            mean_batch = items / batches if batches else 0.0
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'batches': batches,
+                'items': items,
+                'mean_batch_size': mean_batch,
+                'max_observed_batch_size': self._batch_size_max,
+                'occupancy': mean_batch / self.max_batch_size,
+                'mean_queue_wait_ms': (self._queue_wait_total / items * 1000.0) if items else 0.0,
+                'max_queue_wait_ms': self._queue_wait_max * 1000.0,
+                'queue_depth': self._queue.qsize(),
+            }
+
+    def queue_depth(self):
+        """Number of samples waiting for a batch."""
+        return self._queue.qsize()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            started = time.perf_counter()
+            waits = [started - enqueued for _, _, enqueued in batch]
+
+            futures = [future for _, future, _ in batch]
+            try:
+                outputs = self.predict_fn(np.stack([sample for sample, _, _ in batch]))
+                if len(outputs) != len(futures):
+                    raise ValueError(f"{self.name} got {len(outputs)} outputs for a batch of {len(futures)}")
+                for future, output in zip(futures, outputs):
+                    future.set_result(output)
+            except Exception as e:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._batch_size_max = max(self._batch_size_max, len(batch))
+                self._queue_wait_total += sum(waits)
+                self._queue_wait_max = max(self._queue_wait_max, max(waits))
+            if self.on_batch is not None:
+                try:
+                    self.on_batch(len(batch), waits)
+                except Exception as e:
+                    # The worker thread must survive, or every later sample waits forever
+                    print(f"⚠ Warning: {self.name} on_batch callback failed: {e}")
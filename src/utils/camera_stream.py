@@ -0,0 +1,91 @@
+"""Per-connection state for streaming camera analysis"""
+import time
+
+
+class CameraStream:
+    """
+    Analyze the frames of one live camera connection.
+
+    Each connection owns a `RealtimeEngine`, so faces are tracked between
+    frames and the detector does not run on every frame. Updates are
+    incremental: every face carries its track id and box, but gender and
+    skin tone are only included when they changed for that track, and the
+    recommendation is only included when the primary face's recommendation
+    changes.
+    """
+
+    def __init__(self, engine, recommendation_index, decode):
+        """
+        Args:
+            engine (RealtimeEngine): Tracker/analyzer for this connection
+            recommendation_index (CatalogStore): Clothing catalog
+            decode (callable): Turns JPEG bytes into a `DecodedImage`
+        """
+        self.engine = engine
+        self.recommendation_index = recommendation_index
+        self.decode = decode
+        self.frames = 0
+        self.dropped = 0
+        self._sent = {}
+        self._recommendation_id = None
+
+    def process(self, data, frame_number):
+        """
+        Analyze one encoded frame and describe what changed.
+
+        Blocking; run it on a worker thread.
+
+        Args:
+            data (bytes): JPEG or PNG frame
+            frame_number (int): Sequence number of the frame on this connection
+
+        Returns:
+            dict: Update message, see docs/README.md
+        """
+        started = time.perf_counter()
+        decoded = self.decode(data)
+        faces, detected = self.engine.process(decoded.frame)
+        self.frames += 1
+
+        update = {'type': 'result', 'frame': frame_number, 'detected': detected, 'faces': []}
+        seen = {}
+        for face in faces:
+            x, y, w, h = decoded.to_original(face['box'])
+            entry = {'id': face['id'], 'box': {'x': x, 'y': y, 'w': w, 'h': h}}
+            state = (face['gender'], face['skin_tone'])
+            previous = self._sent.get(face['id'], (None, None))
+            if state[0] != previous[0]:
+                entry['gender'] = state[0]
+            if state[1] != previous[1]:
+                entry['skin_tone'] = state[1]
+            seen[face['id']] = state
+            update['faces'].append(entry)
+
+        lost = sorted(set(self._sent) - set(seen))
+        if lost:
+            update['lost'] = lost
+        self._sent = seen
+
+        # The longest-tracked face drives the recommendations, so they do not flip between people
+        primary = min(faces, key=lambda face: face['id']) if faces else None
+        recommendation_id = None
+        if primary is not None and primary['skin_tone'] is not None:
+            recommendation_id = self.recommendation_index.recommendation_id(primary['skin_tone'], primary['gender'])
+        if recommendation_id != self._recommendation_id:
+            self._recommendation_id = recommendation_id
+            update['recommendation'] = {
+                'id': recommendation_id,
+                'face_id': primary['id'] if recommendation_id is not None else None,
+                'clothing_styles': self.recommendation_index.styles(
+                    primary['skin_tone'], primary['gender'], default=[]) if recommendation_id is not None else [],
+            }
+
+        update['dropped'] = self.dropped
+        update['processing_ms'] = round((time.perf_counter() - started) * 1000.0, 1)
+        return update
+
+    def reset(self):
+        """Forget all tracks, e.g. after the client switched cameras."""
+        self.engine.reset()
+        self._sent = {}
+        self._recommendation_id = None
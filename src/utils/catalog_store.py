@@ -0,0 +1,537 @@
+"""Indexed, hot-reloadable clothing catalog backed by SQLite"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import urllib.parse
+
+from .assets import load_manifest, normalize_image_url, style_image
+from .http_cache import Payload, json_with_fragments
+from .recommendations import normalize_gender, normalize_skin_tone
+
+SCHEMA_VERSION = 2
+
+# Style fields with a secondary (word) index, usable as query filters
+FILTER_FIELDS = ('fabric', 'color', 'item')
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE styles (
+    id INTEGER PRIMARY KEY,
+    skin_tone TEXT NOT NULL,
+    gender TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX styles_group ON styles (skin_tone, gender, id);
+CREATE TABLE terms (
+    field TEXT NOT NULL,
+    term TEXT NOT NULL,
+    style_id INTEGER NOT NULL,
+    PRIMARY KEY (field, term, style_id)
+) WITHOUT ROWID;
+"""
+
+
+def tokenize(value):
+    """
+    Split a field value into lower-case index terms.
+
+    Args:
+        value (str): e.g. "Silk, Velvet"
+
+    Returns:
+        set: e.g. {'silk', 'velvet'}
+    """
+    return set(re.findall(r'[a-z0-9]+', str(value or '').lower()))
+
+
+def source_signature(path):
+    """Cheap change marker for the source file: 'mtime_ns:size', '' if it is missing."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return ''
+    return f'{stat.st_mtime_ns}:{stat.st_size}'
+
+
+def catalog_signature(source_path, manifest_path=None):
+    """Change marker of the catalog inputs: the source and the optional asset manifest."""
+    signature = source_signature(source_path)
+    if manifest_path and signature:
+        signature += f'|{source_signature(manifest_path)}'
+    return signature
+
+
+def attach_assets(style, assets, url_prefix):
+    """
+    Normalize a style's image URL and add its local copies, if mirrored.
+
+    Args:
+        style (dict): Catalog style, modified in place
+        assets (dict): Manifest items by normalized URL
+        url_prefix (str): Path of the asset endpoint
+    """
+    if 'img-url' not in style:
+        return
+    style['img-url'] = normalize_image_url(style['img-url'])
+    image = style_image(assets.get(style['img-url']), url_prefix)
+    if image is not None:
+        style['image'] = image
+
+
+def build_catalog(source_path, db_path, manifest_path=None, asset_url_prefix='/assets'):
+    """
+    Compile the JSON catalog into an indexed SQLite file.
+
+    The database is written next to `db_path` and moved into place with an
+    atomic rename, so readers never see a partly written file. A missing
+    source compiles to an empty catalog. Image URLs are normalized, and
+    styles whose image is in the asset manifest get an 'image' entry
+    pointing at the local copies.
+
+    Args:
+        source_path (str): JSON catalog, {skin_tone: {gender: [style, ...]}}
+        db_path (str): Database file to create or replace
+        manifest_path (str): Asset manifest from tools/build_assets.py, optional
+        asset_url_prefix (str): Path the asset endpoint is mounted at
+
+    Returns:
+        str: Catalog version (content hash of the source and manifest)
+
+    Raises:
+        ValueError: If the source is not a valid catalog
+    """
+    signature = catalog_signature(source_path, manifest_path)
+    raw = b'{}'
+    if source_signature(source_path):
+        with open(source_path, 'rb') as file:
+            raw = file.read()
+    try:
+        catalog = json.loads(raw)
+    except ValueError as e:
+        raise ValueError(f"Invalid catalog JSON: {e}") from e
+    if not isinstance(catalog, dict) or not all(isinstance(v, dict) for v in catalog.values()):
+        raise ValueError("Catalog must map skin tones to {gender: [style, ...]}")
+    assets = load_manifest(manifest_path)['items'] if manifest_path else {}
+    digest = hashlib.sha256(raw)
+    digest.update(json.dumps(assets, sort_keys=True).encode('utf-8'))
+    version = digest.hexdigest()[:16]
+
+    temp_path = f'{db_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    connection = sqlite3.connect(temp_path)
+    try:
+        connection.execute('PRAGMA journal_mode = OFF')
+        connection.execute('PRAGMA synchronous = OFF')
+        connection.executescript(_SCHEMA)
+        style_id = 0
+        styles = []
+        terms = []
+        for skin_tone, by_gender in catalog.items():
+            for gender, items in by_gender.items():
+                for style in items:
+                    style_id += 1
+                    if isinstance(style, dict):
+                        attach_assets(style, assets, asset_url_prefix)
+                    styles.append((style_id, normalize_skin_tone(skin_tone), normalize_gender(gender),
+                                   json.dumps(style, separators=(',', ':'))))
+                    if isinstance(style, dict):
+                        for field in FILTER_FIELDS:
+                            terms.extend((field, term, style_id) for term in tokenize(style.get(field)))
+        connection.executemany('INSERT INTO styles VALUES (?, ?, ?, ?)', styles)
+        connection.executemany('INSERT OR IGNORE INTO terms VALUES (?, ?, ?)', terms)
+        connection.executemany('INSERT INTO meta VALUES (?, ?)', [
+            ('schema', str(SCHEMA_VERSION)),
+            ('version', version),
+            ('source_signature', signature),
+            ('styles', str(style_id)),
+        ])
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(temp_path, db_path)
+    return version
+
+
+def read_meta(db_path):
+    """
+    Read the metadata of a catalog database.
+
+    Returns:
+        dict: Metadata, or None if the file is missing or not a catalog
+    """
+    if not os.path.exists(db_path):
+        return None
+    try:
+        connection = _connect(db_path)
+        try:
+            return dict(connection.execute('SELECT key, value FROM meta'))
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return None
+
+
+def _connect(db_path):
+    # A compiled file is never modified in place (rebuilds rename a new file
+    # over the path), so an open connection sees one unchanging file and can
+    # use immutable mode: no locking, no change checks
+    uri = f"file:{urllib.parse.quote(os.path.abspath(db_path))}?mode=ro&immutable=1"
+    return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+
+def encode_cursor(style_id):
+    return str(style_id)
+
+
+def decode_cursor(cursor):
+    """
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    if cursor in (None, ''):
+        return 0
+    if not str(cursor).isdigit():
+        raise ValueError('Invalid cursor')
+    return int(cursor)
+
+
+class CatalogSnapshot:
+    """
+    One immutable version of the catalog.
+
+    The snapshot opens its database once and shares that read-only
+    connection between threads under a lock. An open connection keeps the
+    file it was opened on even after a rebuild renames a newer file over
+    `db_path`, so metadata, cursors and query results always come from the
+    same catalog version. Lookups of a whole
+    (skin tone, gender) group are cached for the life of the snapshot, so
+    recommendation lookups on the detection path stay in memory. With each
+    group the serialized list and the compressed `/get_clothing_styles`
+    payload are kept, so they are encoded once per catalog version.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._connection = _connect(db_path)
+        self._lock = threading.Lock()
+        meta = dict(self._execute('SELECT key, value FROM meta'))
+        self.version = meta['version']
+        self.source_signature = meta['source_signature']
+        self.size = int(meta['styles'])
+        self.groups = frozenset(self._execute('SELECT DISTINCT skin_tone, gender FROM styles'))
+        self._empty = ([], b'[]', Payload(json_with_fragments({}, {'clothing_styles': b'[]'})))
+        self._cache = {}
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._connection.execute(sql, params).fetchall()
+
+    def reopen(self):
+        """
+        Replace the connection inherited from a parent process.
+
+        Returns:
+            bool: False if `db_path` now holds another catalog version, in
+            which case the snapshot cannot be reopened and must be discarded
+        """
+        connection = _connect(self.db_path)
+        try:
+            version = connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        except sqlite3.Error:
+            version = None
+        if version is None or version[0] != self.version:
+            connection.close()
+            return False
+        self._connection = connection
+        self._lock = threading.Lock()
+        return True
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, key):
+        skin_tone, gender = key
+        return (normalize_skin_tone(skin_tone), normalize_gender(gender)) in self.groups
+
+    def _group(self, skin_tone, gender):
+        """(styles, serialized list, response payload) of a group, built on first use."""
+        key = (normalize_skin_tone(skin_tone), normalize_gender(gender))
+        if key not in self.groups:
+            return self._empty
+        entry = self._cache.get(key)
+        if entry is None:
+            rows = [data for data, in self._execute(
+                'SELECT data FROM styles WHERE skin_tone = ? AND gender = ? ORDER BY id', key)]
+            styles = [json.loads(data) for data in rows]
+            # Rows are stored as compact JSON already
+            fragment = ('[' + ','.join(rows) + ']').encode('utf-8')
+            entry = (styles, fragment, Payload(json_with_fragments({}, {'clothing_styles': fragment})))
+            self._cache[key] = entry
+        return entry
+
+    def precompress(self):
+        """
+        Build and compress the response payload of every group.
+
+        Returns:
+            int: Number of groups
+        """
+        for skin_tone, gender in self.groups:
+            self._group(skin_tone, gender)[2].precompress()
+        return len(self.groups)
+
+    def styles(self, skin_tone, gender, default=None):
+        """
+        Look up all clothing styles for a skin tone and gender.
+
+        Args:
+            skin_tone (str): Skin tone label, with or without undertone
+            gender (str): Gender label
+            default: Value returned when there is no match
+
+        Returns:
+            list: Clothing styles, or `default` when not found
+        """
+        key = (normalize_skin_tone(skin_tone), normalize_gender(gender))
+        if key not in self.groups:
+            return default
+        return self._group(*key)[0]
+
+    def styles_fragment(self, skin_tone, gender):
+        """
+        Get the serialized style list, for embedding in other responses.
+
+        Returns:
+            bytes: UTF-8 JSON array, '[]' when not found
+        """
+        return self._group(skin_tone, gender)[1]
+
+    def response_payload(self, skin_tone, gender):
+        """
+        Get the `{"clothing_styles": [...]}` response as a cached payload.
+
+        Returns:
+            Payload: Body with ETag and compressed variants, an empty list when not found
+        """
+        return self._group(skin_tone, gender)[2]
+
+    def response_body(self, skin_tone, gender):
+        """
+        Get the serialized `{"clothing_styles": [...]}` response body.
+
+        Returns:
+            bytes: UTF-8 encoded JSON, with an empty list when not found
+        """
+        return self._group(skin_tone, gender)[2].body
+
+    def recommendation_id(self, skin_tone, gender):
+        """
+        Get a stable identifier for the group matching a skin tone and gender.
+
+        Returns:
+            str: 'skin tone|gender' catalog key, or None when not found
+        """
+        key = (normalize_skin_tone(skin_tone), normalize_gender(gender))
+        return '|'.join(key) if key in self.groups else None
+
+    def query(self, skin_tone=None, gender=None, filters=None, limit=None, cursor=None):
+        """
+        Page through styles, optionally filtered by indexed fields.
+
+        A filter matches styles whose field contains every word of the
+        filter value, e.g. {'fabric': 'silk'} matches "Silk, Velvet".
+
+        Args:
+            skin_tone (str): Restrict to a skin tone (any undertone suffix is ignored)
+            gender (str): Restrict to a gender
+            filters (dict): {field: words} for fields in FILTER_FIELDS
+            limit (int): Page size, None for all remaining styles
+            cursor (str): `next_cursor` of the previous page
+
+        Returns:
+            tuple: (styles, next_cursor); next_cursor is None on the last page
+
+        Raises:
+            ValueError: For unknown filter fields or a malformed cursor
+        """
+        clauses = ['id > ?']
+        params = [decode_cursor(cursor)]
+        if skin_tone:
+            clauses.append('skin_tone = ?')
+            params.append(normalize_skin_tone(skin_tone))
+        if gender:
+            clauses.append('gender = ?')
+            params.append(normalize_gender(gender))
+        for field, value in (filters or {}).items():
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"Unknown filter '{field}'. Choose from {', '.join(FILTER_FIELDS)}")
+            words = tokenize(value)
+            if not words:
+                continue
+            for word in sorted(words):
+                clauses.append('id IN (SELECT style_id FROM terms WHERE field = ? AND term = ?)')
+                params.extend((field, word))
+
+        sql = f"SELECT id, data FROM styles WHERE {' AND '.join(clauses)} ORDER BY id"
+        if limit is not None:
+            # One extra row tells whether there is a next page
+            sql += ' LIMIT ?'
+            params.append(int(limit) + 1)
+        rows = self._execute(sql, params)
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][0])
+        return [json.loads(data) for _, data in rows], next_cursor
+
+
+class CatalogStore:
+    """
+    The current catalog snapshot, rebuilt when the JSON source changes.
+
+    The JSON file stays the editable source of truth; it is compiled into
+    an indexed SQLite file that all processes open read-only. At most every
+    `check_interval` seconds an access stats the source, and when it changed
+    a new database is built and renamed over the old one. The new snapshot
+    is then swapped in with a single assignment: requests that already hold
+    the old snapshot finish on it, and a broken source keeps the old one.
+    """
+
+    def __init__(self, source_path, db_path, check_interval=2.0, manifest_path=None, asset_url_prefix='/assets'):
+        """
+        Args:
+            source_path (str): JSON catalog
+            db_path (str): Compiled SQLite catalog
+            check_interval (float): Seconds between source change checks,
+                0 checks on every access, None never
+            manifest_path (str): Asset manifest; changes to it reload the catalog too
+            asset_url_prefix (str): Path the asset endpoint is mounted at
+        """
+        self.source_path = source_path
+        self.db_path = db_path
+        self.manifest_path = manifest_path
+        self.asset_url_prefix = asset_url_prefix
+        self.check_interval = check_interval
+        self.reloads = 0
+        self.error = None
+        self._failed_signature = None
+        self._listeners = []
+        self._reload_lock = threading.Lock()
+        self._checked = time.monotonic()
+        self._snapshot = self._open()
+
+    def _open(self):
+        """Open the compiled catalog, building it if it is missing or stale."""
+        meta = read_meta(self.db_path)
+        signature = catalog_signature(self.source_path, self.manifest_path)
+        usable = meta is not None and meta.get('schema') == str(SCHEMA_VERSION)
+        if not signature:
+            # Without a source, serve the last compiled catalog (or an empty one)
+            print(f"⚠ Warning: Clothing catalog {self.source_path} not found")
+            stale = not usable
+        else:
+            stale = not usable or meta.get('source_signature') != signature
+        if stale:
+            build_catalog(self.source_path, self.db_path, self.manifest_path, self.asset_url_prefix)
+        return CatalogSnapshot(self.db_path)
+
+    def add_reload_listener(self, callback):
+        """
+        Call `callback(snapshot)` after every successful reload.
+
+        Callbacks run on the thread that noticed the change, inside a
+        request; they should hand slow work to a background thread.
+        """
+        self._listeners.append(callback)
+
+    def current(self):
+        """
+        Get the current snapshot, reloading first if the source changed.
+
+        Returns:
+            CatalogSnapshot: Use one snapshot for a whole request
+        """
+        if self.check_interval is not None:
+            now = time.monotonic()
+            if now - self._checked >= self.check_interval:
+                self._checked = now
+                self.reload_if_changed()
+        return self._snapshot
+
+    def reload_if_changed(self):
+        """
+        Rebuild and swap the snapshot if the source file changed.
+
+        Returns:
+            bool: True if a new snapshot was swapped in
+        """
+        signature = catalog_signature(self.source_path, self.manifest_path)
+        # A vanished source (e.g. mid-save) keeps the current snapshot; a broken one is tried once
+        if not signature or signature in (self._snapshot.source_signature, self._failed_signature):
+            return False
+        # Another thread is already rebuilding; keep serving the old snapshot
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            snapshot = self._open()
+            previous, self._snapshot = self._snapshot, snapshot
+            self.reloads += 1
+            self.error = None
+            print(f"✓ Clothing catalog reloaded: {snapshot.size} styles (version {snapshot.version}, "
+                  f"was {previous.version})")
+        except (OSError, ValueError, sqlite3.Error) as e:
+            self.error = str(e)
+            self._failed_signature = signature
+            print(f"⚠ Warning: Keeping clothing catalog version {self._snapshot.version}, reload failed: {e}")
+            return False
+        finally:
+            self._reload_lock.release()
+        for callback in self._listeners:
+            callback(snapshot)
+        return True
+
+    def after_fork(self):
+        """Reopen the SQLite connection inherited from the parent; call in a forked child."""
+        self._reload_lock = threading.Lock()
+        if not self._snapshot.reopen():
+            # Rebuilt since the parent opened it; load whatever is current now
+            self._snapshot = self._open()
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'version': snapshot.version,
+            'styles': snapshot.size,
+            'groups': len(snapshot.groups),
+            'reloads': self.reloads,
+            'error': self.error,
+        }
+
+    # Shortcuts to the current snapshot, for the detection path
+
+    def styles(self, skin_tone, gender, default=None):
+        return self.current().styles(skin_tone, gender, default)
+
+    def response_body(self, skin_tone, gender):
+        return self.current().response_body(skin_tone, gender)
+
+    def response_payload(self, skin_tone, gender):
+        return self.current().response_payload(skin_tone, gender)
+
+    def styles_fragment(self, skin_tone, gender):
+        return self.current().styles_fragment(skin_tone, gender)
+
+    def recommendation_id(self, skin_tone, gender):
+        return self.current().recommendation_id(skin_tone, gender)
+
+    def __len__(self):
+        return len(self.current())
+
+    def __contains__(self, key):
+        return key in self.current()
@@ -0,0 +1,238 @@
+"""In-memory JSON and PDF exports of clothing recommendations"""
+import io
+import json
+import threading
+from collections import OrderedDict
+from xml.sax.saxutils import escape
+
+EXPORT_FORMATS = {
+    'json': ('application/json', 'clothing_styles.json'),
+    'pdf': ('application/pdf', 'clothing_styles.pdf'),
+}
+
+# Style fields printed in the PDF, in order; the item is the heading
+PDF_FIELDS = (
+    ('fabric', 'Fabric'),
+    ('texture', 'Texture'),
+    ('color', 'Color'),
+    ('gradient', 'Gradient'),
+    ('traditional_aspect', 'Traditional aspect'),
+)
+
+NO_STYLES_FOUND = ["No recommended clothing styles found"]
+
+
+class ExportUnavailableError(RuntimeError):
+    """The requested export format cannot be rendered in this environment."""
+
+
+def render_json(skin_tone, gender, styles):
+    """
+    Render the JSON report.
+
+    Args:
+        skin_tone (str): Skin tone label as detected
+        gender (str): Gender label as detected
+        styles (list): Recommended clothing styles
+
+    Returns:
+        bytes: UTF-8 encoded JSON
+    """
+    report = {'gender': gender, 'skin_tone': skin_tone, 'clothing_styles': styles}
+    return json.dumps(report, indent=4).encode('utf-8')
+
+
+def render_pdf(skin_tone, gender, styles):
+    """
+    Render the PDF report into memory.
+
+    The document is rendered with reportlab's invariant mode, so the same
+    input always produces the same bytes.
+
+    Args:
+        skin_tone (str): Skin tone label as detected
+        gender (str): Gender label as detected
+        styles (list): Recommended clothing styles
+
+    Returns:
+        bytes: PDF document
+
+    Raises:
+        ExportUnavailableError: If reportlab is not installed
+    """
+    try:
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.lib.units import mm
+        from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+    except ImportError as e:
+        raise ExportUnavailableError("PDF export needs reportlab: pip install reportlab") from e
+
+    sheet = getSampleStyleSheet()
+    story = [
+        Paragraph('Personalized Clothing Recommendations', sheet['Title']),
+        Paragraph(f'<b>Gender:</b> {escape(str(gender))} &nbsp; <b>Skin tone:</b> {escape(str(skin_tone))}',
+                  sheet['Normal']),
+        Spacer(1, 6 * mm),
+    ]
+    for number, style in enumerate(styles, start=1):
+        if not isinstance(style, dict):
+            story.append(Paragraph(escape(str(style)), sheet['Normal']))
+            continue
+        story.append(Paragraph(f"{number}. {escape(str(style.get('item', 'Style')))}", sheet['Heading3']))
+        for field, label in PDF_FIELDS:
+            if style.get(field):
+                story.append(Paragraph(f'<b>{label}:</b> {escape(str(style[field]))}', sheet['Normal']))
+        story.append(Spacer(1, 3 * mm))
+
+    buffer = io.BytesIO()
+    document = SimpleDocTemplate(buffer, pagesize=A4, invariant=1, title='Clothing Recommendations',
+                                 leftMargin=18 * mm, rightMargin=18 * mm, topMargin=18 * mm, bottomMargin=18 * mm)
+    document.build(story)
+    return buffer.getvalue()
+
+
+RENDERERS = {'json': render_json, 'pdf': render_pdf}
+
+
+class ExportCache:
+    """
+    Rendered exports keyed by (skin tone, gender, format).
+
+    The classifier emits only a few dozen distinct (skin tone, gender)
+    labels, so every export is rendered once per catalog version and then
+    served from memory. The cache is emptied when the catalog version
+    changes; `prerender` fills it ahead of the first download.
+    """
+
+    def __init__(self, catalog, capacity=256):
+        """
+        Args:
+            catalog (CatalogStore): Source of the recommended styles
+            capacity (int): Maximum number of rendered exports kept
+        """
+        self.catalog = catalog
+        self.capacity = max(1, int(capacity))
+        self.hits = 0
+        self.misses = 0
+        self.prerendered = 0
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self._prerender_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, skin_tone, gender, fmt):
+        """
+        Get an export, rendering it on a miss.
+
+        Args:
+            skin_tone (str): Skin tone label as detected (kept verbatim in the report)
+            gender (str): Gender label as detected
+            fmt (str): One of EXPORT_FORMATS
+
+        Returns:
+            tuple: (body bytes, mimetype, filename)
+
+        Raises:
+            ValueError: For an unknown format
+            ExportUnavailableError: If the format cannot be rendered here
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format '{fmt}'. Choose from {', '.join(EXPORT_FORMATS)}")
+        snapshot = self.catalog.current()
+        key = (skin_tone, gender, fmt)
+        with self._lock:
+            self._sync_version(snapshot.version)
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return (body,) + EXPORT_FORMATS[fmt]
+            self.misses += 1
+
+        # Render outside the lock; two concurrent misses just render twice
+        body = RENDERERS[fmt](skin_tone, gender, snapshot.styles(skin_tone, gender, default=NO_STYLES_FOUND))
+        self._store(snapshot.version, key, body)
+        return (body,) + EXPORT_FORMATS[fmt]
+
+    def _sync_version(self, version):
+        # Caller holds self._lock
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def _store(self, version, key, body):
+        with self._lock:
+            # The catalog changed while rendering; the result is already stale
+            if version != self._version:
+                return
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def prerender(self, labels, genders=('Male', 'Female'), formats=tuple(EXPORT_FORMATS), background=False):
+        """
+        Render the exports of every label combination the catalog knows.
+
+        Args:
+            labels (iterable): Skin tone labels the classifier can emit
+            genders (iterable): Gender labels the classifier can emit
+            formats (iterable): Export formats to render
+            background (bool): Render in a daemon thread
+
+        Returns:
+            threading.Thread or int: The started thread, or the number of
+            exports rendered
+        """
+        if background:
+            thread = threading.Thread(target=self.prerender, args=(labels, genders, formats),
+                                      name='export-prerender', daemon=True)
+            thread.start()
+            return thread
+
+        # One pass at a time; a reload during a pass starts another one afterwards
+        with self._prerender_lock:
+            snapshot = self.catalog.current()
+            formats = list(formats)
+            rendered = 0
+            for skin_tone in dict.fromkeys(labels):
+                for gender in genders:
+                    if (skin_tone, gender) not in snapshot:
+                        continue
+                    for fmt in list(formats):
+                        key = (skin_tone, gender, fmt)
+                        with self._lock:
+                            self._sync_version(snapshot.version)
+                            if key in self._entries:
+                                continue
+                        try:
+                            body = RENDERERS[fmt](skin_tone, gender, snapshot.styles(skin_tone, gender))
+                        except ExportUnavailableError as e:
+                            print(f"⚠ Warning: Not pre-rendering {fmt} exports: {e}")
+                            formats.remove(fmt)
+                            continue
+                        self._store(snapshot.version, key, body)
+                        rendered += 1
+            self.prerendered += rendered
+            return rendered
+
+    def stats(self):
+        """
+        Get cache statistics.
+
+        Returns:
+            dict: Entry count, memory use and hit/miss counters
+        """
+        with self._lock:
+            return {
+                'catalog_version': self._version,
+                'entries': len(self._entries),
+                'bytes': sum(len(body) for body in self._entries.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'prerendered': self.prerendered,
+            }
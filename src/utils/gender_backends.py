@@ -0,0 +1,311 @@
+"""Pluggable inference runtimes for the gender prediction model"""
+import os
+import threading
+
+import numpy as np
+
+GENDER_MODEL_INPUT_SIZE = (128, 128)
+
+# Keras models shipped with the app, in load order
+KERAS_MODEL_FILES = ('Gender_Prediction_model.h5', 'GenderPredictionModel.h5')
+
+# Default artifact names produced by the export helpers
+BACKEND_MODEL_FILES = {
+    'keras': KERAS_MODEL_FILES,
+    'tflite': ('Gender_Prediction_model.tflite',
+               'Gender_Prediction_model_float16.tflite',
+               'Gender_Prediction_model_int8.tflite'),
+    'onnx': ('Gender_Prediction_model.onnx',),
+    'opencv': ('Gender_Prediction_model.onnx',),
+}
+
+
+class GenderBackend:
+    """
+    Common interface for gender model runtimes.
+
+    Every backend takes a float32 batch of shape (N, 128, 128, 3) scaled to
+    [0, 1] and returns the model output with shape (N, 1).
+    """
+
+    name = 'base'
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+
+    def predict_batch(self, batch):
+        """
+        Run the model on a batch of prepared faces.
+
+        Args:
+            batch (np.ndarray): Faces of shape (N, 128, 128, 3)
+
+        Returns:
+            np.ndarray: Predictions of shape (N, 1)
+        """
+        raise NotImplementedError
+
+    # Keep Keras-style call sites working
+    def predict(self, batch, **kwargs):
+        return self.predict_batch(batch)
+
+    def predict_on_batch(self, batch):
+        return self.predict_batch(batch)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({os.path.basename(self.model_path)!r})"
+
+
+class KerasBackend(GenderBackend):
+    """Full TensorFlow/Keras runtime for the original `.h5` model."""
+
+    name = 'keras'
+
+    def __init__(self, model_path):
+        super().__init__(model_path)
+        import tensorflow as tf
+        self.model = tf.keras.models.load_model(model_path)
+
+    def predict_batch(self, batch):
+        return np.asarray(self.model.predict_on_batch(np.asarray(batch, dtype=np.float32)))
+
+
+class TFLiteBackend(GenderBackend):
+    """
+    TensorFlow Lite runtime.
+
+    Uses the standalone `tflite_runtime` package when installed and falls
+    back to the interpreter bundled with TensorFlow. Quantized input and
+    output tensors are (de)quantized transparently.
+    """
+
+    name = 'tflite'
+
+    def __init__(self, model_path, num_threads=None):
+        super().__init__(model_path)
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        # The interpreter holds mutable tensor buffers
+        self._lock = threading.Lock()
+
+    def _resize(self, batch_size):
+        if batch_size == self._batch_size:
+            return
+        shape = [batch_size] + [int(d) for d in self._input['shape'][1:]]
+        self.interpreter.resize_tensor_input(self._input['index'], shape)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = batch_size
+
+    def predict_batch(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        with self._lock:
+            self._resize(len(batch))
+
+            scale, zero_point = self._input['quantization']
+            if self._input['dtype'] != np.float32 and scale:
+                batch = np.round(batch / scale + zero_point)
+            self.interpreter.set_tensor(self._input['index'], batch.astype(self._input['dtype']))
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self._output['index']).copy()
+
+            scale, zero_point = self._output['quantization']
+            if self._output['dtype'] != np.float32 and scale:
+                output = (output.astype(np.float32) - zero_point) * scale
+        return output.astype(np.float32)
+
+
+class OnnxBackend(GenderBackend):
+    """ONNX Runtime on the CPU execution provider."""
+
+    name = 'onnx'
+
+    def __init__(self, model_path, num_threads=None):
+        super().__init__(model_path)
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict_batch(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        return self.session.run(None, {self._input_name: batch})[0]
+
+
+class OpenCVBackend(GenderBackend):
+    """OpenCV DNN runtime for an exported ONNX model (no extra dependencies)."""
+
+    name = 'opencv'
+
+    def __init__(self, model_path):
+        super().__init__(model_path)
+        import cv2
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+        self._lock = threading.Lock()
+
+    def predict_batch(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        with self._lock:
+            self.net.setInput(batch)
+            return self.net.forward()
+
+
+BACKENDS = {
+    'keras': KerasBackend,
+    'tflite': TFLiteBackend,
+    'onnx': OnnxBackend,
+    'opencv': OpenCVBackend,
+}
+
+
+def create_backend(backend, model_path, **kwargs):
+    """
+    Instantiate a backend by name.
+
+    Args:
+        backend (str): One of 'keras', 'tflite', 'onnx', 'opencv'
+        model_path (str): Path to the model artifact for that backend
+        **kwargs: Backend specific options such as `num_threads`
+
+    Returns:
+        GenderBackend: Loaded backend
+    """
+    try:
+        backend_cls = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown gender model backend '{backend}'. Choose from {sorted(BACKENDS)}")
+    if backend_cls in (KerasBackend, OpenCVBackend):
+        kwargs.pop('num_threads', None)
+    return backend_cls(model_path, **kwargs)
+
+
+def find_model_file(models_dir, backend, model_file=None):
+    """
+    Resolve the model artifact to load for a backend.
+
+    Args:
+        models_dir (str): Directory containing model files
+        backend (str): Backend name
+        model_file (str): Explicit file name, overrides the defaults
+
+    Returns:
+        str: Path to the first existing artifact, or None
+    """
+    candidates = (model_file,) if model_file else BACKEND_MODEL_FILES.get(backend, ())
+    for name in candidates:
+        path = os.path.join(models_dir, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def load_gender_backend(models_dir, backend='keras', model_file=None, num_threads=None):
+    """
+    Load the gender model on the requested runtime.
+
+    Falls back to the Keras `.h5` model when the requested runtime or its
+    artifact is not available.
+
+    Args:
+        models_dir (str): Directory containing model files
+        backend (str): Preferred backend name
+        model_file (str): Explicit artifact file name for that backend
+        num_threads (int): CPU threads for runtimes that support it
+
+    Returns:
+        GenderBackend: Loaded backend, or None if no model could be loaded
+    """
+    attempts = [(backend, model_file)]
+    if backend != 'keras':
+        attempts.append(('keras', None))
+
+    for name, file_name in attempts:
+        path = find_model_file(models_dir, name, file_name)
+        if path is None:
+            print(f"✗ No model file found for gender backend '{name}' in {models_dir}")
+            continue
+        try:
+            model = create_backend(name, path, num_threads=num_threads)
+            print(f"✓ Successfully loaded gender model from {path} ({name} backend)")
+            return model
+        except Exception as e:
+            print(f"✗ Error loading gender model from {path} ({name} backend): {e}")
+    return None
+
+
+def export_tflite(keras_model_path, output_path, quantization=None, representative_samples=None):
+    """
+    Convert the Keras gender model to TensorFlow Lite.
+
+    Args:
+        keras_model_path (str): Path to the `.h5` model
+        output_path (str): Where to write the `.tflite` file
+        quantization (str): None, 'float16' or 'int8'
+        representative_samples (np.ndarray): Prepared faces used to
+            calibrate activation ranges, required for 'int8'
+
+    Returns:
+        str: `output_path`
+    """
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(keras_model_path)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    if quantization == 'float16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        if representative_samples is None or len(representative_samples) == 0:
+            raise ValueError("int8 quantization needs representative samples")
+
+        def representative_dataset():
+            for sample in representative_samples:
+                yield [np.expand_dims(sample.astype(np.float32), axis=0)]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+    elif quantization is not None:
+        raise ValueError(f"Unsupported quantization '{quantization}'")
+
+    with open(output_path, 'wb') as f:
+        f.write(converter.convert())
+    return output_path
+
+
+def export_onnx(keras_model_path, output_path, opset=13):
+    """
+    Convert the Keras gender model to ONNX (requires `tf2onnx`).
+
+    The exported graph has a dynamic batch dimension and is usable by both
+    the 'onnx' and 'opencv' backends.
+
+    Args:
+        keras_model_path (str): Path to the `.h5` model
+        output_path (str): Where to write the `.onnx` file
+        opset (int): ONNX opset version
+
+    Returns:
+        str: `output_path`
+    """
+    import tensorflow as tf
+    import tf2onnx
+
+    model = tf.keras.models.load_model(keras_model_path)
+    height, width = GENDER_MODEL_INPUT_SIZE
+    spec = (tf.TensorSpec((None, height, width, 3), tf.float32, name='input'),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=output_path)
+    return output_path
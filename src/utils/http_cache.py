@@ -0,0 +1,210 @@
+"""Precompressed, validator-carrying HTTP payloads"""
+import gzip
+import hashlib
+import json
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # Optional: pip install brotli
+    brotli = None
+
+# Preferred first when the client accepts several equally
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 1024
+
+# Compression levels for bodies built per request; cached payloads use the maximum
+FAST_LEVELS = {'gzip': 6, 'br': 5}
+
+
+def compress(body, encoding, level=None):
+    """
+    Compress a body with a content coding.
+
+    Args:
+        body (bytes): Uncompressed body
+        encoding (str): 'gzip' or 'br'
+        level (int): gzip level (1-9) or brotli quality (0-11), maximum by default
+
+    Returns:
+        bytes: Compressed body
+    """
+    if encoding == 'gzip':
+        # mtime=0 keeps the output, and so its ETag, stable
+        return gzip.compress(body, compresslevel=9 if level is None else level, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(body, quality=11 if level is None else level)
+    raise ValueError(f"Unsupported content coding '{encoding}'")
+
+
+def parse_accept_encoding(header):
+    """
+    Parse an Accept-Encoding header.
+
+    Returns:
+        dict: {coding: q-value}, lower-cased codings
+    """
+    accepted = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate_encoding(header, available=ENCODINGS):
+    """
+    Pick the content coding to send.
+
+    Args:
+        header (str): Accept-Encoding request header
+        available (tuple): Codings the payload has, in server preference order
+
+    Returns:
+        str: The chosen coding, or 'identity' for an uncompressed body
+    """
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0.0)
+    best, best_q = 'identity', 0.0
+    for coding in available:
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def etag_matches(if_none_match, etags):
+    """
+    Weak comparison of an If-None-Match header against a set of ETags.
+
+    Args:
+        if_none_match (str): Header value
+        etags (iterable): Quoted ETags the client's copy may match; only
+            those of the representation that would be sent, since each
+            content coding is a different representation
+
+    Returns:
+        bool: True if the client's copy is current
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    current = {etag[2:] if etag.startswith('W/') else etag for etag in etags}
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate in current:
+            return True
+    return False
+
+
+class Payload:
+    """
+    One response body with a strong ETag and its compressed variants.
+
+    The ETag is derived from the content, so every worker and every catalog
+    version with the same body agree on it. Each content coding is a
+    separate representation with its own ETag suffix (`"…-br"`, `"…-gz"`),
+    as caches require. Compressed variants are made on first use, or all at
+    once with `precompress()`, and then kept for the life of the payload.
+    """
+
+    ETAG_SUFFIXES = {'identity': '', 'gzip': '-gz', 'br': '-br'}
+
+    def __init__(self, body, mimetype='application/json', min_compress_bytes=MIN_COMPRESS_BYTES, levels=None):
+        """
+        Args:
+            body (bytes): Uncompressed body
+            mimetype (str): Content type
+            min_compress_bytes (int): Smaller bodies are always sent uncompressed
+            levels (dict): {coding: level}, e.g. FAST_LEVELS for one-off bodies;
+                maximum compression by default
+        """
+        self.body = body
+        self.mimetype = mimetype
+        self.levels = levels or {}
+        self.digest = hashlib.sha256(body).hexdigest()[:32]
+        self.compressible = len(body) >= min_compress_bytes
+        self._encoded = {'identity': body}
+
+    def etag(self, encoding='identity'):
+        return f'"{self.digest}{self.ETAG_SUFFIXES[encoding]}"'
+
+    def encoded(self, encoding):
+        """Body in a content coding, compressing it on first use."""
+        data = self._encoded.get(encoding)
+        if data is None:
+            # Concurrent first uses compress twice; the results are identical
+            data = self._encoded[encoding] = compress(self.body, encoding, self.levels.get(encoding))
+        return data
+
+    def precompress(self):
+        """Make every compressed variant now, e.g. before the first request."""
+        if self.compressible:
+            for encoding in ENCODINGS:
+                self.encoded(encoding)
+        return self
+
+    def response(self, request, cache_control='no-cache'):
+        """
+        Build the response for a request.
+
+        Sends 304 Not Modified when a GET/HEAD request's If-None-Match holds
+        the ETag of the encoding negotiated for it, and otherwise that
+        encoding's body.
+
+        Args:
+            request: Flask request
+            cache_control (str): Cache-Control header; the default 'no-cache'
+                lets clients keep the body but revalidate it every time
+
+        Returns:
+            flask.Response
+        """
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding')) if self.compressible else 'identity'
+        if request.method in ('GET', 'HEAD') and etag_matches(request.headers.get('If-None-Match'), [self.etag(encoding)]):
+            response = Response(status=304)
+        else:
+            response = Response(self.encoded(encoding), mimetype=self.mimetype)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.headers['ETag'] = self.etag(encoding)
+        response.headers['Cache-Control'] = cache_control
+        if self.compressible:
+            response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+
+def json_with_fragments(data, fragments):
+    """
+    Serialize a JSON object with some values already serialized.
+
+    Lets a response embed a cached body (e.g. a recommendation list) without
+    encoding it again.
+
+    Args:
+        data (dict): Regular members
+        fragments (dict): {key: UTF-8 JSON bytes}, appended as members
+
+    Returns:
+        bytes: UTF-8 JSON object
+    """
+    members = [json.dumps(data, separators=(',', ':')).encode('utf-8')[1:-1]] if data else []
+    for key, fragment in fragments.items():
+        members.append(json.dumps(key).encode('utf-8') + b':' + fragment)
+    return b'{' + b','.join(members) + b'}'
@@ -0,0 +1,198 @@
+"""Bounded-resolution image decoding for uploaded and captured images"""
+import base64
+import struct
+
+import cv2
+import numpy as np
+
+# cv2.imdecode flags for each power-of-two reduction factor
+REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# JPEG start-of-frame markers carry the image dimensions
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+class ImageDecodeError(ValueError):
+    """Raised when image data is missing, malformed or cannot be decoded."""
+
+    status_code = 400
+
+
+class ImageTooLargeError(ImageDecodeError):
+    """Raised when image data exceeds the configured byte or pixel limits."""
+
+    status_code = 413
+
+
+class DecodedImage:
+    """
+    A decoded BGR frame plus the mapping back to the source image.
+
+    Attributes:
+        frame (np.ndarray): Decoded BGR image, possibly at reduced resolution
+        original_size (tuple): (width, height) of the source image
+        scale (tuple): (x, y) factors from frame to source coordinates
+    """
+
+    __slots__ = ('frame', 'original_size', 'scale')
+
+    def __init__(self, frame, original_size):
+        self.frame = frame
+        self.original_size = original_size
+        height, width = frame.shape[:2]
+        self.scale = (original_size[0] / width, original_size[1] / height)
+
+    def to_original(self, box):
+        """
+        Map an (x, y, w, h) box in frame coordinates to source coordinates.
+
+        Args:
+            box (tuple): Bounding box in frame coordinates
+
+        Returns:
+            tuple: Bounding box in source image coordinates
+        """
+        x, y, w, h = box
+        sx, sy = self.scale
+        return (int(round(x * sx)), int(round(y * sy)), int(round(w * sx)), int(round(h * sy)))
+
+
+def data_url_to_bytes(image_data, max_bytes=None):
+    """
+    Decode a base64 data URL (or bare base64 string) to raw image bytes.
+
+    Args:
+        image_data (str): "data:image/...;base64,..." or plain base64
+        max_bytes (int): Reject payloads that decode to more than this
+
+    Returns:
+        bytes: Encoded image bytes
+    """
+    if not image_data:
+        raise ImageDecodeError('No image data provided')
+    _, _, payload = image_data.rpartition(',')
+    if max_bytes is not None and len(payload) * 3 // 4 > max_bytes:
+        raise ImageTooLargeError(f'Image exceeds the {max_bytes} byte limit')
+    try:
+        return base64.b64decode(payload)
+    except (ValueError, TypeError):
+        raise ImageDecodeError('Image data is not valid base64')
+
+
+def _jpeg_size(view):
+    offset = 2
+    end = len(view)
+    while offset + 9 <= end:
+        if view[offset] != 0xFF:
+            return None
+        marker = view[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            offset += 2
+            continue
+        (length,) = struct.unpack('>H', view[offset + 2:offset + 4])
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>HH', view[offset + 5:offset + 9])
+            return width, height
+        offset += 2 + length
+    return None
+
+
+def image_size(data):
+    """
+    Read (width, height) from the image header without decoding pixels.
+
+    JPEG and PNG headers are parsed directly; other formats fall back to a
+    lazy PIL open, which also only reads the header.
+
+    Args:
+        data (bytes | memoryview): Encoded image bytes
+
+    Returns:
+        tuple: (width, height), or None when the header is unreadable
+    """
+    view = memoryview(data)
+    if view[:2] == b'\xff\xd8':
+        return _jpeg_size(view)
+    if view[:8] == b'\x89PNG\r\n\x1a\n' and len(view) >= 24:
+        return struct.unpack('>II', view[16:24])
+    try:
+        from io import BytesIO
+        from PIL import Image
+        with Image.open(BytesIO(view)) as image:
+            return image.size
+    except Exception:
+        return None
+
+
+def reduction_factor(size, max_pixels):
+    """
+    Pick the smallest power-of-two reduction that fits within max_pixels.
+
+    Args:
+        size (tuple): (width, height) of the source image
+        max_pixels (int): Pixel budget for the decoded frame
+
+    Returns:
+        int: 1, 2, 4 or 8
+    """
+    if not max_pixels or size is None:
+        return 1
+    width, height = size
+    for factor in (1, 2, 4):
+        if (width // factor) * (height // factor) <= max_pixels:
+            return factor
+    return 8
+
+
+def decode_image(data, max_bytes=None, max_pixels=None, target_pixels=None):
+    """
+    Decode image bytes to a 3-channel BGR frame with a bounded resolution.
+
+    The buffer is handed to `cv2.imdecode` without copying. Large JPEGs are
+    decoded directly at 1/2, 1/4 or 1/8 scale so that the frame holds at
+    most about `target_pixels` pixels. Grayscale and alpha images are always
+    returned as BGR.
+
+    Args:
+        data (bytes | memoryview): Encoded image bytes
+        max_bytes (int): Reject inputs larger than this many bytes
+        max_pixels (int): Reject source images with more pixels than this
+        target_pixels (int): Pixel budget for the decoded frame
+
+    Returns:
+        DecodedImage: Decoded frame and mapping to source coordinates
+    """
+    if data is None or len(data) == 0:
+        raise ImageDecodeError('No image data provided')
+    if max_bytes is not None and len(data) > max_bytes:
+        raise ImageTooLargeError(f'Image exceeds the {max_bytes} byte limit')
+
+    size = image_size(data)
+    if size is not None and max_pixels is not None and size[0] * size[1] > max_pixels:
+        raise ImageTooLargeError(f'Image exceeds the {max_pixels} pixel limit')
+
+    factor = reduction_factor(size, target_pixels)
+    frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), REDUCED_DECODE_FLAGS[factor])
+    if frame is None:
+        raise ImageDecodeError('Could not decode image')
+
+    if size is None:
+        size = (frame.shape[1], frame.shape[0])
+        if max_pixels is not None and size[0] * size[1] > max_pixels:
+            raise ImageTooLargeError(f'Image exceeds the {max_pixels} pixel limit')
+    else:
+        # EXIF orientation may have rotated the decoded frame
+        width, height = size
+        frame_h, frame_w = frame.shape[:2]
+        if width != height and (width > height) != (frame_w > frame_h):
+            size = (height, width)
+
+    return DecodedImage(frame, size)
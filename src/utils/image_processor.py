@@ -1,93 +1,153 @@
 """Image processing utilities for face detection and skin tone classification"""
 import cv2
 import numpy as np
-from tensorflow.keras.preprocessing.image import img_to_array
 
+from .metrics import stage_timer
+from .skin_tone import classify_face_skin_tones, classify_skin_tone
 
-def classify_skin_tone(avg_rgb):
+# Input size and channel means of the res10 SSD face detector
+FACE_DETECTOR_INPUT_SIZE = (300, 300)
+FACE_DETECTOR_MEAN = (104.0, 177.0, 123.0)
+
+# Input size of the gender prediction model
+GENDER_MODEL_INPUT_SIZE = (128, 128)
+
+
+def make_detection_blob(frame):
     """
-    Classify skin tone based on RGB values.
+    Build the 300x300 input blob for the SSD face detector.
     
     Args:
-        avg_rgb (tuple): Average RGB values (R, G, B)
+        frame (np.ndarray): Input frame
         
     Returns:
-        str: Skin tone classification with undertone
-    """
-    r, g, b = avg_rgb
-    
-    # Convert BGR to HSV for better color analysis
-    hsv = cv2.cvtColor(np.uint8([[[r, g, b]]]), cv2.COLOR_BGR2HSV)[0][0]
-    hue = hsv[0]  # Extract Hue value (range 0-179 in OpenCV)
-    
-    # Determine undertone based on hue
-    undertone = "Cool" if hue > 170 or hue < 30 else "Warm"
-    
-    # Classify skin tone by hue ranges
-    skin_tone_map = {
-        (0, 10): 'Porcelain (Very Fair)',
-        (10, 20): 'Alabaster (Fair)',
-        (20, 30): 'Ivory (Light Fair)',
-        (30, 40): 'Cream (Light)',
-        (40, 50): 'Beige (Light-Medium)',
-        (50, 60): 'Golden Beige (Medium)',
-        (60, 70): 'Honey (Medium-Warm)',
-        (70, 80): 'Tan (Medium-Dark)',
-        (80, 90): 'Caramel (Dark)',
-        (90, 100): 'Honey Brown (Dark-Warm)',
-        (100, 110): 'Walnut (Deep Brown)',
-        (110, 120): 'Espresso (Very Deep Brown)',
-        (120, 130): 'Chestnut (Very Deep Brown-Cool)',
-        (130, 140): 'Mocha (Deep Brown-Warm)',
-        (140, 150): 'Mahogany (Very Deep Brown-Warm)',
-        (150, 160): 'Sable (Almost Black)',
-        (160, 170): 'Ebony (Black)',
-    }
-    
-    # Find matching skin tone
-    for (min_hue, max_hue), tone in skin_tone_map.items():
-        if min_hue <= hue < max_hue:
-            return f'{tone} - {undertone} Undertone'
-    
-    return f'Unknown Skin Tone - {undertone} Undertone'
-
-
-def detect_faces(frame, face_net, confidence_threshold=0.6):
+        np.ndarray: Blob of shape (1, 3, 300, 300)
     """
-    Detect faces in frame using DNN.
+    frame_resized = cv2.resize(frame, FACE_DETECTOR_INPUT_SIZE)
+    return cv2.dnn.blobFromImage(
+        frame_resized,
+        scalefactor=1.0,
+        size=FACE_DETECTOR_INPUT_SIZE,
+        mean=FACE_DETECTOR_MEAN
+    )
+
+
+def postprocess_detections(detections, frame_size, confidence_threshold=0.6,
+                           nms_threshold=None, top_k=None):
+    """
+    Turn a raw SSD detection tensor into pixel boxes, without Python loops.
+    
+    Args:
+        detections (np.ndarray): Detector output of shape (1, 1, N, 7) for
+            one image, or the (N, 7) rows themselves
+        frame_size (tuple): (width, height) of the frame
+        confidence_threshold (float): Minimum detection confidence
+        nms_threshold (float): IoU threshold for non-maximum suppression,
+            None to keep overlapping boxes
+        top_k (int): Keep at most this many faces, None for all
+        
+    Returns:
+        tuple: (boxes, confidences) where boxes is an int array of shape
+            (M, 4) in (x, y, w, h) order, sorted by descending confidence
+    """
+    rows = detections.reshape(-1, 7)
+    w, h = frame_size
+    rows = rows[rows[:, 2] > confidence_threshold]
+    
+    corners = rows[:, 3:7] * np.array([w, h, w, h], dtype=np.float32)
+    corners = corners.astype(int)
+    np.clip(corners, 0, [w, h, w, h], out=corners)
+    boxes = np.column_stack((corners[:, :2], corners[:, 2:] - corners[:, :2]))
+    confidences = rows[:, 2].astype(np.float32)
+    
+    valid = (boxes[:, 2] > 0) & (boxes[:, 3] > 0)
+    boxes, confidences = boxes[valid], confidences[valid]
+    
+    order = np.argsort(-confidences, kind='stable')
+    if nms_threshold is not None and len(order) > 1:
+        keep = cv2.dnn.NMSBoxes(boxes.tolist(), confidences.tolist(), confidence_threshold, nms_threshold)
+        keep = np.asarray(keep, dtype=int).reshape(-1)
+        order = keep[np.argsort(-confidences[keep], kind='stable')]
+    if top_k is not None:
+        order = order[:top_k]
+    
+    return boxes[order], confidences[order]
+
+
+def detect_faces_with_scores(frame, face_net, confidence_threshold=0.6, nms_threshold=None, top_k=None):
+    """
+    Detect faces in frame using DNN, returning boxes and confidences.
     
     Args:
         frame (np.ndarray): Input frame
         face_net: OpenCV DNN network
         confidence_threshold (float): Confidence threshold for detection
+        nms_threshold (float): IoU threshold for non-maximum suppression
+        top_k (int): Maximum number of faces to return
         
     Returns:
-        list: List of face bounding boxes [(x, y, w, h), ...]
+        tuple: (boxes, confidences), see `postprocess_detections`
     """
     h, w = frame.shape[:2]
-    frame_resized = cv2.resize(frame, (300, 300))
-    
-    # Create blob and detect
-    blob = cv2.dnn.blobFromImage(
-        frame_resized,
-        scalefactor=1.0,
-        size=(300, 300),
-        mean=(104.0, 177.0, 123.0)
-    )
+    with stage_timer('face_detection'):
+        face_net.setInput(make_detection_blob(frame))
+        detections = face_net.forward()
+    return postprocess_detections(detections, (w, h), confidence_threshold, nms_threshold, top_k)
+
+
+def detect_faces(frame, face_net, confidence_threshold=0.6, nms_threshold=None, top_k=None):
+    """
+    Detect faces in frame using DNN.
     
-    face_net.setInput(blob)
-    detections = face_net.forward()
+    Args:
+        frame (np.ndarray): Input frame
+        face_net: OpenCV DNN network
+        confidence_threshold (float): Confidence threshold for detection
+        nms_threshold (float): IoU threshold for non-maximum suppression
+        top_k (int): Maximum number of faces to return
+        
+    Returns:
+        list: List of face bounding boxes [(x, y, w, h), ...]
+    """
+    boxes, _ = detect_faces_with_scores(frame, face_net, confidence_threshold, nms_threshold, top_k)
+    return [tuple(int(v) for v in box) for box in boxes]
+
+
+def detect_faces_batch(frames, face_net, confidence_threshold=0.6, nms_threshold=None, top_k=None):
+    """
+    Detect faces in several frames with a single detector forward pass.
     
-    # Extract face boxes
-    face_boxes = []
-    for i in range(detections.shape[2]):
-        confidence = detections[0, 0, i, 2]
-        if confidence > confidence_threshold:
-            box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-            (start_x, start_y, end_x, end_y) = box.astype("int")
-            face_boxes.append((start_x, start_y, end_x - start_x, end_y - start_y))
+    Args:
+        frames (list): Input frames (np.ndarray), any sizes
+        face_net: OpenCV DNN network
+        confidence_threshold (float): Confidence threshold for detection
+        nms_threshold (float): IoU threshold for non-maximum suppression
+        top_k (int): Maximum number of faces per frame
+        
+    Returns:
+        list: (boxes, confidences) per frame, see `postprocess_detections`
+    """
+    if not frames:
+        return []
+    with stage_timer('face_detection'):
+        resized = [cv2.resize(frame, FACE_DETECTOR_INPUT_SIZE) for frame in frames]
+        blob = cv2.dnn.blobFromImages(
+            resized,
+            scalefactor=1.0,
+            size=FACE_DETECTOR_INPUT_SIZE,
+            mean=FACE_DETECTOR_MEAN
+        )
+        face_net.setInput(blob)
+        rows = face_net.forward().reshape(-1, 7)
     
-    return face_boxes
+    # Column 0 of every detection row is the index of its image in the batch
+    image_ids = rows[:, 0].astype(int)
+    results = []
+    for i, frame in enumerate(frames):
+        h, w = frame.shape[:2]
+        results.append(postprocess_detections(
+            rows[image_ids == i], (w, h), confidence_threshold, nms_threshold, top_k))
+    return results
 
 
 def extract_face_region(frame, face_box):
@@ -105,7 +165,7 @@ def extract_face_region(frame, face_box):
     return frame[y:y + h, x:x + w]
 
 
-def prepare_face_for_gender_prediction(face_region, target_size=(128, 128)):
+def prepare_face_for_gender_prediction(face_region, target_size=GENDER_MODEL_INPUT_SIZE):
     """
     Prepare face region for gender prediction model.
     
@@ -116,10 +176,147 @@ def prepare_face_for_gender_prediction(face_region, target_size=(128, 128)):
     Returns:
         np.ndarray: Prepared face array
     """
-    face_resized = cv2.resize(face_region, target_size)
-    face_array = img_to_array(face_resized) / 255.0
-    face_array = np.expand_dims(face_array, axis=0)
-    return face_array
+    return prepare_faces_for_gender_prediction([face_region], target_size)
+
+
+def prepare_faces_for_gender_prediction(face_regions, target_size=GENDER_MODEL_INPUT_SIZE):
+    """
+    Prepare several face regions as one gender model batch.
+    
+    Args:
+        face_regions (list): Face regions (np.ndarray)
+        target_size (tuple): Target size for model
+        
+    Returns:
+        np.ndarray: float32 batch of shape (N, height, width, 3) in [0, 1]
+    """
+    width, height = target_size
+    batch = np.empty((len(face_regions), height, width, 3), dtype=np.float32)
+    for i, face_region in enumerate(face_regions):
+        batch[i] = cv2.resize(face_region, target_size)
+    batch *= 1.0 / 255.0
+    return batch
+
+
+def predict_genders(predict_fn, face_batch, threshold=0.4):
+    """
+    Classify a batch of prepared faces as Male or Female in one model call.
+    
+    Args:
+        predict_fn (callable): Maps a (N, H, W, 3) batch to (N, 1) scores,
+            e.g. a backend's `predict_batch`
+        face_batch (np.ndarray): Prepared faces
+        threshold (float): Scores above this are classified as Male
+        
+    Returns:
+        list: 'Male' / 'Female' label per face
+    """
+    if len(face_batch) == 0:
+        return []
+    with stage_timer('gender_prediction'):
+        scores = np.asarray(predict_fn(face_batch)).reshape(len(face_batch), -1)[:, 0]
+    return ['Male' if score > threshold else 'Female' for score in scores]
+
+
+def analyze_faces(frame, face_net, predict_fn=None, confidence_threshold=0.6, nms_threshold=None,
+                  top_k=None, gender_threshold=0.4):
+    """
+    Detect every face in a frame and classify gender and skin tone.
+    
+    Runs one detector forward pass and, when `predict_fn` is given, one
+    batched gender prediction over all face crops.
+    
+    Args:
+        frame (np.ndarray): Input frame
+        face_net: OpenCV DNN network
+        predict_fn (callable): Batched gender model, None to skip gender
+        confidence_threshold (float): Confidence threshold for detection
+        nms_threshold (float): IoU threshold for non-maximum suppression
+        top_k (int): Maximum number of faces to analyze
+        gender_threshold (float): Gender score threshold for 'Male'
+        
+    Returns:
+        list: One dict per face, by descending confidence, with keys
+            'box' (x, y, w, h), 'confidence', 'gender' and 'skin_tone'
+    """
+    boxes, confidences = detect_faces_with_scores(
+        frame, face_net, confidence_threshold, nms_threshold, top_k)
+    return classify_faces(frame, boxes, confidences, predict_fn, gender_threshold)
+
+
+def analyze_faces_batch(frames, face_net, predict_fn=None, confidence_threshold=0.6, nms_threshold=None,
+                        top_k=None, gender_threshold=0.4):
+    """
+    Analyze several frames with one detector pass and one gender batch.
+    
+    Args:
+        frames (list): Input frames (np.ndarray)
+        face_net: OpenCV DNN network
+        predict_fn (callable): Batched gender model, None to skip gender
+        confidence_threshold (float): Confidence threshold for detection
+        nms_threshold (float): IoU threshold for non-maximum suppression
+        top_k (int): Maximum number of faces per frame
+        gender_threshold (float): Gender score threshold for 'Male'
+        
+    Returns:
+        list: Per frame, the list of faces described in `analyze_faces`
+    """
+    detections = detect_faces_batch(frames, face_net, confidence_threshold, nms_threshold, top_k)
+    
+    face_regions = [
+        extract_face_region(frame, box)
+        for frame, (boxes, _) in zip(frames, detections)
+        for box in boxes
+    ]
+    if predict_fn is not None and face_regions:
+        genders = predict_genders(predict_fn, prepare_faces_for_gender_prediction(face_regions),
+                                  gender_threshold)
+    else:
+        genders = ['Unknown'] * len(face_regions)
+    
+    results = []
+    offset = 0
+    for frame, (boxes, confidences) in zip(frames, detections):
+        count = len(boxes)
+        results.append(classify_faces(frame, boxes, confidences, genders=genders[offset:offset + count]))
+        offset += count
+    return results
+
+
+def classify_faces(frame, boxes, confidences, predict_fn=None, gender_threshold=0.4, genders=None):
+    """
+    Classify gender and skin tone for already detected faces.
+    
+    Args:
+        frame (np.ndarray): Input frame
+        boxes (np.ndarray): Face boxes (x, y, w, h)
+        confidences (np.ndarray): Detection confidences
+        predict_fn (callable): Batched gender model, None to skip gender
+        gender_threshold (float): Gender score threshold for 'Male'
+        genders (list): Precomputed gender labels, skips `predict_fn`
+        
+    Returns:
+        list: One dict per face, see `analyze_faces`
+    """
+    face_regions = [extract_face_region(frame, box) for box in boxes]
+    if genders is None and predict_fn is not None:
+        genders = predict_genders(predict_fn, prepare_faces_for_gender_prediction(face_regions),
+                                  gender_threshold)
+    elif genders is None:
+        genders = ['Unknown'] * len(face_regions)
+    
+    with stage_timer('skin_tone'):
+        skin_tones = classify_face_skin_tones(face_regions)
+    
+    faces = []
+    for box, confidence, gender, skin_tone in zip(boxes, confidences, genders, skin_tones):
+        faces.append({
+            'box': tuple(int(v) for v in box),
+            'confidence': round(float(confidence), 4),
+            'gender': gender,
+            'skin_tone': skin_tone,
+        })
+    return faces
 
 
 def draw_face_rectangle(frame, face_box, color=(0, 255, 0), thickness=2):
@@ -138,3 +335,54 @@ def draw_face_rectangle(frame, face_box, color=(0, 255, 0), thickness=2):
     x, y, w, h = face_box
     cv2.rectangle(frame, (x, y), (x + w, y + h), color, thickness)
     return frame
+
+
+# Response image modes, from smallest to largest payload
+IMAGE_MODES = ('boxes', 'crop', 'thumbnail', 'full')
+
+
+def render_face_image(frame, face_boxes, mode='full', max_edge=320, quality=95):
+    """
+    Render the JPEG image returned for a detection.
+
+    The frame is left untouched; face rectangles are drawn on a copy.
+
+    Args:
+        frame (np.ndarray): Decoded frame
+        face_boxes (list): Face bounding boxes (x, y, w, h) in frame
+            coordinates; 'crop' mode uses the first one
+        mode (str): 'full' (annotated frame), 'thumbnail' (annotated frame
+            downscaled to `max_edge`), 'crop' (face region only) or 'boxes'
+            (no image)
+        max_edge (int): Longest edge of the thumbnail in pixels
+        quality (int): JPEG quality (0-100)
+
+    Returns:
+        bytes: JPEG data, or None for 'boxes' mode
+    """
+    if mode not in IMAGE_MODES:
+        raise ValueError(f"Unknown image mode '{mode}'. Choose from {', '.join(IMAGE_MODES)}")
+    if mode == 'boxes':
+        return None
+
+    if mode == 'crop':
+        image = extract_face_region(frame, face_boxes[0])
+    elif mode == 'thumbnail':
+        h, w = frame.shape[:2]
+        scale = min(1.0, max_edge / float(max(h, w)))
+        if scale < 1.0:
+            image = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))),
+                               interpolation=cv2.INTER_AREA)
+        else:
+            image = frame.copy()
+        for x, y, bw, bh in face_boxes:
+            draw_face_rectangle(image, (int(x * scale), int(y * scale), int(bw * scale), int(bh * scale)))
+    else:
+        image = frame.copy()
+        for face_box in face_boxes:
+            draw_face_rectangle(image, face_box)
+
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not ok:
+        raise RuntimeError("Could not encode image")
+    return buffer.tobytes()
@@ -0,0 +1,420 @@
+"""Multi-process inference workers fed through shared-memory frame slots"""
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+
+import numpy as np
+
+
+class InferenceWorkerError(RuntimeError):
+    """Raised for requests lost because their worker process died or hung."""
+
+
+def _load_worker_models(settings):
+    """Load the face detector and gender model inside a worker process."""
+    import cv2
+    cv2.setNumThreads(settings['threads'])
+
+    if settings['use_stub_models']:
+        from .stub_models import StubFaceNet, StubGenderModel
+        return (StubFaceNet(latency_ms=settings['stub_face_latency_ms']),
+                StubGenderModel(settings['stub_gender_latency_ms'], settings['stub_gender_per_item_ms']))
+
+    if settings['backend'] == 'keras':
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(settings['threads'])
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    from .model_loader import load_face_detection_model, load_gender_model
+    return (load_face_detection_model(settings['models_dir']),
+            load_gender_model(settings['models_dir'], settings['backend'], model_file=settings['model_file'],
+                              num_threads=settings['threads']))
+
+
+def _worker_main(shm_name, slot_bytes, requests, results, settings):
+    """
+    Serve analysis requests in a worker process until a None request arrives.
+
+    Requests are (request_id, slot, shape, dtype) for frames in shared
+    memory, or (request_id, None, frame, None) for frames sent inline.
+    Several pending requests are analyzed together, up to settings['batch'].
+    Replies go to `results`, the write end of a pipe only this process
+    uses, so being killed mid-reply cannot block the other workers.
+    """
+    from .image_processor import analyze_faces_batch
+    from .model_registry import ModelRegistry
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        face_net, gender_model = _load_worker_models(settings)
+        registry = ModelRegistry(lambda: face_net, lambda: gender_model)
+        if not registry.warmup():
+            raise RuntimeError(registry.warmup_error)
+    except Exception as e:
+        results.send(('ready', str(e)))
+        shm.close()
+        return
+    results.send(('ready', None))
+
+    predict_fn = gender_model.predict_batch if gender_model is not None else None
+    options = settings['options']
+    running = True
+    while running:
+        batch = [requests.get()]
+        while len(batch) < settings['batch']:
+            try:
+                batch.append(requests.get_nowait())
+            except queue.Empty:
+                break
+        if None in batch:
+            running = False
+            batch = [request for request in batch if request is not None]
+        if not batch:
+            continue
+
+        frames = []
+        for request_id, slot, shape, dtype in batch:
+            if slot is None:
+                frames.append(shape)  # Inline frame
+            else:
+                frames.append(np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=slot * slot_bytes))
+        try:
+            faces_per_frame = analyze_faces_batch(frames, face_net, predict_fn, **options)
+            for (request_id, *_), faces in zip(batch, faces_per_frame):
+                results.send(('result', request_id, faces, None))
+        except Exception as e:
+            for request_id, *_ in batch:
+                results.send(('result', request_id, None, str(e)))
+        del frames  # Views into shared memory must go before it is closed
+
+    shm.close()
+
+
+def _remaining(deadline):
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+class _Worker:
+    def __init__(self, index, shm, slots):
+        self.index = index
+        self.shm = shm
+        self.free_slots = list(range(slots))
+        self.pending = {}
+        self.process = None
+        self.requests = None
+        self.results = None
+        self.ready = False
+        self.error = None
+        self.completed = 0
+        self.restarts = 0
+
+
+class InferencePool:
+    """
+    Run face detection and gender/skin analysis in N worker processes.
+
+    Each worker loads its own model instances, so inference is not limited
+    by the GIL or by TensorFlow's per-process state. Frames are not pickled:
+    every worker owns a ring of fixed-size slots in a shared memory block,
+    the caller copies the frame into a free slot and only the slot number,
+    shape and dtype travel over the queue. Frames larger than a slot are
+    sent inline as a fallback. Each worker replies over its own pipe. A
+    worker that dies, or that holds a request longer than
+    `request_timeout`, fails its pending requests and is restarted with a
+    new queue and pipe.
+    """
+
+    def __init__(self, processes, settings, slot_bytes, slots_per_worker=4, start_method='spawn',
+                 request_timeout=None):
+        """
+        Args:
+            processes (int): Number of worker processes
+            settings (dict): Picklable worker settings: 'models_dir',
+                'backend', 'model_file', 'threads', 'use_stub_models' and
+                the 'stub_*' latencies, 'batch' (frames analyzed together)
+                and 'options' (keyword arguments of `analyze_faces_batch`)
+            slot_bytes (int): Size of one frame slot
+            slots_per_worker (int): Frames in flight per worker
+            start_method (str): multiprocessing start method; 'spawn' keeps
+                TensorFlow state out of the workers
+            request_timeout (float): Seconds a worker may hold a request
+                before it is considered hung and killed, None = no limit
+        """
+        self.settings = settings
+        self.slot_bytes = int(slot_bytes)
+        self.slots_per_worker = max(1, int(slots_per_worker))
+        self.request_timeout = request_timeout
+        self._context = multiprocessing.get_context(start_method)
+        self._lock = threading.Condition()
+        self._ids = itertools.count()
+        self._closed = False
+        self.inline_frames = 0
+
+        self._workers = []
+        for index in range(max(1, int(processes))):
+            shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * self.slots_per_worker)
+            worker = _Worker(index, shm, self.slots_per_worker)
+            self._workers.append(worker)
+            self._start(worker)
+
+        self._collector = threading.Thread(target=self._collect, name='inference-pool', daemon=True)
+        self._collector.start()
+
+    def _start(self, worker):
+        # Called with the lock held, or before the collector runs
+        worker.requests = self._context.Queue()
+        worker.results, results = self._context.Pipe(duplex=False)
+        worker.ready = False
+        worker.process = self._context.Process(
+            target=_worker_main,
+            args=(worker.shm.name, self.slot_bytes, worker.requests, results, self.settings),
+            name=f'inference-{worker.index}',
+            daemon=True
+        )
+        worker.process.start()
+        # Only the worker writes; the read end then sees EOF once it exits
+        results.close()
+
+    @staticmethod
+    def _available(worker):
+        # `ready` is only cleared once the collector notices a crash
+        return worker.ready and worker.process.is_alive()
+
+    @property
+    def ready(self):
+        """True once every worker has loaded and warmed its models and is running."""
+        with self._lock:
+            return all(self._available(worker) for worker in self._workers)
+
+    def wait_ready(self, timeout=None):
+        """
+        Block until every worker is ready.
+
+        Returns:
+            bool: True if ready, False on timeout or a failed worker
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while not all(self._available(worker) for worker in self._workers):
+                if any(worker.error for worker in self._workers):
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._lock.wait(remaining)
+            return True
+
+    def submit(self, frame, timeout=None):
+        """
+        Queue one frame for analysis.
+
+        Blocks while no ready worker has a free slot.
+
+        Args:
+            frame (np.ndarray): Decoded BGR frame
+            timeout (float): Seconds to wait for a free slot, None to wait forever
+
+        Returns:
+            Future: Resolves to the list of faces, as from `analyze_faces`
+        """
+        frame = np.ascontiguousarray(frame)
+        inline = frame.nbytes > self.slot_bytes
+        future = Future()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Inference pool is closed")
+                if all(worker.error for worker in self._workers):
+                    raise RuntimeError(f"No inference worker could start: {self._workers[0].error}")
+                candidates = [worker for worker in self._workers
+                              if self._available(worker) and (inline or worker.free_slots)]
+                if candidates:
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("No free inference slot")
+                self._lock.wait(remaining)
+
+            worker = min(candidates, key=lambda w: len(w.pending))
+            request_id = next(self._ids)
+            slot = None if inline else worker.free_slots.pop()
+            worker.pending[request_id] = (future, slot, time.monotonic())
+
+            # Still under the lock: a restart frees every slot and replaces
+            # the request queue, so neither may change while the frame is handed over
+            if inline:
+                self.inline_frames += 1
+                worker.requests.put((request_id, None, frame, None))
+            else:
+                target = np.ndarray(frame.shape, dtype=frame.dtype, buffer=worker.shm.buf,
+                                    offset=slot * self.slot_bytes)
+                target[...] = frame
+                del target
+                worker.requests.put((request_id, slot, frame.shape, frame.dtype.str))
+        return future
+
+    def analyze(self, frame, timeout=None):
+        """
+        Analyze one frame and wait for the result.
+
+        Args:
+            frame (np.ndarray): Decoded BGR frame
+            timeout (float): Seconds to wait for a slot and the result together, None = forever
+
+        Returns:
+            list: Faces, as from `analyze_faces`
+
+        Raises:
+            TimeoutError: If there is no result within `timeout`
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        future = self.submit(frame, timeout=timeout)
+        return future.result(timeout=_remaining(deadline))
+
+    def analyze_many(self, frames, timeout=None):
+        """
+        Analyze several frames in parallel across the workers.
+
+        Args:
+            frames (list): Decoded BGR frames
+            timeout (float): Seconds to wait for all results, None = forever
+
+        Returns:
+            list: Per frame, the list of faces
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        futures = [self.submit(frame, timeout=_remaining(deadline)) for frame in frames]
+        return [future.result(timeout=_remaining(deadline)) for future in futures]
+
+    def _collect(self):
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                channels = {worker.results: worker for worker in self._workers if worker.results is not None}
+            ready = wait(list(channels), timeout=0.5)
+
+            with self._lock:
+                if self._closed:
+                    return
+                for connection in ready:
+                    worker = channels[connection]
+                    if connection is not worker.results:
+                        continue  # Replaced by a restart since
+                    try:
+                        message = connection.recv()
+                    except (EOFError, OSError):
+                        # The worker exited, possibly mid-message; _check_workers restarts it
+                        connection.close()
+                        worker.results = None
+                        continue
+                    self._handle(worker, message)
+                self._check_workers()
+                self._lock.notify_all()
+
+    def _handle(self, worker, message):
+        if message[0] == 'ready':
+            _, error = message
+            worker.ready = error is None
+            worker.error = error
+            if error is not None:
+                print(f"✗ Inference worker {worker.index} failed to start: {error}")
+            return
+
+        _, request_id, faces, error = message
+        future, slot, _ = worker.pending.pop(request_id, (None, None, None))
+        if slot is not None:
+            worker.free_slots.append(slot)
+        if future is None:
+            return
+        worker.completed += 1
+        if error is None:
+            future.set_result(faces)
+        else:
+            future.set_exception(RuntimeError(error))
+
+    def _hung(self, worker, now):
+        if self.request_timeout is None or not worker.pending:
+            return False
+        oldest = min(submitted for _, _, submitted in worker.pending.values())
+        return now - oldest > self.request_timeout
+
+    def _check_workers(self):
+        now = time.monotonic()
+        for worker in self._workers:
+            if worker.error is not None:
+                continue
+            if not worker.process.is_alive():
+                reason = f"Inference worker {worker.index} exited with code {worker.process.exitcode}"
+                print(f"⚠ Inference worker {worker.index} died, restarting")
+            elif self._hung(worker, now):
+                # Alive but stuck: its slots may still be read, so the process has to go
+                worker.process.kill()
+                worker.process.join(timeout=5)
+                reason = f"Inference worker {worker.index} did not answer within {self.request_timeout}s"
+                print(f"⚠ {reason}, restarting")
+            else:
+                continue
+            # Fail what it had and start a fresh process
+            for future, _, _ in worker.pending.values():
+                if not future.done():
+                    future.set_exception(InferenceWorkerError(reason))
+            worker.pending.clear()
+            worker.free_slots = list(range(self.slots_per_worker))
+            if worker.results is not None:
+                worker.results.close()
+            worker.restarts += 1
+            self._start(worker)
+
+    def stats(self):
+        """
+        Get per-worker load and restart counts.
+
+        Returns:
+            dict: Pool settings and one entry per worker
+        """
+        with self._lock:
+            return {
+                'processes': len(self._workers),
+                'slots_per_worker': self.slots_per_worker,
+                'slot_bytes': self.slot_bytes,
+                'inline_frames': self.inline_frames,
+                'workers': [{
+                    'pid': worker.process.pid,
+                    'ready': worker.ready,
+                    'error': worker.error,
+                    'pending': len(worker.pending),
+                    'completed': worker.completed,
+                    'restarts': worker.restarts,
+                } for worker in self._workers],
+            }
+
+    def close(self):
+        """Stop the workers and release the shared memory."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._lock.notify_all()
+        # The collector must be done with the pipes before they are closed
+        self._collector.join()
+        for worker in self._workers:
+            if worker.process.is_alive():
+                worker.requests.put(None)
+        for worker in self._workers:
+            worker.process.join(timeout=10)
+            if worker.process.is_alive():
+                worker.process.kill()
+            for future, _, _ in worker.pending.values():
+                if not future.done():
+                    future.set_exception(RuntimeError("Inference pool is closed"))
+            if worker.results is not None:
+                worker.results.close()
+            worker.shm.close()
+            worker.shm.unlink()
@@ -0,0 +1,255 @@
+"""Low-overhead metrics with Prometheus text exposition"""
+import bisect
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Latency buckets in seconds, from sub-millisecond lookups to multi-second requests
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, labels, value) for labels, value in items]
+
+
+class Gauge:
+    """Value read from a callback at scrape time."""
+
+    def __init__(self, name, documentation, callback, labelnames=(), kind='gauge'):
+        """
+        Args:
+            callback (callable): Returns a number, or a dict of
+                {label values tuple: number} when `labelnames` is given
+            kind (str): 'gauge', or 'counter' for totals kept elsewhere
+        """
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        try:
+            value = self.callback()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        if self.labelnames:
+            return [(self.name, labels, v) for labels, v in value.items()]
+        return [(self.name, (), value)]
+
+
+class Histogram:
+    """Cumulative bucket histogram with optional labels."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                # Per-bucket counts (non-cumulative) plus +Inf, sum
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labelvalues):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        samples = []
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append((f'{self.name}_bucket', labels + (_format_value(float(bound)),), cumulative))
+            samples.append((f'{self.name}_sum', labels, total))
+            samples.append((f'{self.name}_count', labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Named collection of metrics rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, callback, labelnames=(), kind='gauge'):
+        """Register a callback metric, replacing any previous callback for the name."""
+        gauge = Gauge(name, documentation, callback, labelnames, kind)
+        with self._lock:
+            self._metrics[name] = gauge
+        return gauge
+
+    def histogram(self, name, documentation, buckets=LATENCY_BUCKETS, labelnames=()):
+        return self._register(Histogram(name, documentation, buckets, labelnames))
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: Exposition text
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            labelnames = metric.labelnames
+            for name, labelvalues, value in metric.samples():
+                names = labelnames + ('le',) if name.endswith('_bucket') else labelnames
+                lines.append(f'{name}{_format_labels(names, labelvalues)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def process_rss_bytes():
+    """
+    Resident set size of this process.
+
+    Returns:
+        int: Current RSS on Linux, peak RSS elsewhere, None if unknown
+    """
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def process_memory_breakdown(pid='self'):
+    """
+    Split a process's memory into shared and private pages (Linux only).
+
+    Pages a forked worker still shares copy-on-write with its parent count
+    as shared; PSS divides every shared page among the processes using it,
+    so summing PSS over all workers gives their real combined footprint.
+
+    Args:
+        pid (int or str): Process ID, 'self' for this process
+
+    Returns:
+        dict: 'rss', 'pss', 'shared' and 'private' in bytes, or None if
+            /proc/<pid>/smaps_rollup is unavailable
+    """
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', 'r') as file:
+            fields = {}
+            for line in file:
+                parts = line.split()
+                if len(parts) >= 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    except (OSError, ValueError):
+        return None
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+        'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
+
+
+# Process-wide registry and the hot-path metrics shared by the app and utils
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'fashion_stage_seconds', 'Time spent in each processing stage', labelnames=('stage',))
+REQUEST_SECONDS = REGISTRY.histogram(
+    'fashion_request_seconds', 'End-to-end request latency', labelnames=('endpoint',))
+REQUESTS_TOTAL = REGISTRY.counter(
+    'fashion_requests_total', 'Detection requests by outcome', labelnames=('endpoint', 'outcome'))
+BATCH_SIZE = REGISTRY.histogram(
+    'fashion_inference_batch_size', 'Samples per batched model call', BATCH_SIZE_BUCKETS, labelnames=('model',))
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    'fashion_inference_queue_wait_seconds', 'Time samples wait for their batch', labelnames=('model',))
+REGISTRY.gauge('fashion_process_resident_memory_bytes', 'Resident memory of this process', process_rss_bytes)
+
+
+def stage_timer(stage):
+    """
+    Time a block of code as one processing stage.
+
+    Usage:
+        with stage_timer('face_detection'):
+            detections = face_net.forward()
+    """
+    return STAGE_SECONDS.time(stage)
@@ -1,28 +1,24 @@
 """Model loading utilities for the fashion recommendation app"""
 import os
-import tensorflow as tf
 import cv2
 
+from .gender_backends import load_gender_backend
 
-def load_gender_model(models_dir):
+
+def load_gender_model(models_dir, backend='keras', model_file=None, num_threads=None):
     """
     Load gender prediction model with fallback option.
     
     Args:
         models_dir (str): Directory containing model files
+        backend (str): Runtime to use: 'keras', 'tflite', 'onnx' or 'opencv'
+        model_file (str): Explicit model file name for that runtime
+        num_threads (int): CPU threads for runtimes that support it
         
     Returns:
-        model: Loaded TensorFlow model or None if failed
+        GenderBackend: Loaded model exposing `predict_batch`, or None if failed
     """
-    model_path = os.path.join(models_dir, 'Gender_Prediction_model.h5')
-    
-    try:
-        model = tf.keras.models.load_model(model_path)
-        print(f"✓ Successfully loaded gender model from {model_path}")
-        return model
-    except Exception as e:
-        print(f"✗ Error loading gender model: {e}")
-        return None
+    return load_gender_backend(models_dir, backend, model_file=model_file, num_threads=num_threads)
 
 
 def load_face_detection_model(models_dir):
@@ -0,0 +1,198 @@
+"""Lazily loaded, warmable model instances"""
+import threading
+import time
+
+import numpy as np
+
+from .image_processor import FACE_DETECTOR_INPUT_SIZE, GENDER_MODEL_INPUT_SIZE
+
+
+class ModelRegistry:
+    """
+    Hold the face detector and gender model, loading each on first use.
+
+    Importing the app no longer loads any model. Models are loaded either
+    by the first request that needs them or by an explicit `warmup()`,
+    which also runs a dummy inference through both networks so that the
+    first real request does not pay for lazy initialization inside OpenCV
+    and the gender runtime.
+    """
+
+    def __init__(self, load_face_net, load_gender_model, make_gender_batcher=None):
+        """
+        Args:
+            load_face_net (callable): Returns the OpenCV face detector or None
+            load_gender_model (callable): Returns a gender backend or None
+            make_gender_batcher (callable): Wraps the gender model in a
+                batcher, None to call the model directly
+        """
+        self._load_face_net = load_face_net
+        self._load_gender_model = load_gender_model
+        self._make_gender_batcher = make_gender_batcher
+
+        self._lock = threading.RLock()
+        self._loaded = set()
+        self._face_net = None
+        self._gender_model = None
+        self._gender_batcher = None
+
+        self.warmed = False
+        self.warmup_error = None
+        self.timings = {}
+        # Separate from _lock, which warmup() holds for the whole load
+        self._warmup_lock = threading.Lock()
+        self._warmup_thread = None
+
+    def _load(self, name, loader):
+        with self._lock:
+            if name not in self._loaded:
+                started = time.perf_counter()
+                value = loader()
+                self.timings[f'{name}_load_seconds'] = time.perf_counter() - started
+                setattr(self, f'_{name}', value)
+                self._loaded.add(name)
+            return getattr(self, f'_{name}')
+
+    @property
+    def face_net(self):
+        """OpenCV DNN face detector, or None if it could not be loaded."""
+        if 'face_net' in self._loaded:
+            return self._face_net
+        return self._load('face_net', self._load_face_net)
+
+    @property
+    def gender_model(self):
+        """Gender model backend, or None if it could not be loaded."""
+        if 'gender_model' in self._loaded:
+            return self._gender_model
+        return self._load('gender_model', self._load_gender_model)
+
+    @property
+    def gender_batcher(self):
+        """Micro-batcher in front of the gender model, or None."""
+        if 'gender_batcher' in self._loaded:
+            return self._gender_batcher
+
+        def make():
+            model = self.gender_model
+            if model is None or self._make_gender_batcher is None:
+                return None
+            return self._make_gender_batcher(model)
+        return self._load('gender_batcher', make)
+
+    def peek(self, name):
+        """
+        Get a model only if it is already loaded.
+
+        Args:
+            name (str): 'face_net', 'gender_model' or 'gender_batcher'
+
+        Returns:
+            The loaded object, or None without triggering a load
+        """
+        return getattr(self, f'_{name}') if name in self._loaded else None
+
+    def set(self, face_net=None, gender_model=None, gender_batcher=None):
+        """Install already loaded models, e.g. stand-ins for tests."""
+        with self._lock:
+            for name, value in (('face_net', face_net), ('gender_model', gender_model),
+                                ('gender_batcher', gender_batcher)):
+                if value is not None:
+                    setattr(self, f'_{name}', value)
+                    self._loaded.add(name)
+
+    def warmup(self, include_gender=True):
+        """
+        Load both models and run one dummy inference through each.
+
+        Args:
+            include_gender (bool): False to leave the gender model and its
+                batcher for later, e.g. to load them after a fork
+
+        Returns:
+            bool: True when the face detector is loaded and warmed
+        """
+        with self._lock:
+            started = time.perf_counter()
+            try:
+                face_net = self.face_net
+                if face_net is None:
+                    raise RuntimeError("Face detection model is not loaded")
+                width, height = FACE_DETECTOR_INPUT_SIZE
+                face_net.setInput(np.zeros((1, 3, height, width), dtype=np.float32))
+                face_net.forward()
+
+                if not include_gender:
+                    return True
+
+                gender_model = self.gender_model
+                if gender_model is not None:
+                    width, height = GENDER_MODEL_INPUT_SIZE
+                    gender_model.predict_batch(np.zeros((1, height, width, 3), dtype=np.float32))
+                self.gender_batcher  # Create the batcher before traffic arrives
+
+                self.warmed = True
+                self.warmup_error = None
+            except Exception as e:
+                self.warmed = False
+                self.warmup_error = str(e)
+            finally:
+                self.timings['warmup_seconds'] = time.perf_counter() - started
+            return self.warmed
+
+    def after_fork(self):
+        """
+        Make the registry usable in a freshly forked child process.
+
+        Threads do not survive a fork, so the micro-batcher created in the
+        parent is dropped and recreated on first use; its lock is replaced
+        in case the fork happened while another thread held it.
+        """
+        self._lock = threading.RLock()
+        self._warmup_lock = threading.Lock()
+        self._warmup_thread = None
+        self._loaded.discard('gender_batcher')
+        self._gender_batcher = None
+        self.warmed = False
+
+    def start_warmup(self):
+        """
+        Warm up in a background thread, unless a warmup is already running.
+
+        Returns at once, even while a load is in progress, so that
+        readiness probes can call it.
+
+        Returns:
+            threading.Thread: The running thread
+        """
+        with self._warmup_lock:
+            if self._warmup_thread is None or not self._warmup_thread.is_alive():
+                self._warmup_thread = threading.Thread(target=self.warmup, name='model-warmup', daemon=True)
+                self._warmup_thread.start()
+            return self._warmup_thread
+
+    @property
+    def ready(self):
+        """True once warmed, or once both models were loaded lazily by requests."""
+        if self.warmed:
+            return True
+        # A missing gender model is allowed, as in warmup()
+        return ('face_net' in self._loaded and self._face_net is not None
+                and 'gender_model' in self._loaded)
+
+    def status(self):
+        """
+        Describe what is loaded and warmed.
+
+        Returns:
+            dict: Readiness details
+        """
+        return {
+            'ready': self.ready,
+            'warmed': self.warmed,
+            'face_net_loaded': 'face_net' in self._loaded and self._face_net is not None,
+            'gender_model_loaded': 'gender_model' in self._loaded and self._gender_model is not None,
+            'gender_backend': type(self._gender_model).__name__ if self._gender_model is not None else None,
+            'warmup_error': self.warmup_error,
+            'timings': dict(self.timings),
+        }
@@ -0,0 +1,241 @@
+"""Opt-in profiling of single requests into an on-disk ring buffer"""
+import cProfile
+import hmac
+import io
+import ipaddress
+import json
+import os
+import pstats
+import re
+import secrets
+import shutil
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+
+PROFILE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+
+def token_matches(presented, expected):
+    """
+    Check a profiling token in constant time.
+
+    Args:
+        presented (str): Token sent by the client
+        expected (str): Configured token; None or '' never matches
+
+    Returns:
+        bool: True if both are set and equal
+    """
+    if not expected or not presented:
+        return False
+    return hmac.compare_digest(presented.encode('utf-8'), expected.encode('utf-8'))
+
+
+def is_trusted_address(address, trusted_networks):
+    """
+    Check whether a client address is allowed to request profiles.
+
+    Args:
+        address (str): Client IP address
+        trusted_networks (iterable): Addresses or CIDR networks
+
+    Returns:
+        bool: True if the address is inside one of the networks
+    """
+    try:
+        ip = ipaddress.ip_address(address)
+    except (TypeError, ValueError):
+        return False
+    for network in trusted_networks:
+        try:
+            if ip in ipaddress.ip_network(network, strict=False):
+                return True
+        except ValueError:
+            continue
+    return False
+
+
+class ProfileStore:
+    """
+    Bounded ring buffer of profiles on disk.
+
+    Every profile is a directory named by its ID holding `profile.pstats`,
+    a text summary, metadata and, if requested, a TensorFlow trace. Once
+    `capacity` profiles exist the oldest one is deleted.
+    """
+
+    def __init__(self, directory, capacity=20):
+        self.directory = directory
+        self.capacity = max(1, int(capacity))
+        self._lock = threading.Lock()
+
+    def _path(self, profile_id):
+        if not PROFILE_ID_PATTERN.match(profile_id or ''):
+            return None
+        return os.path.join(self.directory, profile_id)
+
+    def create(self):
+        """
+        Reserve a directory for a new profile, evicting the oldest profiles.
+
+        Returns:
+            tuple: (profile ID, directory path)
+        """
+        profile_id = f'{int(time.time() * 1000):013d}-{secrets.token_urlsafe(6)}'
+        path = os.path.join(self.directory, profile_id)
+        with self._lock:
+            os.makedirs(path)
+            for old_id in self.list_ids()[:-self.capacity]:
+                shutil.rmtree(os.path.join(self.directory, old_id), ignore_errors=True)
+        return profile_id, path
+
+    def list_ids(self):
+        """Profile IDs, oldest first."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name for name in names if PROFILE_ID_PATTERN.match(name))
+
+    def metadata(self, profile_id):
+        """
+        Get the metadata written with a profile.
+
+        Returns:
+            dict: Metadata, or None for an unknown ID
+        """
+        path = self._path(profile_id)
+        try:
+            with open(os.path.join(path, 'meta.json'), 'r') as file:
+                return json.load(file)
+        except (TypeError, OSError, ValueError):
+            return None
+
+    def file(self, profile_id, name):
+        """
+        Path of one file of a profile.
+
+        Returns:
+            str: Path, or None if the profile or file does not exist
+        """
+        path = self._path(profile_id)
+        if path is None:
+            return None
+        file_path = os.path.join(path, name)
+        return file_path if os.path.isfile(file_path) else None
+
+    def trace_archive(self, profile_id):
+        """
+        Zip the TensorFlow trace of a profile in memory.
+
+        Returns:
+            bytes: Zip archive, or None if the profile has no trace
+        """
+        path = self._path(profile_id)
+        trace_dir = os.path.join(path, 'trace') if path else None
+        if trace_dir is None or not os.path.isdir(trace_dir):
+            return None
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for root, _, files in os.walk(trace_dir):
+                for name in files:
+                    full_path = os.path.join(root, name)
+                    archive.write(full_path, os.path.relpath(full_path, trace_dir))
+        return buffer.getvalue()
+
+
+class RequestProfiler:
+    """
+    Profile one request at a time with cProfile.
+
+    cProfile is deterministic and only sees the calling thread, so time
+    spent in the gender micro-batcher shows up as waiting on its future;
+    the optional TensorFlow trace covers what the model does meanwhile.
+    Only one request is profiled at a time because the interpreter (and
+    the TensorFlow profiler) allow a single active profiler.
+    """
+
+    def __init__(self, store, top_n=40):
+        """
+        Args:
+            store (ProfileStore): Where profiles are written
+            top_n (int): Functions listed in the text summary
+        """
+        self.store = store
+        self.top_n = top_n
+        self._busy = threading.Lock()
+
+    @contextmanager
+    def profile(self, label, trace=False):
+        """
+        Profile the enclosed block and save the result.
+
+        Args:
+            label (str): Stored with the profile, e.g. the endpoint name
+            trace (bool): Also record a TensorFlow trace, if available
+
+        Yields:
+            dict: Filled in on exit with 'id' (or 'error' if another
+                profile was already running)
+        """
+        info = {}
+        if not self._busy.acquire(blocking=False):
+            info['error'] = 'Another request is being profiled'
+            yield info
+            return
+        try:
+            profile_id, path = self.store.create()
+            info['id'] = profile_id
+            trace_error = self._start_trace(os.path.join(path, 'trace')) if trace else None
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                yield info
+            finally:
+                profiler.disable()
+                elapsed = time.perf_counter() - started
+                if trace and trace_error is None:
+                    trace_error = self._stop_trace()
+                self._save(path, profiler, {
+                    'id': profile_id,
+                    'label': label,
+                    'created': time.time(),
+                    'wall_seconds': elapsed,
+                    'trace': trace and trace_error is None,
+                    'trace_error': trace_error,
+                })
+        finally:
+            self._busy.release()
+
+    def _save(self, path, profiler, meta):
+        profiler.dump_stats(os.path.join(path, 'profile.pstats'))
+        summary = io.StringIO()
+        stats = pstats.Stats(profiler, stream=summary)
+        stats.sort_stats('cumulative').print_stats(self.top_n)
+        with open(os.path.join(path, 'summary.txt'), 'w') as file:
+            file.write(summary.getvalue())
+        with open(os.path.join(path, 'meta.json'), 'w') as file:
+            json.dump(meta, file)
+
+    @staticmethod
+    def _start_trace(logdir):
+        try:
+            import tensorflow as tf
+            tf.profiler.experimental.start(logdir)
+            return None
+        except ImportError:
+            return 'TensorFlow is not installed'
+        except Exception as e:
+            return str(e)
+
+    @staticmethod
+    def _stop_trace():
+        try:
+            import tensorflow as tf
+            tf.profiler.experimental.stop()
+            return None
+        except Exception as e:
+            return str(e)
@@ -0,0 +1,433 @@
+"""Pipelined real-time face analysis for webcams and video files"""
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from .image_processor import (
+    GENDER_MODEL_INPUT_SIZE, detect_faces_with_scores, draw_face_rectangle, extract_face_region,
+    prepare_faces_for_gender_prediction
+)
+from .skin_tone import classify_skin_tone, skin_colors
+
+# Longest edge of the grayscale frame used for template tracking
+TRACKING_MAX_EDGE = 320
+
+
+class LatestFrameQueue:
+    """
+    Single-slot hand-off between pipeline stages.
+
+    With `drop_stale` a new item replaces one the consumer has not taken
+    yet, so a slow stage always works on the newest frame instead of
+    falling further behind. Without it `put` waits for the slot to empty,
+    which processes every frame of a video file.
+    """
+
+    def __init__(self, drop_stale=True):
+        self.drop_stale = drop_stale
+        self.dropped = 0
+        self._item = None
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def put(self, item):
+        with self._condition:
+            if self.drop_stale:
+                if self._item is not None:
+                    self.dropped += 1
+            else:
+                while self._item is not None and not self._closed:
+                    self._condition.wait()
+            self._item = item
+            self._condition.notify_all()
+
+    def get(self):
+        """Next item, or None once closed and drained."""
+        with self._condition:
+            while self._item is None and not self._closed:
+                self._condition.wait()
+            item, self._item = self._item, None
+            self._condition.notify_all()
+            return item
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+def box_iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = max(0.0, min(ax + aw, bx + bw) - max(ax, bx))
+    ih = max(0.0, min(ay + ah, by + bh) - max(ay, by))
+    inter = iw * ih
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Track:
+    """One face followed across frames, with smoothed gender and skin tone."""
+
+    def __init__(self, track_id, box, gray, scale):
+        self.id = track_id
+        self.box = tuple(float(v) for v in box)
+        self.score = 1.0
+        self.misses = 0
+        self.hits = 1
+        self.gender_score = None
+        self.color = None
+        self.set_template(gray, scale)
+
+    def set_template(self, gray, scale):
+        x, y, w, h = (int(round(v * scale)) for v in self.box)
+        self.template = gray[max(0, y):y + max(1, h), max(0, x):x + max(1, w)].copy()
+
+    def smooth(self, gender_score, color, alpha):
+        if gender_score is not None:
+            self.gender_score = gender_score if self.gender_score is None else (
+                alpha * gender_score + (1 - alpha) * self.gender_score)
+        if color is not None:
+            color = np.asarray(color, dtype=np.float32)
+            self.color = color if self.color is None else alpha * color + (1 - alpha) * self.color
+
+
+class FaceTracker:
+    """
+    Follow faces between detections by template matching.
+
+    Each track keeps a grayscale patch of the face from its last detection
+    and searches for it in a window around its previous position on a
+    downscaled frame. The match score doubles as tracking confidence.
+    """
+
+    def __init__(self, search_margin=0.5, max_misses=2):
+        """
+        Args:
+            search_margin (float): Search window padding, relative to box size
+            max_misses (int): Detections a track may miss before it is dropped
+        """
+        self.search_margin = search_margin
+        self.max_misses = max_misses
+        self.tracks = []
+        self._next_id = 1
+
+    @staticmethod
+    def tracking_view(frame):
+        """Downscaled grayscale frame and its scale factor."""
+        h, w = frame.shape[:2]
+        scale = min(1.0, TRACKING_MAX_EDGE / float(max(h, w)))
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if scale < 1.0:
+            gray = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        return gray, scale
+
+    def update(self, gray, scale):
+        """
+        Move every track to its best match in the new frame.
+
+        Returns:
+            float: Lowest tracking score, 1.0 when there are no tracks
+        """
+        lowest = 1.0
+        gh, gw = gray.shape[:2]
+        for track in self.tracks:
+            th, tw = track.template.shape[:2]
+            x, y, w, h = (v * scale for v in track.box)
+            pad_x, pad_y = int(w * self.search_margin) + 2, int(h * self.search_margin) + 2
+            x0, y0 = max(0, int(x) - pad_x), max(0, int(y) - pad_y)
+            x1, y1 = min(gw, int(x + w) + pad_x), min(gh, int(y + h) + pad_y)
+            region = gray[y0:y1, x0:x1]
+            if th < 4 or tw < 4 or region.shape[0] < th or region.shape[1] < tw:
+                track.score = 0.0
+            else:
+                result = cv2.matchTemplate(region, track.template, cv2.TM_CCOEFF_NORMED)
+                _, score, _, location = cv2.minMaxLoc(result)
+                track.score = float(score)
+                track.box = ((x0 + location[0]) / scale, (y0 + location[1]) / scale, track.box[2], track.box[3])
+            lowest = min(lowest, track.score)
+        return lowest
+
+    def assign(self, gray, scale, boxes, iou_threshold=0.3):
+        """
+        Match fresh detections to tracks by overlap, creating and dropping tracks.
+
+        Returns:
+            list: The track for each detected box, in order
+        """
+        unmatched = list(self.tracks)
+        assigned = []
+        for box in boxes:
+            best = max(unmatched, key=lambda track: box_iou(track.box, box), default=None)
+            if best is not None and box_iou(best.box, box) >= iou_threshold:
+                unmatched.remove(best)
+                best.box = tuple(float(v) for v in box)
+                best.score = 1.0
+                best.misses = 0
+                best.hits += 1
+                best.set_template(gray, scale)
+                assigned.append(best)
+            else:
+                track = Track(self._next_id, box, gray, scale)
+                self._next_id += 1
+                self.tracks.append(track)
+                assigned.append(track)
+        for track in unmatched:
+            track.misses += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+        return assigned
+
+
+class RealtimeEngine:
+    """
+    Analyze a stream of frames, running the face detector only when needed.
+
+    The detector runs every `detect_every` frames, when there are no
+    tracks, or when a track's match score drops below `min_track_score`.
+    Between detections faces are followed by the tracker. On detection
+    frames gender is predicted for all faces in one batch, and each
+    track's gender score and skin colour are smoothed over time.
+    """
+
+    def __init__(self, face_net, predict_fn=None, detect_every=5, min_track_score=0.6,
+                 confidence_threshold=0.6, nms_threshold=0.4, max_faces=10, gender_threshold=0.4,
+                 smoothing=0.3):
+        """
+        Args:
+            face_net: OpenCV DNN face detector
+            predict_fn (callable): Batched gender model, None to skip gender
+            detect_every (int): Run the detector at least every K frames
+            min_track_score (float): Tracking confidence that forces a detection
+            confidence_threshold (float): Minimum detection confidence
+            nms_threshold (float): IoU threshold for non-maximum suppression
+            max_faces (int): Maximum faces per frame
+            gender_threshold (float): Smoothed score above which a face is 'Male'
+            smoothing (float): Weight of the newest observation (0-1)
+        """
+        self.face_net = face_net
+        self.predict_fn = predict_fn
+        self.detect_every = max(1, int(detect_every))
+        self.min_track_score = min_track_score
+        self.confidence_threshold = confidence_threshold
+        self.nms_threshold = nms_threshold
+        self.max_faces = max_faces
+        self.gender_threshold = gender_threshold
+        self.smoothing = smoothing
+
+        self.tracker = FaceTracker()
+        self.detections = 0
+        self._since_detection = 0
+
+    def process(self, frame):
+        """
+        Analyze one frame.
+
+        Returns:
+            tuple: (faces, detected) where faces is a list of dicts with
+                'id', 'box', 'score', 'gender' and 'skin_tone', and detected
+                tells whether the detector ran on this frame
+        """
+        gray, scale = self.tracker.tracking_view(frame)
+        lowest = self.tracker.update(gray, scale) if self.tracker.tracks else 0.0
+        detect = (not self.tracker.tracks or lowest < self.min_track_score
+                  or self._since_detection + 1 >= self.detect_every)
+
+        if detect:
+            self._detect(frame, gray, scale)
+            self._since_detection = 0
+        else:
+            self._since_detection += 1
+        return [self._describe(track) for track in self.tracker.tracks if track.misses == 0], detect
+
+    def reset(self):
+        """Drop all tracks; the next frame runs the detector."""
+        self.tracker.tracks = []
+        self._since_detection = 0
+
+    def _detect(self, frame, gray, scale):
+        self.detections += 1
+        boxes, _ = detect_faces_with_scores(frame, self.face_net, self.confidence_threshold,
+                                            self.nms_threshold, self.max_faces)
+        tracks = self.tracker.assign(gray, scale, boxes)
+        if not tracks:
+            return
+
+        regions = [extract_face_region(frame, tuple(int(v) for v in box)) for box in boxes]
+        scores = [None] * len(regions)
+        if self.predict_fn is not None:
+            batch = prepare_faces_for_gender_prediction(regions, GENDER_MODEL_INPUT_SIZE)
+            scores = [float(score) for score in np.asarray(self.predict_fn(batch)).reshape(len(regions), -1)[:, 0]]
+        for track, color, score in zip(tracks, skin_colors(regions), scores):
+            track.smooth(score, color, self.smoothing)
+
+    def _describe(self, track):
+        if track.gender_score is None:
+            gender = 'Unknown'
+        else:
+            gender = 'Male' if track.gender_score > self.gender_threshold else 'Female'
+        return {
+            'id': track.id,
+            'box': tuple(int(round(v)) for v in track.box),
+            'score': round(track.score, 3),
+            'gender': gender,
+            'skin_tone': classify_skin_tone(track.color) if track.color is not None else None,
+        }
+
+
+def draw_faces(frame, faces):
+    """Draw tracked faces with their labels onto the frame in place."""
+    for face in faces:
+        x, y, w, h = face['box']
+        draw_face_rectangle(frame, face['box'])
+        label = f"#{face['id']} {face['gender']}"
+        cv2.putText(frame, label, (x, max(12, y - 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+    return frame
+
+
+class RealtimePipeline:
+    """
+    Capture, analysis and output on separate threads.
+
+    A capture thread reads frames from a camera or video file, an analysis
+    thread runs the engine on the newest frame, and the calling thread
+    renders/displays results (OpenCV windows must live on the main
+    thread). Stages are connected by single-slot queues, so stale frames
+    are dropped instead of queued when analysis falls behind.
+    """
+
+    def __init__(self, engine, source, drop_stale=None, pace=False, max_frames=None):
+        """
+        Args:
+            engine (RealtimeEngine): Frame analyzer
+            source (int or str): Camera index or video file path
+            drop_stale (bool): Drop frames the analysis could not keep up
+                with; defaults to True for cameras and paced files and to
+                False (process every frame) for unpaced files
+            pace (bool): Read a video file at its native frame rate, like
+                a live camera
+            max_frames (int): Stop after this many captured frames
+        """
+        self.engine = engine
+        self.source = source
+        self.is_camera = isinstance(source, int)
+        self.pace = pace
+        self.max_frames = max_frames
+        if drop_stale is None:
+            drop_stale = self.is_camera or pace
+        self._analysis_queue = LatestFrameQueue(drop_stale)
+        self._output_queue = LatestFrameQueue(drop_stale)
+        self._stop = threading.Event()
+        self.captured = 0
+        self.error = None
+
+    def _capture(self):
+        capture = cv2.VideoCapture(self.source)
+        try:
+            if not capture.isOpened():
+                self.error = f"Could not open video source {self.source!r}"
+                return
+            fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+            started = time.perf_counter()
+            while not self._stop.is_set():
+                if self.max_frames is not None and self.captured >= self.max_frames:
+                    break
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                if self.pace and not self.is_camera:
+                    delay = started + self.captured / fps - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                self._analysis_queue.put((self.captured, time.perf_counter(), frame))
+                self.captured += 1
+        finally:
+            capture.release()
+            self._analysis_queue.close()
+
+    def _analyze(self):
+        try:
+            while True:
+                item = self._analysis_queue.get()
+                if item is None:
+                    break
+                index, captured_at, frame = item
+                started = time.perf_counter()
+                faces, detected = self.engine.process(frame)
+                self._output_queue.put((index, captured_at, frame, faces, detected,
+                                        time.perf_counter() - started))
+        finally:
+            self._output_queue.close()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self, on_result=None, display=False, window='Real-Time Fashion Analysis'):
+        """
+        Run until the source ends, `stop()` is called or 'q' is pressed.
+
+        Args:
+            on_result (callable): Called with (index, frame, faces) for
+                every analyzed frame
+            display (bool): Show annotated frames in a window
+
+        Returns:
+            dict: Throughput, drop and latency statistics
+        """
+        threads = [threading.Thread(target=self._capture, name='capture', daemon=True),
+                   threading.Thread(target=self._analyze, name='analysis', daemon=True)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        latencies = []
+        analysis_times = {True: [], False: []}
+        processed = 0
+        try:
+            while True:
+                item = self._output_queue.get()
+                if item is None:
+                    break
+                index, captured_at, frame, faces, detected, analysis_time = item
+                analysis_times[detected].append(analysis_time)
+                if on_result is not None:
+                    on_result(index, frame, faces)
+                if display:
+                    cv2.imshow(window, draw_faces(frame, faces))
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        self.stop()
+                latencies.append(time.perf_counter() - captured_at)
+                processed += 1
+        finally:
+            self.stop()
+            self._analysis_queue.close()
+            for thread in threads:
+                thread.join(timeout=5)
+            if display:
+                cv2.destroyAllWindows()
+
+        if self.error:
+            raise RuntimeError(self.error)
+        elapsed = time.perf_counter() - started
+        return self._stats(elapsed, processed, latencies, analysis_times)
+
+    def _stats(self, elapsed, processed, latencies, analysis_times):
+        latency_ms = np.array(latencies) * 1000.0 if latencies else np.zeros(1)
+
+        def mean_ms(values):
+            return float(np.mean(values) * 1000.0) if values else None
+
+        return {
+            'frames_captured': self.captured,
+            'frames_processed': processed,
+            'frames_dropped': self._analysis_queue.dropped + self._output_queue.dropped,
+            'detections': self.engine.detections,
+            'elapsed_seconds': elapsed,
+            'fps': processed / elapsed if elapsed > 0 else 0.0,
+            'detect_frame_ms': mean_ms(analysis_times[True]),
+            'track_frame_ms': mean_ms(analysis_times[False]),
+            'latency_p50_ms': float(np.percentile(latency_ms, 50)),
+            'latency_p95_ms': float(np.percentile(latency_ms, 95)),
+            'latency_p99_ms': float(np.percentile(latency_ms, 99)),
+        }
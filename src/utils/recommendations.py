@@ -0,0 +1,35 @@
+"""Skin tone and gender labels as catalog keys"""
+
+
+def normalize_skin_tone(skin_tone):
+    """
+    Normalize a skin tone label to its catalog key.
+
+    Accepts both the bare catalog name ("Tan (Medium-Dark)") and the full
+    classifier output ("Tan (Medium-Dark) - Warm Undertone").
+
+    Args:
+        skin_tone (str): Skin tone label
+
+    Returns:
+        str: Lower-cased skin tone without undertone information
+    """
+    if not skin_tone:
+        return ''
+    return skin_tone.split(' -')[0].strip().lower()
+
+
+def normalize_gender(gender):
+    """
+    Normalize a gender label to its catalog key.
+
+    Args:
+        gender (str): Gender label, e.g. "Male" or "female"
+
+    Returns:
+        str: Lower-cased gender
+    """
+    if not gender:
+        return ''
+    return gender.strip().lower()
+
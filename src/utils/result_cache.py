@@ -0,0 +1,198 @@
+"""Content-addressed cache for detection results"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+KEY_MODES = ('exact', 'perceptual')
+
+# Rough per-entry bookkeeping overhead, on top of cached payload bytes
+ENTRY_OVERHEAD_BYTES = 1024
+
+
+def content_key(image_bytes):
+    """
+    Hash encoded image bytes.
+
+    Args:
+        image_bytes (bytes | memoryview): Encoded image
+
+    Returns:
+        str: Hex digest identifying the exact byte content
+    """
+    return 'b:' + hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+
+
+def perceptual_key(frame):
+    """
+    Compute a 64-bit difference hash (dHash) of a decoded frame.
+
+    Re-encoded or slightly different captures of the same scene map to the
+    same key, so near-duplicate camera frames share a cache entry.
+
+    Args:
+        frame (np.ndarray): Decoded BGR frame
+
+    Returns:
+        str: Hex encoded dHash
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return 'p:' + np.packbits(bits).tobytes().hex() + f':{frame.shape[1]}x{frame.shape[0]}'
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache bounded by approximate memory size and TTL.
+
+    Entries are dicts; an optional `images` dict inside an entry holds
+    rendered response images and counts towards the memory bound.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl_seconds=600, key_mode='exact'):
+        """
+        Args:
+            max_bytes (int): Approximate memory budget for all entries
+            ttl_seconds (float): Lifetime of an entry, None for no expiry
+            key_mode (str): 'exact' (hash of image bytes) or 'perceptual'
+                (dHash of the decoded frame)
+        """
+        if key_mode not in KEY_MODES:
+            raise ValueError(f"Unknown cache key mode '{key_mode}'. Choose from {', '.join(KEY_MODES)}")
+        self.max_bytes = int(max_bytes)
+        self.ttl = ttl_seconds
+        self.key_mode = key_mode
+
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def entry_size(entry):
+        """Approximate memory held by an entry."""
+        images = entry.get('images') or {}
+        return ENTRY_OVERHEAD_BYTES + sum(len(image) for image in images.values() if image)
+
+    def get(self, key):
+        """
+        Look up an entry, counting a hit or a miss.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            dict: Cached entry, or None
+        """
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            entry, size, expires = item
+            if expires is not None and expires <= now:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        """
+        Insert or replace an entry, evicting least recently used ones.
+
+        Args:
+            key (str): Cache key
+            entry (dict): Value to cache
+        """
+        size = self.entry_size(entry)
+        if size > self.max_bytes:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (entry, size, expires)
+            self._size += size
+            while self._size > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def add_image(self, key, image_key, image):
+        """
+        Attach a rendered image to an existing entry.
+
+        Args:
+            key (str): Cache key
+            image_key (tuple): Identifies the rendering options
+            image (bytes): Rendered image
+        """
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return
+            entry, size, expires = item
+            images = dict(entry.get('images') or {})
+            images[image_key] = image
+            entry = dict(entry, images=images)
+        self._replace(key, entry, expires)
+
+    def _replace(self, key, entry, expires):
+        # Swap an entry's value while keeping its expiry time
+        size = self.entry_size(entry)
+        with self._lock:
+            if key not in self._entries or size > self.max_bytes:
+                return
+            self._remove(key)
+            self._entries[key] = (entry, size, expires)
+            self._size += size
+            while self._size > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+    def clear(self):
+        """Drop all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        """
+        Get cache statistics.
+
+        Returns:
+            dict: Entry count, memory use and hit/miss counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'key_mode': self.key_mode,
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
@@ -0,0 +1,338 @@
+"""Server-side store for detection results, keyed by result ID"""
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# IDs from new_result_id(); anything else is rejected before touching the disk
+RESULT_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{8,64}')
+
+# Size charged for a result without a frame (boxes, labels, styles)
+RESULT_OVERHEAD_BYTES = 2048
+
+# Frames and temporary files without a result are deleted once this old
+ORPHAN_GRACE_SECONDS = 60
+
+
+def new_result_id():
+    """
+    Generate a compact, URL-safe result ID.
+
+    Returns:
+        str: 16-character random ID
+    """
+    return secrets.token_urlsafe(12)
+
+
+def result_size(result):
+    frame = result.get('frame')
+    return RESULT_OVERHEAD_BYTES + (frame.nbytes if frame is not None else 0)
+
+
+class ResultStore:
+    """
+    Thread-safe LRU store for recent detection results, with expiry.
+
+    Holds the decoded frame and the detection output of each result so that
+    follow-up requests (the annotated image, recommendations, exports) can be
+    answered without re-running inference. Results live in this process
+    only; see DiskResultStore for one shared by several workers.
+    """
+
+    def __init__(self, capacity=32, ttl_seconds=None, max_bytes=None):
+        """
+        Args:
+            capacity (int): Maximum number of results kept
+            ttl_seconds (float): Lifetime of a result since it was last used, None = no expiry
+            max_bytes (int): Approximate memory budget (frames dominate), None = unbounded
+        """
+        self.capacity = max(1, int(capacity))
+        self.ttl = ttl_seconds
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self.expirations = 0
+        self._results = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._results)
+
+    def put(self, result, result_id=None):
+        """
+        Store a result.
+
+        Args:
+            result (dict): Result data; an optional 'frame' holds the decoded image
+            result_id (str): ID to store under, generated when omitted
+
+        Returns:
+            str: The result ID
+        """
+        result_id = result_id or new_result_id()
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        size = result_size(result)
+        with self._lock:
+            self._remove(result_id)
+            self._results[result_id] = (result, expires, size)
+            self._size += size
+            while len(self._results) > 1 and (
+                    len(self._results) > self.capacity
+                    or (self.max_bytes is not None and self._size > self.max_bytes)):
+                self._remove(next(iter(self._results)))
+                self.evictions += 1
+        return result_id
+
+    def get(self, result_id):
+        """
+        Look up a result and mark it as recently used.
+
+        Args:
+            result_id (str): Result ID
+
+        Returns:
+            dict: Stored result, or None if unknown, expired or evicted
+        """
+        with self._lock:
+            entry = self._results.get(result_id)
+            if entry is None:
+                return None
+            result, expires, size = entry
+            now = time.monotonic()
+            if expires is not None and now >= expires:
+                self._remove(result_id)
+                self.expirations += 1
+                return None
+            if expires is not None:
+                self._results[result_id] = (result, now + self.ttl, size)
+            self._results.move_to_end(result_id)
+            return result
+
+    def _remove(self, result_id):
+        # Caller holds self._lock
+        entry = self._results.pop(result_id, None)
+        if entry is not None:
+            self._size -= entry[2]
+
+    def stats(self):
+        """
+        Get store statistics.
+
+        Returns:
+            dict: Backend, entry count, memory use and eviction counters
+        """
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'entries': len(self._results),
+                'bytes': self._size,
+                'capacity': self.capacity,
+                'ttl_seconds': self.ttl,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class DiskResultStore:
+    """
+    Result store in a local directory, shared by all worker processes.
+
+    Every result is a JSON file (detection output) plus, when it has one, a
+    .npy file with the decoded frame. Files are written under a temporary
+    name and renamed into place, frame first, so a reader that finds the
+    JSON file also finds the frame. A file's modification time is its last
+    use: reads touch it, and old or surplus results are deleted by whichever
+    process prunes next. No pickle is involved, so nothing in the directory
+    is ever executed.
+    """
+
+    def __init__(self, directory, capacity=256, ttl_seconds=1800, max_bytes=None, prune_interval=1.0):
+        """
+        Args:
+            directory (str): Directory holding the results, created if missing
+            capacity (int): Maximum number of results kept
+            ttl_seconds (float): Lifetime of a result since it was last used, None = no expiry
+            max_bytes (int): Disk budget, None = unbounded
+            prune_interval (float): Minimum seconds between two prunes in this process
+        """
+        self.directory = directory
+        self.capacity = max(1, int(capacity))
+        self.ttl = ttl_seconds
+        self.max_bytes = max_bytes
+        self.prune_interval = prune_interval
+        self.evictions = 0
+        self.expirations = 0
+        self._pruned = 0.0
+        self._prune_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, result_id, extension):
+        return os.path.join(self.directory, f'{result_id}.{extension}')
+
+    def _write(self, path, write):
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as file:
+            write(file)
+        os.replace(temp_path, path)
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.directory) if name.endswith('.json'))
+
+    def put(self, result, result_id=None):
+        """
+        Store a result.
+
+        Args:
+            result (dict): Result data; an optional 'frame' holds the decoded image
+            result_id (str): ID to store under, generated when omitted
+
+        Returns:
+            str: The result ID
+        """
+        result_id = result_id or new_result_id()
+        if not RESULT_ID_PATTERN.fullmatch(result_id):
+            raise ValueError('Invalid result ID')
+        data = {key: value for key, value in result.items() if key != 'frame'}
+        frame = result.get('frame')
+        data['has_frame'] = frame is not None
+        if frame is not None:
+            self._write(self._path(result_id, 'npy'), lambda file: np.save(file, frame, allow_pickle=False))
+        body = json.dumps(data, default=_json_default).encode('utf-8')
+        self._write(self._path(result_id, 'json'), lambda file: file.write(body))
+        self.prune()
+        return result_id
+
+    def get(self, result_id):
+        """
+        Look up a result and mark it as recently used.
+
+        Args:
+            result_id (str): Result ID
+
+        Returns:
+            dict: Stored result, or None if unknown, malformed, expired or evicted
+        """
+        if not result_id or not RESULT_ID_PATTERN.fullmatch(result_id):
+            return None
+        path = self._path(result_id, 'json')
+        try:
+            if self.ttl and time.time() - os.stat(path).st_mtime >= self.ttl:
+                self._delete(result_id)
+                self.expirations += 1
+                return None
+            with open(path, 'rb') as file:
+                result = json.loads(file.read())
+            if result.pop('has_frame', False):
+                result['frame'] = np.load(self._path(result_id, 'npy'), allow_pickle=False)
+            os.utime(path)
+        except (OSError, ValueError):
+            # Pruned by another worker in the meantime, or never stored
+            return None
+        return result
+
+    def _delete(self, result_id):
+        # JSON first: without it the result is gone for readers
+        for extension in ('json', 'npy'):
+            try:
+                os.remove(self._path(result_id, extension))
+            except FileNotFoundError:
+                pass
+
+    def prune(self, force=False):
+        """
+        Delete expired results, then the least recently used beyond the limits.
+
+        Runs at most every `prune_interval` seconds unless forced.
+
+        Returns:
+            int: Number of results deleted
+        """
+        now = time.monotonic()
+        if not force and now - self._pruned < self.prune_interval:
+            return 0
+        if not self._prune_lock.acquire(blocking=False):
+            return 0
+        try:
+            self._pruned = now
+            sizes = {}
+            used = {}
+            files = []
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    result_id, _, extension = entry.name.partition('.')
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    sizes[result_id] = sizes.get(result_id, 0) + stat.st_size
+                    files.append((result_id, entry.path, stat.st_mtime))
+                    if extension == 'json':
+                        used[result_id] = stat.st_mtime
+
+            deleted = 0
+            wall = time.time()
+            # Leftovers of crashed or pruned writes; recent ones may still be in progress
+            for result_id, path, mtime in files:
+                if result_id not in used and wall - mtime >= ORPHAN_GRACE_SECONDS:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+            if self.ttl:
+                for result_id, mtime in list(used.items()):
+                    if wall - mtime >= self.ttl:
+                        self._delete(result_id)
+                        del used[result_id]
+                        self.expirations += 1
+                        deleted += 1
+
+            total = sum(sizes[result_id] for result_id in used)
+            for result_id in sorted(used, key=used.get):
+                if len(used) <= self.capacity and (self.max_bytes is None or total <= self.max_bytes):
+                    break
+                self._delete(result_id)
+                del used[result_id]
+                total -= sizes[result_id]
+                self.evictions += 1
+                deleted += 1
+            return deleted
+        finally:
+            self._prune_lock.release()
+
+    def stats(self):
+        """
+        Get store statistics.
+
+        Returns:
+            dict: Backend, entry count, disk use and eviction counters of this process
+        """
+        entries = 0
+        size = 0
+        with os.scandir(self.directory) as items:
+            for item in items:
+                try:
+                    size += item.stat().st_size
+                except FileNotFoundError:
+                    continue
+                entries += item.name.endswith('.json')
+        return {
+            'backend': 'disk',
+            'directory': self.directory,
+            'entries': entries,
+            'bytes': size,
+            'capacity': self.capacity,
+            'ttl_seconds': self.ttl,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
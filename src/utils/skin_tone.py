@@ -0,0 +1,144 @@
+"""Vectorized skin tone classification"""
+import cv2
+import numpy as np
+
+# Skin tones by 10-wide OpenCV hue bins (0-169); hues 170-179 are unknown
+SKIN_TONES = (
+    'Porcelain (Very Fair)',
+    'Alabaster (Fair)',
+    'Ivory (Light Fair)',
+    'Cream (Light)',
+    'Beige (Light-Medium)',
+    'Golden Beige (Medium)',
+    'Honey (Medium-Warm)',
+    'Tan (Medium-Dark)',
+    'Caramel (Dark)',
+    'Honey Brown (Dark-Warm)',
+    'Walnut (Deep Brown)',
+    'Espresso (Very Deep Brown)',
+    'Chestnut (Very Deep Brown-Cool)',
+    'Mocha (Deep Brown-Warm)',
+    'Mahogany (Very Deep Brown-Warm)',
+    'Sable (Almost Black)',
+    'Ebony (Black)',
+)
+
+# Face crops are sampled at this resolution before masking
+SAMPLE_EDGE = 16
+
+# YCrCb skin-colour bounds (Chai & Ngan): Cr 133-173, Cb 77-127
+SKIN_YCRCB_LOWER = np.array([0, 133, 77], dtype=np.uint8)
+SKIN_YCRCB_UPPER = np.array([255, 173, 127], dtype=np.uint8)
+
+# Below this share of skin pixels the central part of the box is used instead
+MIN_SKIN_FRACTION = 0.1
+
+
+def _build_hue_labels():
+    labels = []
+    for hue in range(180):
+        undertone = "Cool" if hue > 170 or hue < 30 else "Warm"
+        tone = SKIN_TONES[hue // 10] if hue < 10 * len(SKIN_TONES) else 'Unknown Skin Tone'
+        labels.append(f'{tone} - {undertone} Undertone')
+    return np.array(labels, dtype=object)
+
+
+# Full label for every OpenCV hue value
+HUE_LABELS = _build_hue_labels()
+
+
+def _center_mask(edge):
+    mask = np.zeros((edge, edge), dtype=bool)
+    margin = edge // 4
+    mask[margin:edge - margin, margin:edge - margin] = True
+    return mask.reshape(-1)
+
+
+_CENTER_MASK = _center_mask(SAMPLE_EDGE)
+
+
+def classify_skin_tone(avg_rgb):
+    """
+    Classify skin tone based on RGB values.
+
+    Args:
+        avg_rgb (tuple): Average colour in the frame's channel order (B, G, R)
+
+    Returns:
+        str: Skin tone classification with undertone
+    """
+    hue = cv2.cvtColor(np.uint8([[avg_rgb]]), cv2.COLOR_BGR2HSV)[0, 0, 0]
+    return HUE_LABELS[hue]
+
+
+def classify_skin_tones(colors):
+    """
+    Classify many colours with one colour conversion.
+
+    Args:
+        colors (array-like): (N, 3) colours in BGR order
+
+    Returns:
+        list: Skin tone classification with undertone per colour
+    """
+    colors = np.asarray(colors, dtype=np.float32).reshape(-1, 1, 3)
+    if not len(colors):
+        return []
+    hues = cv2.cvtColor(np.clip(colors, 0, 255).astype(np.uint8), cv2.COLOR_BGR2HSV)[:, 0, 0]
+    return HUE_LABELS[hues].tolist()
+
+
+def skin_colors(face_regions):
+    """
+    Estimate the skin colour of each face crop.
+
+    Every crop is downsampled to SAMPLE_EDGE x SAMPLE_EDGE, pixels outside
+    the YCrCb skin range (hair, background, clothing) are masked out and
+    the per-channel median of the rest is taken. When too few pixels pass
+    the mask, the central half of the crop is used instead. All crops are
+    converted, masked and reduced together.
+
+    Args:
+        face_regions (list): BGR face crops of any size
+
+    Returns:
+        np.ndarray: (N, 3) float32 BGR skin colours
+    """
+    count = len(face_regions)
+    if not count:
+        return np.zeros((0, 3), dtype=np.float32)
+
+    edge = SAMPLE_EDGE
+    # All crops stacked vertically, so each OpenCV call below runs once
+    samples = np.zeros((count * edge, edge, 3), dtype=np.uint8)
+    for i, region in enumerate(face_regions):
+        if region.size:
+            samples[i * edge:(i + 1) * edge] = cv2.resize(region, (edge, edge), interpolation=cv2.INTER_LINEAR)
+
+    ycrcb = cv2.cvtColor(samples, cv2.COLOR_BGR2YCrCb)
+    mask = cv2.inRange(ycrcb, SKIN_YCRCB_LOWER, SKIN_YCRCB_UPPER).reshape(count, -1) > 0
+    skin_pixels = np.count_nonzero(mask, axis=1)
+    too_few = skin_pixels < MIN_SKIN_FRACTION * edge * edge
+    if too_few.any():
+        mask[too_few] = _CENTER_MASK
+        skin_pixels = np.count_nonzero(mask, axis=1)
+
+    # Per-channel median of the masked pixels: push the others past 255 and sort
+    pixels = samples.reshape(count, -1, 3).transpose(0, 2, 1).astype(np.int16)
+    pixels += (~mask)[:, None, :] * np.int16(256)
+    pixels.sort(axis=2)
+    middle = (skin_pixels - 1) // 2
+    return pixels[np.arange(count)[:, None], np.arange(3), middle[:, None]].astype(np.float32)
+
+
+def classify_face_skin_tones(face_regions):
+    """
+    Classify the skin tone of N face crops in one call.
+
+    Args:
+        face_regions (list): BGR face crops
+
+    Returns:
+        list: Skin tone classification with undertone per face
+    """
+    return classify_skin_tones(skin_colors(face_regions))
@@ -0,0 +1,124 @@
+"""Deterministic stand-ins for the face detector and gender model"""
+import time
+
+import numpy as np
+
+from .gender_backends import GenderBackend
+
+# Rows per image in the res10 SSD output
+SSD_DETECTIONS_PER_IMAGE = 200
+
+
+class StubFaceNet:
+    """
+    Mimic the OpenCV DNN res10 SSD face detector.
+
+    Takes the same (N, 3, 300, 300) blob and returns the same (1, 1, 200*N, 7)
+    tensor of [image_id, label, confidence, x1, y1, x2, y2] rows. The rows
+    are fixed by `seed`: `faces` confident, partly overlapping boxes so that
+    thresholding and non-maximum suppression do real work, and low-scoring
+    noise for the rest.
+    """
+
+    def __init__(self, faces=1, seed=0, latency_ms=0.0):
+        """
+        Args:
+            faces (int): Distinct faces reported per image
+            seed (int): Seed for the fixed detection rows
+            latency_ms (float): Simulated inference time per image
+        """
+        self.latency = latency_ms / 1000.0
+        self._batch_size = 1
+
+        rng = np.random.default_rng(seed)
+        rows = np.zeros((SSD_DETECTIONS_PER_IMAGE, 7), dtype=np.float32)
+        rows[:, 1] = 1
+        # Background noise below any sensible confidence threshold
+        rows[:, 2] = rng.uniform(0.0, 0.3, SSD_DETECTIONS_PER_IMAGE)
+        x1 = rng.uniform(0.0, 0.8, SSD_DETECTIONS_PER_IMAGE)
+        y1 = rng.uniform(0.0, 0.8, SSD_DETECTIONS_PER_IMAGE)
+        size = rng.uniform(0.05, 0.2, SSD_DETECTIONS_PER_IMAGE)
+        rows[:, 3:7] = np.column_stack((x1, y1, x1 + size, y1 + size))
+
+        # Each face gets a main box and a slightly shifted duplicate for NMS to merge
+        for face in range(min(faces, SSD_DETECTIONS_PER_IMAGE // 2)):
+            x = 0.1 + 0.8 * face / max(faces, 1)
+            box = np.array([x, 0.2, x + 0.6 / max(faces, 1), 0.7], dtype=np.float32)
+            rows[2 * face, 2:7] = [0.99 - 0.01 * face, *box]
+            rows[2 * face + 1, 2:7] = [0.9 - 0.01 * face, *(box + 0.01)]
+        self._rows = rows
+
+    def setInput(self, blob):
+        self._batch_size = blob.shape[0]
+
+    def forward(self):
+        if self.latency:
+            time.sleep(self.latency * self._batch_size)
+        detections = np.tile(self._rows, (self._batch_size, 1))
+        detections[:, 0] = np.repeat(np.arange(self._batch_size, dtype=np.float32), SSD_DETECTIONS_PER_IMAGE)
+        return detections.reshape(1, 1, -1, 7)
+
+
+class StubGenderModel(GenderBackend):
+    """
+    Gender backend with the real input/output shapes and no model file.
+
+    The score is a fixed function of the mean pixel value, so the same
+    face always gets the same label.
+    """
+
+    name = 'stub'
+
+    def __init__(self, latency_ms=0.0, per_item_ms=0.0):
+        """
+        Args:
+            latency_ms (float): Simulated fixed cost of one predict call
+            per_item_ms (float): Simulated extra cost per face in the batch
+        """
+        super().__init__('stub')
+        self.latency = latency_ms / 1000.0
+        self.per_item = per_item_ms / 1000.0
+
+    def predict_batch(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        if self.latency or self.per_item:
+            time.sleep(self.latency + self.per_item * len(batch))
+        means = batch.reshape(len(batch), -1).mean(axis=1)
+        return (1.0 / (1.0 + np.exp(-8.0 * (means - 0.5)))).reshape(-1, 1).astype(np.float32)
+
+
+def synthetic_image(width, height, seed=0, faces=1):
+    """
+    Build a deterministic BGR test image.
+
+    A smooth gradient with mild noise (so JPEG sizes are realistic) and a
+    skin-coloured ellipse where each stub face box lies.
+
+    Args:
+        width (int): Image width
+        height (int): Image height
+        seed (int): Noise seed
+        faces (int): Ellipses to draw, matching StubFaceNet(faces=...)
+
+    Returns:
+        np.ndarray: uint8 image of shape (height, width, 3)
+    """
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    ramp_x = np.linspace(40, 200, width, dtype=np.float32)
+    ramp_y = np.linspace(30, 160, height, dtype=np.float32)
+    image = np.empty((height, width, 3), dtype=np.float32)
+    image[..., 0] = ramp_x[None, :]
+    image[..., 1] = ramp_y[:, None]
+    image[..., 2] = (ramp_x[None, :] + ramp_y[:, None]) / 2
+    image += rng.normal(0, 6, size=(height, width, 1)).astype(np.float32)
+    image = np.clip(image, 0, 255).astype(np.uint8)
+
+    for face in range(faces):
+        x = 0.1 + 0.8 * face / max(faces, 1)
+        w = 0.6 / max(faces, 1)
+        center = (int((x + w / 2) * width), int(0.45 * height))
+        axes = (max(1, int(w * width / 2)), max(1, int(0.25 * height)))
+        cv2.ellipse(image, center, axes, 0, 0, 360, (120, 160, 210), -1)
+    return image
@@ -1,13 +1,27 @@
+"""
+Legacy MTCNN-based gender prediction helpers.
+
+The live webcam loop that used to run when this module was imported now
+lives in tools/realtime.py, which pipelines capture and inference, tracks
+faces between detections and drops stale frames. Running this module
+directly starts that pipeline on webcam 0.
+"""
 import cv2
 import numpy as np
-from mtcnn import MTCNN
-from tensorflow.keras.models import load_model
 
-# Initialize MTCNN face detector
-detector = MTCNN()
+_detector = None
+_gender_model = None
 
-# Load your gender prediction model (make sure it's loaded once)
-gender_model = load_model('gender_model.h5')
+
+def get_models():
+    """Load the MTCNN detector and the 224x224 gender model on first use."""
+    global _detector, _gender_model
+    if _detector is None:
+        from mtcnn import MTCNN
+        from tensorflow.keras.models import load_model
+        _detector = MTCNN()
+        _gender_model = load_model('gender_model.h5')
+    return _detector, _gender_model
 
 
 def preprocess_face(face_region):
@@ -15,24 +29,33 @@ def preprocess_face(face_region):
     face_region = cv2.resize(face_region, (224, 224))  # Resize to 224x224
     face_region = cv2.cvtColor(face_region, cv2.COLOR_BGR2RGB)  # Convert to RGB
     face_region = face_region.astype('float32') / 255.0  # Normalize
-    face_region = np.expand_dims(face_region, axis=0)  # Add batch dimension
     return face_region
 
 
 def detect_and_predict_gender(frame):
     """Detect faces and predict gender in real-time."""
+    detector, gender_model = get_models()
     faces = detector.detect_faces(frame)
 
+    boxes = []
+    face_regions = []
     for face in faces:
         x, y, w, h = face['box']
+        x, y = max(0, x), max(0, y)
         face_region = frame[y:y + h, x:x + w]
+        if face_region.size == 0:
+            continue
+        boxes.append((x, y, w, h))
+        face_regions.append(preprocess_face(face_region))
+
+    if not boxes:
+        return frame
 
-        # Preprocess the face region for gender prediction
-        face_region_processed = preprocess_face(face_region)
+    # Predict gender for every face in one batch
+    predictions = gender_model.predict_on_batch(np.stack(face_regions))
 
-        # Predict gender
-        prediction = gender_model.predict(face_region_processed)
-        gender = 'Male' if prediction[0][0] > prediction[0][1] else 'Female'
+    for (x, y, w, h), prediction in zip(boxes, predictions):
+        gender = 'Male' if prediction[0] > prediction[1] else 'Female'
 
         # Draw bounding box and gender label
         cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
@@ -41,22 +64,11 @@ def detect_and_predict_gender(frame):
     return frame
 
 
-# Initialize webcam
-cap = cv2.VideoCapture(0)
-
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    # Detect faces and predict gender
-    frame = detect_and_predict_gender(frame)
-
-    # Display the result
-    cv2.imshow('Real-Time Gender Prediction', frame)
-
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
+if __name__ == '__main__':
+    import os
+    import runpy
+    import sys
 
-cap.release()
-cv2.destroyAllWindows()
+    tool = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tools', 'realtime.py')
+    sys.argv = [tool] + sys.argv[1:]
+    runpy.run_path(tool, run_name='__main__')
@@ -0,0 +1,25 @@
+import numpy as np
+
+from utils.batching import MicroBatcher
+
+
+def test_failing_on_batch_callback_does_not_stop_the_batcher():
+    def on_batch(size, waits):
+        raise RuntimeError("metrics backend down")
+
+    batcher = MicroBatcher(lambda batch: batch * 2, max_batch_size=4, max_wait_ms=1.0, on_batch=on_batch)
+    try:
+        for value in range(3):
+            assert batcher.predict(np.full(2, value), timeout=5).tolist() == [value * 2] * 2
+    finally:
+        batcher.close()
+
+
+def test_short_output_fails_every_future():
+    batcher = MicroBatcher(lambda batch: batch[:-1], max_batch_size=4, max_wait_ms=50.0)
+    try:
+        futures = [batcher.submit(np.zeros(2)) for _ in range(3)]
+        for future in futures:
+            assert isinstance(future.exception(timeout=5), ValueError)
+    finally:
+        batcher.close()
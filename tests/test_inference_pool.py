@@ -0,0 +1,57 @@
+import os
+import signal
+
+import numpy as np
+import pytest
+
+from utils.inference_pool import InferencePool, InferenceWorkerError
+
+SETTINGS = {
+    'models_dir': None,
+    'backend': 'keras',
+    'model_file': None,
+    'threads': 1,
+    'use_stub_models': True,
+    'stub_face_latency_ms': 1.0,
+    'stub_gender_latency_ms': 0.0,
+    'stub_gender_per_item_ms': 0.0,
+    'batch': 4,
+    'options': dict(confidence_threshold=0.6, nms_threshold=0.4, top_k=10, gender_threshold=0.4),
+}
+FRAME = np.full((240, 320, 3), 100, np.uint8)
+
+
+@pytest.fixture
+def pool():
+    pool = InferencePool(2, SETTINGS, slot_bytes=FRAME.nbytes, slots_per_worker=4, request_timeout=10.0)
+    assert pool.wait_ready(60)
+    yield pool
+    pool.close()
+
+
+def test_worker_killed_mid_result_does_not_block_the_others(pool):
+    for _ in range(5):
+        victim = pool._workers[0].process
+
+        def kill_victim(_):
+            if victim.is_alive():
+                os.kill(victim.pid, signal.SIGKILL)
+
+        # Kill the worker as soon as it has replied once, while it sends the next replies
+        with pool._lock:
+            futures = [pool.submit(FRAME) for _ in range(8)]
+            for future, _, _ in pool._workers[0].pending.values():
+                future.add_done_callback(kill_victim)
+        for future in futures:
+            try:
+                future.result(timeout=20)
+            except InferenceWorkerError:
+                pass
+        victim.join(timeout=5)
+
+        # The survivor answers while the victim restarts, and both answer afterwards
+        assert pool.analyze(FRAME, timeout=10) is not None
+        assert pool.wait_ready(60)
+        assert all(faces is not None for faces in pool.analyze_many([FRAME] * 8, timeout=20))
+
+    assert pool.stats()['workers'][0]['restarts'] >= 5
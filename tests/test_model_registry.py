@@ -0,0 +1,29 @@
+import threading
+import time
+
+from utils.model_registry import ModelRegistry
+from utils.stub_models import StubFaceNet, StubGenderModel
+
+
+def test_start_warmup_returns_during_a_slow_load():
+    loading = threading.Event()
+    release = threading.Event()
+
+    def slow_face_net():
+        loading.set()
+        release.wait(10)
+        return StubFaceNet()
+
+    registry = ModelRegistry(slow_face_net, StubGenderModel)
+    first = registry.start_warmup()
+    assert loading.wait(5)
+
+    # A readiness probe arriving mid-load gets its answer without waiting for the load
+    started = time.perf_counter()
+    assert registry.start_warmup() is first
+    assert not registry.status()['ready']
+    assert time.perf_counter() - started < 1.0
+
+    release.set()
+    first.join(10)
+    assert registry.ready and registry.warmed
@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+"""
+Microbenchmarks for each stage of the detection pipeline.
+
+Runs without the real model files: the face detector and gender model are
+replaced by deterministic stand-ins with the same input and output shapes
+(utils.stub_models), and images are synthesized at several resolutions.
+Results are written as JSON together with a machine fingerprint, and can
+be compared against an earlier run to catch regressions.
+
+Usage:
+    python tools/benchmark_stages.py --output bench.json
+    python tools/benchmark_stages.py --quick --filter decode
+    python tools/benchmark_stages.py --output new.json --baseline bench.json --fail-on-regression
+"""
+import argparse
+import gc
+import hashlib
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import config
+from utils.assets import manifest_path
+from utils.catalog_store import CatalogStore
+from utils.http_cache import ENCODINGS
+from utils.image_decode import decode_image
+from utils.image_processor import (
+    analyze_faces, classify_skin_tone, detect_faces, extract_face_region, postprocess_detections,
+    prepare_face_for_gender_prediction, prepare_faces_for_gender_prediction, render_face_image
+)
+from utils.skin_tone import classify_face_skin_tones
+from utils.stub_models import StubFaceNet, StubGenderModel, synthetic_image
+
+RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080), (4000, 3000)]
+QUICK_RESOLUTIONS = [(640, 480), (1920, 1080)]
+FACE_CROP_SIZES = [64, 160, 400]
+
+
+def machine_fingerprint():
+    """Describe the machine and library versions a run was made on."""
+    cpu_model = platform.processor()
+    try:
+        with open('/proc/cpuinfo', 'r') as file:
+            for line in file:
+                if line.startswith('model name'):
+                    cpu_model = line.split(':', 1)[1].strip()
+                    break
+    except OSError:
+        pass
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+
+    fingerprint = {
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_model': cpu_model,
+        'cpu_count': os.cpu_count(),
+        'python': f'{platform.python_implementation()} {platform.python_version()}',
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'opencv_threads': cv2.getNumThreads(),
+        'opencv_optimized': cv2.useOptimized(),
+    }
+    # Runs are comparable when these match; the commit is expected to differ
+    fingerprint['id'] = hashlib.sha1(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()[:12]
+    fingerprint['commit'] = commit
+    return fingerprint
+
+
+def measure(fn, min_time, repeats):
+    """
+    Time `fn()` the way timeit does: calibrate a loop count, then repeat.
+
+    Returns:
+        dict: Per-call times in microseconds and calls per second
+    """
+    fn()  # Warm caches and lazy initialization
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - started >= min_time / repeats or number >= 1 << 20:
+            break
+        number *= 2
+
+    samples = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            started = time.perf_counter()
+            for _ in range(number):
+                fn()
+            samples.append((time.perf_counter() - started) / number * 1e6)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    median = statistics.median(samples)
+    return {
+        'loops': number,
+        'repeats': repeats,
+        'min_us': min(samples),
+        'median_us': median,
+        'mean_us': statistics.fmean(samples),
+        'stdev_us': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'ops_per_second': 1e6 / median if median else None,
+    }
+
+
+def catalog_request(headers):
+    """A GET /get_clothing_styles request with the given headers, for Payload.response()."""
+    from werkzeug.test import EnvironBuilder
+    from werkzeug.wrappers import Request
+    return Request(EnvironBuilder(path='/get_clothing_styles', method='GET', headers=headers).get_environ())
+
+
+def build_cases(resolutions, work_dir):
+    """
+    List the benchmark cases.
+
+    Args:
+        resolutions (list): (width, height) of the synthetic images
+        work_dir (str): Scratch directory, e.g. for the compiled catalog
+
+    Returns:
+        list: (name, params, callable) tuples
+    """
+    cases = []
+    face_net = StubFaceNet(faces=1)
+    gender_model = StubGenderModel()
+
+    # Skin tone classification from a face's mean colour
+    colors = itertools.cycle([(r, g, b) for r in range(40, 256, 24) for g in range(30, 256, 24)
+                              for b in range(20, 256, 24)])
+    cases.append(('skin_tone.classify', {}, lambda: classify_skin_tone(next(colors))))
+
+    # Detector post-processing: thresholding, box scaling and NMS on the raw tensor
+    for faces in (1, 5):
+        net = StubFaceNet(faces=faces)
+        net.setInput(np.zeros((1, 3, 300, 300), dtype=np.float32))
+        detections = net.forward()
+        cases.append(('detection.postprocess', {'faces': faces}, lambda d=detections: postprocess_detections(
+            d, (1280, 720), config.FACE_DETECTION_CONFIDENCE, config.FACE_NMS_THRESHOLD, config.MAX_FACES)))
+
+    # Gender model input preparation
+    for size in FACE_CROP_SIZES:
+        crop = synthetic_image(size, size, seed=size)
+        cases.append(('gender.prepare_face', {'crop': size}, lambda c=crop: prepare_face_for_gender_prediction(c)))
+    crops = [synthetic_image(160, 160, seed=i) for i in range(8)]
+    cases.append(('gender.prepare_faces', {'crop': 160, 'batch': 8},
+                  lambda: prepare_faces_for_gender_prediction(crops)))
+
+    # Recommendations as the app serves them: the compiled catalog snapshot,
+    # with every group's response precompressed as after CATALOG_PRERENDER
+    snapshot = CatalogStore(config.CATALOG_SOURCE, os.path.join(work_dir, 'catalog.sqlite'), check_interval=None,
+                            manifest_path=manifest_path(config.ASSET_DIR),
+                            asset_url_prefix=config.ASSET_URL_PREFIX).current()
+    snapshot.precompress()
+    keys = itertools.cycle([(f'{tone} - Warm Undertone', gender) for tone, gender in sorted(snapshot.groups)])
+    cases.append(('recommendation.styles', {}, lambda: snapshot.styles(*next(keys))))
+    cases.append(('recommendation.styles_fragment', {}, lambda: snapshot.styles_fragment(*next(keys))))
+    for encoding in ('identity',) + ENCODINGS:
+        request = catalog_request({'Accept-Encoding': encoding})
+        cases.append(('recommendation.response', {'encoding': encoding},
+                      lambda r=request: snapshot.response_payload(*next(keys)).response(r)))
+    tone, gender = next(keys)
+    etag = snapshot.response_payload(tone, gender).etag()
+    revalidation = catalog_request({'If-None-Match': etag})
+    cases.append(('recommendation.not_modified', {},
+                  lambda: snapshot.response_payload(tone, gender).response(revalidation)))
+    cases.append(('recommendation.query', {'limit': 10}, lambda: snapshot.query(*next(keys), limit=10)))
+
+    for width, height in resolutions:
+        resolution = f'{width}x{height}'
+        frame = synthetic_image(width, height)
+        jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+        png = cv2.imencode('.png', frame)[1].tobytes()
+
+        # Upload decoding at the app's limits (reduced decode for large images)
+        for name, data in (('decode.jpeg', jpeg), ('decode.png', png)):
+            cases.append((name, {'resolution': resolution, 'bytes': len(data)}, lambda d=data: decode_image(
+                d, max_bytes=len(d), max_pixels=config.MAX_IMAGE_PIXELS,
+                target_pixels=config.DECODE_MAX_PIXELS)))
+
+        decoded = decode_image(jpeg, target_pixels=config.DECODE_MAX_PIXELS).frame
+        decoded_size = f'{decoded.shape[1]}x{decoded.shape[0]}'
+        boxes = [tuple(int(v) for v in box) for box in detect_faces(
+            decoded, face_net, config.FACE_DETECTION_CONFIDENCE, config.FACE_NMS_THRESHOLD, config.MAX_FACES)]
+
+        cases.append(('detection.detect_faces', {'resolution': decoded_size},
+                      lambda f=decoded: detect_faces(f, face_net, config.FACE_DETECTION_CONFIDENCE,
+                                                     config.FACE_NMS_THRESHOLD, config.MAX_FACES)))
+
+        region = extract_face_region(decoded, boxes[0])
+        cases.append(('skin_tone.face_region', {'resolution': decoded_size},
+                      lambda r=region: classify_face_skin_tones([r])))
+        regions = [region] * 8
+        cases.append(('skin_tone.face_regions', {'resolution': decoded_size, 'batch': 8},
+                      lambda r=regions: classify_face_skin_tones(r)))
+
+        # Response image encoding
+        for mode in ('full', 'thumbnail', 'crop'):
+            quality = config.THUMBNAIL_JPEG_QUALITY if mode == 'thumbnail' else config.JPEG_QUALITY
+            cases.append(('encode_image', {'resolution': decoded_size, 'mode': mode},
+                          lambda f=decoded, b=boxes, m=mode, q=quality: render_face_image(
+                              f, b, m, config.THUMBNAIL_MAX_EDGE, q)))
+
+        # Decode to recommendations-ready faces, with stub models
+        cases.append(('pipeline.analyze_faces', {'resolution': resolution},
+                      lambda d=jpeg: analyze_faces(
+                          decode_image(d, target_pixels=config.DECODE_MAX_PIXELS).frame, face_net,
+                          gender_model.predict_batch, config.FACE_DETECTION_CONFIDENCE,
+                          config.FACE_NMS_THRESHOLD, config.MAX_FACES, config.GENDER_PREDICTION_THRESHOLD)))
+    return cases
+
+
+def case_key(result):
+    params = ','.join(f'{k}={v}' for k, v in sorted(result['params'].items()) if k != 'bytes')
+    return f"{result['name']}[{params}]"
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare median times against a baseline run.
+
+    Returns:
+        list: Keys of cases that got slower by more than `threshold`
+    """
+    if baseline['machine']['id'] != results['machine']['id']:
+        print("⚠ Baseline was recorded on a different machine or library versions; "
+              "differences may not be regressions", file=sys.stderr)
+    previous = {case_key(result): result for result in baseline['results']}
+    regressions = []
+    print(f"\n{'case':<60} {'baseline':>12} {'current':>12} {'change':>8}")
+    for result in results['results']:
+        key = case_key(result)
+        if key not in previous:
+            continue
+        before = previous[key]['median_us']
+        after = result['median_us']
+        change = after / before - 1.0 if before else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(key)
+            flag = '  ✗ slower'
+        elif change < -threshold:
+            flag = '  ✓ faster'
+        print(f"{key:<60} {before:>10.1f}us {after:>10.1f}us {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--filter', help='Only run cases whose name contains this text')
+    parser.add_argument('--quick', action='store_true', help='Fewer resolutions and shorter timing')
+    parser.add_argument('--min-time', type=float, default=None,
+                        help='Seconds of measurement per case (default 1.0, 0.2 with --quick)')
+    parser.add_argument('--repeats', type=int, default=7)
+    parser.add_argument('--threads', type=int, default=None, help='OpenCV threads, default: OpenCV decides')
+    parser.add_argument('--baseline', help='Earlier JSON output to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Relative slowdown counted as regression')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 on regressions')
+    args = parser.parse_args()
+
+    if args.threads is not None:
+        cv2.setNumThreads(args.threads)
+    min_time = args.min_time if args.min_time is not None else (0.2 if args.quick else 1.0)
+
+    # Removed when the run exits
+    work_dir = tempfile.TemporaryDirectory(prefix='benchmark_stages-')
+    cases = build_cases(QUICK_RESOLUTIONS if args.quick else RESOLUTIONS, work_dir.name)
+    if args.filter:
+        cases = [case for case in cases if args.filter in case[0]]
+
+    results = {'machine': machine_fingerprint(), 'created': time.time(), 'min_time': min_time, 'results': []}
+    for name, params, fn in cases:
+        timing = measure(fn, min_time, args.repeats)
+        result = dict(name=name, params=params, **timing)
+        results['results'].append(result)
+        print(f"{case_key(result):<60} {timing['median_us']:>10.1f}us  ±{timing['stdev_us']:.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"✓ Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        if regressions:
+            print(f"✗ {len(regressions)} regression(s) above {args.threshold:.0%}")
+            if args.fail_on_regression:
+                sys.exit(1)
+        else:
+            print("✓ No regressions")
+
+
+if __name__ == '__main__':
+    main()
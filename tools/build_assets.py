@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Mirror the catalog's images locally with precomputed thumbnails.
+
+Reads every `img-url` of the clothing catalog, takes each image from
+--source-dir when a file with the URL's base name is there and downloads it
+otherwise, and stores the original plus thumbnails in several widths and
+formats under content-addressed names in the asset directory. The app
+serves them from config.ASSET_URL_PREFIX with immutable cache headers and
+adds an `image` entry to every mirrored style (the catalog reloads itself
+when the manifest changes).
+
+Re-running is incremental: only new images, changed source files and
+changed thumbnail settings are processed.
+
+Usage:
+    python tools/build_assets.py                                  # download
+    python tools/build_assets.py --source-dir fixtures/images --offline
+    python tools/build_assets.py --refresh --prune                # revalidate, drop unused files
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import config
+from utils.asset_pipeline import THUMBNAIL_ENCODERS, AssetBuilder
+from utils.assets import normalize_image_url
+
+
+def catalog_image_urls(path):
+    """Normalized image URLs of every style in a JSON catalog."""
+    with open(path, 'rb') as file:
+        catalog = json.load(file)
+    urls = set()
+    for by_gender in catalog.values():
+        for styles in by_gender.values():
+            for style in styles:
+                if isinstance(style, dict):
+                    urls.add(normalize_image_url(style.get('img-url')))
+    urls.discard('')
+    return urls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--catalog', default=config.CATALOG_SOURCE, help='JSON clothing catalog')
+    parser.add_argument('--output', default=config.ASSET_DIR, help='Asset directory')
+    parser.add_argument('--source-dir', help='Local images, matched to URLs by file name')
+    parser.add_argument('--offline', action='store_true', help='Never download; use --source-dir only')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Revalidate downloaded images with the origin (conditional requests)')
+    parser.add_argument('--prune', action='store_true', help='Delete files no catalog image uses anymore')
+    parser.add_argument('--widths', default=','.join(map(str, config.ASSET_THUMBNAIL_WIDTHS)),
+                        help='Thumbnail widths, comma separated')
+    parser.add_argument('--formats', default=','.join(config.ASSET_THUMBNAIL_FORMATS),
+                        help=f"Thumbnail formats: {', '.join(THUMBNAIL_ENCODERS)}")
+    parser.add_argument('--quality', type=int, default=config.ASSET_THUMBNAIL_QUALITY)
+    parser.add_argument('--workers', type=int, default=8, help='Images processed in parallel')
+    parser.add_argument('--verbose', action='store_true', help='Print every image')
+    args = parser.parse_args()
+
+    if args.offline and not args.source_dir:
+        print("⚠ Warning: --offline without --source-dir only keeps already mirrored images")
+    try:
+        urls = catalog_image_urls(args.catalog)
+    except (OSError, ValueError) as e:
+        sys.exit(f"✗ Could not read catalog {args.catalog}: {e}")
+
+    builder = AssetBuilder(
+        args.output,
+        widths=[int(width) for width in args.widths.split(',') if width],
+        formats=[fmt for fmt in args.formats.split(',') if fmt],
+        quality=args.quality,
+        source_dir=args.source_dir,
+        offline=args.offline,
+        timeout=config.ASSET_FETCH_TIMEOUT_SECONDS,
+        max_bytes=config.ASSET_MAX_BYTES
+    )
+
+    def progress(url, status, error):
+        if error is not None:
+            print(f"✗ {url}: {error}")
+        elif args.verbose:
+            print(f"  {status:<10} {url}")
+
+    print(f"{len(urls)} catalog images -> {args.output}")
+    started = time.perf_counter()
+    summary = builder.build(urls, refresh=args.refresh, workers=args.workers, prune=args.prune, progress=progress)
+    print(f"{'✓' if not summary['failed'] else '⚠'} {summary['fetched']} fetched, "
+          f"{summary['thumbnails']} re-thumbnailed, {summary['unchanged']} unchanged, "
+          f"{len(summary['failed'])} failed, {summary['removed']} files removed "
+          f"in {time.perf_counter() - started:.1f}s")
+    if summary['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+"""
+Run the face -> gender -> skin tone -> recommendation pipeline over many images.
+
+Images are split into small batches and fanned out to a process pool. Each
+worker loads the face detector and the gender model once, and looks up
+recommendations in the same compiled catalog the app serves. Results are
+appended to a CSV or JSONL file, and a checkpoint is written after every
+flush so an interrupted run resumes where it stopped. If a worker cannot
+load its models, the run stops with a non-zero exit code.
+
+Usage:
+    python tools/bulk_process.py photos/ --output results.jsonl --workers 8
+    python tools/bulk_process.py --file-list paths.txt --output results.csv
+"""
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import config
+
+CSV_FIELDS = ['path', 'error', 'width', 'height', 'face_count', 'gender', 'skin_tone',
+              'confidence', 'recommendation_count', 'recommended_items', 'faces']
+
+# Per-worker state, set up once by init_worker
+_worker = {}
+
+
+class WorkerInitError(Exception):
+    """A worker process could not load its models or the catalog."""
+
+
+def iter_image_paths(root, extensions):
+    """Yield image paths under root, recursively."""
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower().lstrip('.') in extensions:
+                    yield entry.path
+
+
+def init_worker(models_dir, backend, threads, catalog_source, catalog_db, asset_manifest):
+    """
+    Load the models and open the catalog once per worker process.
+
+    Errors are kept and raised by process_batch instead: an exception in a
+    pool initializer makes multiprocessing restart the worker forever.
+    """
+    try:
+        import cv2
+        cv2.setNumThreads(threads)
+        if backend == 'keras':
+            import tensorflow as tf
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+
+        from utils.catalog_store import CatalogStore
+        from utils.model_loader import load_face_detection_model, load_gender_model
+
+        _worker['face_net'] = load_face_detection_model(models_dir)
+        if _worker['face_net'] is None:
+            raise RuntimeError(f"Face detection model could not be loaded from {models_dir}")
+        _worker['gender_model'] = load_gender_model(models_dir, backend, model_file=config.GENDER_MODEL_FILE,
+                                                    num_threads=threads)
+        # Already compiled by the parent; a run uses one catalog version throughout
+        _worker['recommendations'] = CatalogStore(catalog_source, catalog_db, check_interval=None,
+                                                  manifest_path=asset_manifest,
+                                                  asset_url_prefix=config.ASSET_URL_PREFIX).current()
+    except Exception as e:
+        _worker['error'] = f"{type(e).__name__}: {e}"
+
+
+def process_batch(paths):
+    """Analyze a batch of image paths in a worker; returns one record per path."""
+    from utils.image_decode import decode_image
+    from utils.image_processor import analyze_faces_batch
+
+    if 'error' in _worker:
+        raise WorkerInitError(_worker['error'])
+
+    records = {}
+    decoded_items = []
+    for path in paths:
+        try:
+            with open(path, 'rb') as file:
+                data = file.read(config.MAX_FILE_SIZE + 1)
+            decoded_items.append((path, decode_image(
+                data,
+                max_bytes=config.MAX_FILE_SIZE,
+                max_pixels=config.MAX_IMAGE_PIXELS,
+                target_pixels=config.DECODE_MAX_PIXELS
+            )))
+        except Exception as e:
+            records[path] = {'path': path, 'error': str(e)}
+
+    gender_model = _worker['gender_model']
+    try:
+        faces_per_image = analyze_faces_batch(
+            [decoded.frame for _, decoded in decoded_items],
+            _worker['face_net'],
+            gender_model.predict_batch if gender_model is not None else None,
+            confidence_threshold=config.FACE_DETECTION_CONFIDENCE,
+            nms_threshold=config.FACE_NMS_THRESHOLD,
+            top_k=config.MAX_FACES,
+            gender_threshold=config.GENDER_PREDICTION_THRESHOLD
+        )
+    except Exception as e:
+        for path, _ in decoded_items:
+            records[path] = {'path': path, 'error': str(e)}
+        faces_per_image = []
+
+    for (path, decoded), faces in zip(decoded_items, faces_per_image):
+        width, height = decoded.original_size
+        record = {'path': path, 'width': width, 'height': height, 'face_count': len(faces)}
+        for face in faces:
+            x, y, w, h = decoded.to_original(face['box'])
+            face['box'] = {'x': x, 'y': y, 'w': w, 'h': h}
+        if faces:
+            primary = faces[0]
+            styles = _worker['recommendations'].styles(primary['skin_tone'], primary['gender'], default=[])
+            record.update({
+                'gender': primary['gender'],
+                'skin_tone': primary['skin_tone'],
+                'confidence': primary['confidence'],
+                'recommendation_count': len(styles),
+                'recommended_items': [style.get('item') for style in styles],
+            })
+        else:
+            record['error'] = 'No face detected'
+        record['faces'] = faces
+        records[path] = record
+
+    return [records[path] for path in paths]
+
+
+class ResultWriter:
+    """Append records to CSV/JSONL with a checkpoint of the last durable offset."""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.checkpoint_path = output_path + '.checkpoint'
+        self.is_csv = output_path.lower().endswith('.csv')
+        self.done = set()
+        self.count = 0
+
+        offset = self._load_checkpoint()
+        self.file = open(output_path, 'a+', newline='' if self.is_csv else None, encoding='utf-8')
+        # Drop anything written after the last checkpoint, e.g. a half-written line
+        self.file.truncate(offset)
+        self.file.seek(0)
+        self._read_done_paths()
+        self.file.seek(offset)
+        if self.is_csv:
+            self.csv = csv.DictWriter(self.file, fieldnames=CSV_FIELDS, extrasaction='ignore')
+            if offset == 0:
+                self.csv.writeheader()
+
+    def _load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            if os.path.exists(self.output_path) and os.path.getsize(self.output_path) > 0:
+                raise SystemExit(f"{self.output_path} exists but has no checkpoint; "
+                                 f"remove it or choose another output file")
+            return 0
+        try:
+            with open(self.checkpoint_path, 'r') as file:
+                checkpoint = json.load(file)
+            return min(checkpoint['offset'], os.path.getsize(self.output_path))
+        except (OSError, ValueError, KeyError):
+            return 0
+
+    def _read_done_paths(self):
+        if self.is_csv:
+            rows = csv.DictReader(self.file)
+            self.done = {row['path'] for row in rows if row.get('path')}
+        else:
+            self.done = {json.loads(line)['path'] for line in self.file if line.strip()}
+
+    def write(self, record):
+        if self.is_csv:
+            row = dict(record)
+            row['recommended_items'] = '|'.join(item or '' for item in record.get('recommended_items', []))
+            row['faces'] = json.dumps(record.get('faces', []))
+            self.csv.writerow(row)
+        else:
+            self.file.write(json.dumps(record) + '\n')
+        self.count += 1
+
+    def checkpoint(self):
+        """Flush to disk and atomically record the durable output size."""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        temp_path = self.checkpoint_path + '.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump({'offset': self.file.tell(), 'records': len(self.done) + self.count}, file)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def close(self):
+        self.checkpoint()
+        self.file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory', nargs='?', help='Directory to scan for images')
+    parser.add_argument('--file-list', help='Text file with one image path per line')
+    parser.add_argument('--output', required=True, help='Output file (.csv or .jsonl)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--threads-per-worker', type=int, default=1,
+                        help='OpenCV/TensorFlow threads in each worker')
+    parser.add_argument('--batch-size', type=int, default=16, help='Images per worker task')
+    parser.add_argument('--flush-every', type=int, default=500, help='Records between checkpoints')
+    parser.add_argument('--models-dir', default=config.MODELS_DIR)
+    parser.add_argument('--catalog', default=config.CATALOG_SOURCE, help='JSON clothing catalog')
+    parser.add_argument('--backend', default=config.GENDER_MODEL_BACKEND,
+                        help="Gender model runtime: 'keras', 'tflite', 'onnx' or 'opencv'")
+    args = parser.parse_args()
+
+    if bool(args.directory) == bool(args.file_list):
+        parser.error('give either a directory or --file-list')
+
+    if args.file_list:
+        with io.open(args.file_list, 'r', encoding='utf-8') as file:
+            paths = [line.strip() for line in file if line.strip()]
+    else:
+        paths = sorted(iter_image_paths(args.directory, config.ALLOWED_EXTENSIONS))
+
+    # Compile the catalog once here, so the workers only open it
+    from utils.assets import manifest_path
+    from utils.catalog_store import CatalogStore
+    asset_manifest = manifest_path(config.ASSET_DIR)
+    try:
+        catalog = CatalogStore(args.catalog, config.CATALOG_DB, check_interval=None, manifest_path=asset_manifest,
+                               asset_url_prefix=config.ASSET_URL_PREFIX)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        sys.exit(f"✗ Could not load catalog {args.catalog}: {e}")
+
+    writer = ResultWriter(args.output)
+    pending = [path for path in paths if path not in writer.done]
+    print(f"{len(paths)} images, {len(paths) - len(pending)} already processed, "
+          f"{len(pending)} to go with {args.workers} workers", file=sys.stderr)
+    if not pending:
+        writer.close()
+        return
+
+    batches = [pending[i:i + args.batch_size] for i in range(0, len(pending), args.batch_size)]
+    started = time.perf_counter()
+    errors = 0
+    since_checkpoint = 0
+    initargs = (args.models_dir, args.backend, args.threads_per_worker,
+                catalog.source_path, catalog.db_path, asset_manifest)
+
+    with multiprocessing.Pool(args.workers, initializer=init_worker, initargs=initargs) as pool:
+        try:
+            for records in pool.imap_unordered(process_batch, batches):
+                for record in records:
+                    writer.write(record)
+                    if record.get('error') not in (None, 'No face detected'):
+                        errors += 1
+                since_checkpoint += len(records)
+                if since_checkpoint >= args.flush_every:
+                    writer.checkpoint()
+                    since_checkpoint = 0
+
+                elapsed = time.perf_counter() - started
+                print(f"\r{writer.count}/{len(pending)} images  "
+                      f"{writer.count / elapsed:.1f} img/s  errors={errors}", end='', file=sys.stderr)
+        except WorkerInitError as e:
+            sys.exit(f"\n✗ Worker could not start: {e}")
+        finally:
+            writer.close()
+
+    print(f"\nDone: {writer.count} images in {time.perf_counter() - started:.1f}s -> {args.output}",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+"""
+Compare gender model runtimes against the Keras baseline.
+
+Optionally exports the `.h5` model to TFLite (float32, float16, int8) and
+ONNX, then runs every backend over a sample set of face crops and reports
+label agreement with Keras, output drift, load time and latency.
+
+Usage:
+    python tools/compare_gender_backends.py --samples path/to/faces --export
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import config
+from utils.gender_backends import (
+    GENDER_MODEL_INPUT_SIZE, create_backend, export_onnx, export_tflite, find_model_file
+)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def load_samples(samples_dir, limit):
+    """Load face crops as a prepared (N, 128, 128, 3) float32 batch."""
+    faces = []
+    for name in sorted(os.listdir(samples_dir)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        image = cv2.imread(os.path.join(samples_dir, name), cv2.IMREAD_COLOR)
+        if image is None:
+            continue
+        faces.append(cv2.resize(image, GENDER_MODEL_INPUT_SIZE).astype(np.float32) / 255.0)
+        if limit and len(faces) >= limit:
+            break
+    if not faces:
+        raise SystemExit(f"No readable images found in {samples_dir}")
+    return np.stack(faces)
+
+
+def export_artifacts(models_dir, keras_path, samples):
+    """Write the TFLite and ONNX variants next to the Keras model."""
+    stem = os.path.join(models_dir, 'Gender_Prediction_model')
+    exports = [
+        (f'{stem}.tflite', lambda path: export_tflite(keras_path, path)),
+        (f'{stem}_float16.tflite', lambda path: export_tflite(keras_path, path, 'float16')),
+        (f'{stem}_int8.tflite', lambda path: export_tflite(keras_path, path, 'int8', samples[:200])),
+        (f'{stem}.onnx', lambda path: export_onnx(keras_path, path)),
+    ]
+    for path, export in exports:
+        try:
+            export(path)
+            print(f"✓ Exported {os.path.basename(path)} ({os.path.getsize(path) / 1e6:.1f} MB)")
+        except Exception as e:
+            print(f"✗ Could not export {os.path.basename(path)}: {e}")
+
+
+def time_predictions(model, samples, batch_size, repeats):
+    """Run the sample set through a backend and collect per-call latency."""
+    outputs = []
+    latencies = []
+    for _ in range(repeats):
+        outputs = []
+        for start in range(0, len(samples), batch_size):
+            batch = samples[start:start + batch_size]
+            began = time.perf_counter()
+            outputs.append(np.asarray(model.predict_batch(batch)).reshape(len(batch), -1))
+            latencies.append((time.perf_counter() - began) * 1000.0)
+    return np.concatenate(outputs), np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', required=True, help='Directory of face crop images')
+    parser.add_argument('--models-dir', default=config.MODELS_DIR)
+    parser.add_argument('--limit', type=int, default=500, help='Maximum number of samples')
+    parser.add_argument('--batch-sizes', default='1,16', help='Comma separated batch sizes to time')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=None, help='CPU threads for tflite/onnx')
+    parser.add_argument('--export', action='store_true', help='Export TFLite/ONNX variants first')
+    parser.add_argument('--json', help='Also write the report to this JSON file')
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples, args.limit)
+    keras_path = find_model_file(args.models_dir, 'keras')
+    if keras_path is None:
+        raise SystemExit(f"No Keras gender model found in {args.models_dir}")
+    if args.export:
+        export_artifacts(args.models_dir, keras_path, samples)
+
+    stem = os.path.join(args.models_dir, 'Gender_Prediction_model')
+    candidates = [
+        ('keras', 'keras', keras_path),
+        ('tflite', 'tflite', f'{stem}.tflite'),
+        ('tflite-float16', 'tflite', f'{stem}_float16.tflite'),
+        ('tflite-int8', 'tflite', f'{stem}_int8.tflite'),
+        ('onnx', 'onnx', f'{stem}.onnx'),
+        ('opencv', 'opencv', f'{stem}.onnx'),
+    ]
+    batch_sizes = [int(b) for b in args.batch_sizes.split(',')]
+    threshold = config.GENDER_PREDICTION_THRESHOLD
+
+    baseline = None
+    report = []
+    for label, backend, path in candidates:
+        if not os.path.exists(path):
+            continue
+        try:
+            began = time.perf_counter()
+            model = create_backend(backend, path, num_threads=args.threads)
+            load_ms = (time.perf_counter() - began) * 1000.0
+            model.predict_batch(samples[:1])  # warm up
+        except Exception as e:
+            if label == 'keras':
+                # Every agreement figure is measured against it
+                raise SystemExit(f"✗ Keras baseline could not be loaded: {e}")
+            print(f"✗ Skipping {label}: {e}")
+            continue
+
+        row = {'backend': label, 'file': os.path.basename(path), 'load_ms': load_ms, 'latency_ms': {}}
+        outputs = None
+        for batch_size in batch_sizes:
+            outputs, latencies = time_predictions(model, samples, batch_size, args.repeats)
+            row['latency_ms'][batch_size] = {
+                'p50': float(np.percentile(latencies, 50)),
+                'p95': float(np.percentile(latencies, 95)),
+                'per_face': float(latencies.sum() / (len(samples) * args.repeats)),
+            }
+
+        scores = outputs[:, 0]
+        if baseline is None:
+            baseline, baseline_label = scores, label
+        row['agreement'] = float(np.mean((scores > threshold) == (baseline > threshold)))
+        row['max_abs_diff'] = float(np.max(np.abs(scores - baseline)))
+        report.append(row)
+
+    print(f"\n{len(samples)} samples, threshold {threshold}, agreement and max diff vs {baseline_label}\n")
+    header = f"{'backend':<16}{'load ms':>10}{'agree':>9}{'max diff':>10}"
+    header += ''.join(f"{f'b{b} p50':>11}{f'b{b} /face':>11}" for b in batch_sizes)
+    print(header)
+    print('-' * len(header))
+    for row in report:
+        line = f"{row['backend']:<16}{row['load_ms']:>10.0f}{row['agreement']:>9.2%}{row['max_abs_diff']:>10.4f}"
+        for batch_size in batch_sizes:
+            latency = row['latency_ms'][batch_size]
+            line += f"{latency['p50']:>11.2f}{latency['per_face']:>11.2f}"
+        print(line)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'samples': len(samples), 'threshold': threshold, 'baseline': baseline_label,
+                       'backends': report}, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
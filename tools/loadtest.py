@@ -0,0 +1,486 @@
+#!/usr/bin/env python
+"""
+End-to-end HTTP load test of the Flask app.
+
+Starts the app locally (with deterministic stub models by default, or the
+real ones with --real-models) or targets a running server with --url, then
+replays a corpus of images against the detection endpoints. Each load level
+runs for a fixed duration, either as closed-loop concurrency (N clients
+sending back to back) or at a fixed open-loop request rate. For open-loop
+runs latency is measured from the scheduled send time, so a saturated
+server shows up as growing latency instead of a silently lower rate.
+
+The launched app runs with its result cache disabled, so every detection
+request runs inference; with only --corpus-size distinct images, the cache
+would otherwise answer almost everything and the curves would measure the
+cache. Pass --with-cache to measure the cached path instead.
+
+Reports p50/p95/p99 latency, error rate, achieved requests per second and
+the server's result cache hit ratio per endpoint and level as a console
+table, JSON and/or HTML.
+
+Usage:
+    python tools/loadtest.py --concurrency 1,4,16,64,256 --duration 15 --html report.html
+    python tools/loadtest.py --rates 10,25,50 --endpoints upload_image --output report.json
+    python tools/loadtest.py --url http://10.0.0.5:5000 --images photos/ --concurrency 8,32
+    python tools/loadtest.py --with-cache --concurrency 16      # repeated images, cached results
+"""
+import argparse
+import base64
+import html
+import itertools
+import json
+import os
+import queue
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+
+import cv2
+import numpy as np
+import requests
+
+# Add src directory to path
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+ENDPOINTS = ('detect_face', 'upload_image', 'generate_clothing_styles_json')
+DEFAULT_CONCURRENCY = '1,2,4,8,16,32,64,128,256'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def load_corpus(images_dir, limit, resolution):
+    """
+    Load JPEG/PNG bytes to replay, or synthesize stub-friendly images.
+
+    Returns:
+        list: (filename, bytes, mimetype) tuples
+    """
+    if images_dir:
+        corpus = []
+        for name in sorted(os.listdir(images_dir)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                with open(os.path.join(images_dir, name), 'rb') as file:
+                    mimetype = 'image/png' if name.lower().endswith('.png') else 'image/jpeg'
+                    corpus.append((name, file.read(), mimetype))
+            if len(corpus) >= limit:
+                break
+        if not corpus:
+            raise SystemExit(f"No images found in {images_dir}")
+        return corpus
+
+    from utils.stub_models import synthetic_image
+    width, height = resolution
+    return [(f'synthetic_{seed}.jpg',
+             cv2.imencode('.jpg', synthetic_image(width, height, seed=seed))[1].tobytes(),
+             'image/jpeg') for seed in range(limit)]
+
+
+def build_requests(corpus):
+    """
+    Pre-encode request bodies so the client spends its time waiting, not encoding.
+
+    Returns:
+        dict: endpoint -> list of (path, body, headers)
+    """
+    detect_face, upload_image = [], []
+    for name, data, mimetype in corpus:
+        data_url = f'data:{mimetype};base64,' + base64.b64encode(data).decode('ascii')
+        detect_face.append(('/detect_face', urllib.parse.urlencode({'image': data_url}).encode('ascii'),
+                            {'Content-Type': 'application/x-www-form-urlencoded'}))
+
+        boundary = uuid.uuid4().hex
+        body = b''.join([
+            f'--{boundary}\r\n'.encode(),
+            f'Content-Disposition: form-data; name="image"; filename="{name}"\r\n'.encode(),
+            f'Content-Type: {mimetype}\r\n\r\n'.encode(),
+            data,
+            f'\r\n--{boundary}--\r\n'.encode(),
+        ])
+        upload_image.append(('/upload_image', body,
+                             {'Content-Type': f'multipart/form-data; boundary={boundary}'}))
+    return {
+        'detect_face': detect_face,
+        'upload_image': upload_image,
+        # The export reads the last detection from the session, see Client.prime()
+        'generate_clothing_styles_json': [('/generate_clothing_styles_json', None, {})],
+    }
+
+
+class Client:
+    """One HTTP connection (and cookie session) replaying requests for an endpoint."""
+
+    def __init__(self, base_url, endpoint, request_bodies, timeout):
+        self.base_url = base_url
+        self.endpoint = endpoint
+        self.session = requests.Session()
+        self.timeout = timeout
+        self._requests = itertools.cycle(request_bodies[endpoint])
+        self._prime_request = request_bodies['upload_image'][0]
+
+    def prime(self):
+        # Give the session a detected gender and skin tone for the export endpoint
+        if self.endpoint == 'generate_clothing_styles_json':
+            self._send(self._prime_request)
+
+    def _send(self, prepared):
+        path, body, headers = prepared
+        url = self.base_url + path
+        if body is None:
+            return self.session.get(url, headers=headers, timeout=self.timeout)
+        return self.session.post(url, data=body, headers=headers, timeout=self.timeout)
+
+    def request(self):
+        """
+        Send the next request.
+
+        Returns:
+            tuple: (status code or None, error text or None)
+        """
+        try:
+            response = self._send(next(self._requests))
+            response.content  # Read the whole body
+        except requests.RequestException as e:
+            return None, type(e).__name__
+        if response.status_code != 200:
+            return response.status_code, f'HTTP {response.status_code}'
+        return 200, None
+
+    def close(self):
+        self.session.close()
+
+
+class Recorder:
+    """Collect (sent, latency, status, error) samples from many threads."""
+
+    def __init__(self):
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def add(self, sent, latency, status, error):
+        with self._lock:
+            self.samples.append((sent, latency, status, error))
+
+
+def run_closed_loop(make_client, concurrency, duration, warmup):
+    """Run `concurrency` clients back to back; returns the samples in the measured window."""
+    recorder = Recorder()
+    start = time.perf_counter()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    def worker():
+        client = make_client()
+        try:
+            client.prime()
+            while True:
+                sent = time.perf_counter()
+                if sent >= stop_at:
+                    return
+                status, error = client.request()
+                if sent >= measure_from:
+                    recorder.add(sent, time.perf_counter() - sent, status, error)
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.samples, measure_from, stop_at
+
+
+def run_open_loop(make_client, rate, duration, warmup, max_inflight):
+    """Send at a fixed rate regardless of responses; latency counts from the scheduled time."""
+    recorder = Recorder()
+    schedule = queue.Queue()
+    start = time.perf_counter() + 0.5  # Time for the workers to connect and prime
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    def worker():
+        client = make_client()
+        try:
+            client.prime()
+            while True:
+                scheduled = schedule.get()
+                if scheduled is None:
+                    return
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                status, error = client.request()
+                if scheduled >= measure_from:
+                    recorder.add(scheduled, time.perf_counter() - scheduled, status, error)
+        finally:
+            client.close()
+
+    workers = min(max_inflight, max(1, int(rate * 2)))
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    interval = 1.0 / rate
+    for i in itertools.count():
+        scheduled = start + i * interval
+        if scheduled >= stop_at:
+            break
+        schedule.put(scheduled)
+    for _ in threads:
+        schedule.put(None)
+    for thread in threads:
+        thread.join()
+    return recorder.samples, measure_from, stop_at
+
+
+def summarize(samples, window_start, window_end):
+    """Latency percentiles, error rate and throughput of one level."""
+    errors = {}
+    latencies = []
+    for sent, latency, status, error in samples:
+        latencies.append(latency)
+        if error is not None:
+            errors[error] = errors.get(error, 0) + 1
+    total = len(samples)
+    failed = sum(errors.values())
+    # Throughput counts successful responses completed inside the window
+    completed = sum(1 for sent, latency, status, error in samples
+                    if error is None and sent + latency <= window_end)
+    elapsed = window_end - window_start
+    summary = {
+        'requests': total,
+        'errors': failed,
+        'error_rate': failed / total if total else 0.0,
+        'error_kinds': errors,
+        'achieved_rps': completed / elapsed if elapsed > 0 else 0.0,
+    }
+    if latencies:
+        values = np.array(latencies) * 1000.0
+        summary.update({
+            'mean_ms': float(values.mean()),
+            'p50_ms': float(np.percentile(values, 50)),
+            'p95_ms': float(np.percentile(values, 95)),
+            'p99_ms': float(np.percentile(values, 99)),
+            'max_ms': float(values.max()),
+        })
+    return summary
+
+
+def result_cache_counters(base_url):
+    """
+    Read the server's result cache counters from /inference_stats.
+
+    Returns:
+        tuple: (hits, misses), or None if the cache is disabled or the server does not report it
+    """
+    try:
+        stats = requests.get(base_url + '/inference_stats', timeout=5).json().get('result_cache')
+    except (requests.RequestException, ValueError):
+        return None
+    if not stats:
+        return None
+    return stats['hits'], stats['misses']
+
+
+def cache_hit_ratio(before, after):
+    """Hit ratio between two result_cache_counters() readings, None if unknown or no lookups."""
+    if before is None or after is None:
+        return None
+    hits, misses = after[0] - before[0], after[1] - before[1]
+    return hits / (hits + misses) if hits + misses > 0 else None
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def launch_server(port, real_models, log_path, with_cache=False):
+    """
+    Start the app in a subprocess and wait until /readyz reports ready.
+
+    Returns:
+        subprocess.Popen: The server process
+    """
+    command = [sys.executable, os.path.abspath(__file__), '--serve', '--port', str(port)]
+    if real_models:
+        command.append('--real-models')
+    if with_cache:
+        command.append('--with-cache')
+    log = open(log_path, 'ab')
+    process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+    log.close()
+
+    deadline = time.time() + 120
+    url = f'http://127.0.0.1:{port}/readyz'
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"✗ Server exited with status {process.returncode}; see {log_path}")
+        try:
+            if requests.get(url, timeout=2).status_code == 200:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    process.terminate()
+    raise SystemExit(f"✗ Server did not become ready within 120s; see {log_path}")
+
+
+def serve(port, real_models, with_cache=False):
+    """Run the app with the threaded development server (used by launch_server)."""
+    import config
+    config.USE_STUB_MODELS = not real_models
+    config.RESULT_CACHE_ENABLED = with_cache
+    from app import app, models
+    config.ensure_directories()
+    models.warmup()
+    app.run(host='127.0.0.1', port=port, threaded=True, debug=False, use_reloader=False)
+
+
+def render_html(report):
+    """Render the report as a standalone HTML table."""
+    columns = ['endpoint', 'mode', 'level', 'requests', 'achieved_rps', 'p50_ms', 'p95_ms', 'p99_ms',
+               'max_ms', 'error_rate', 'cache_hit_ratio']
+    rows = []
+    for result in report['results']:
+        cells = []
+        for column in columns:
+            value = result.get(column, '')
+            if column in ('error_rate', 'cache_hit_ratio') and value is not None:
+                value = f'{value:.2%}'
+            elif value is None:
+                value = '-'
+            elif isinstance(value, float):
+                value = f'{value:.1f}'
+            cells.append(f'<td>{html.escape(str(value))}</td>')
+        style = ' class="bad"' if result.get('error_rate', 0) > 0.01 else ''
+        rows.append(f'<tr{style}>{"".join(cells)}</tr>')
+    header = ''.join(f'<th>{html.escape(column)}</th>' for column in columns)
+    settings = html.escape(json.dumps(report['settings'], indent=2))
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Load test report</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 10px; text-align: right; }}
+th {{ background: #f0f0f0; }}
+tr.bad td {{ background: #fde2e2; }}
+</style></head><body>
+<h1>Load test report</h1>
+<table><tr>{header}</tr>
+{chr(10).join(rows)}
+</table>
+<h2>Settings</h2><pre>{settings}</pre>
+</body></html>
+"""
+
+
+def parse_levels(text):
+    return [float(value) if '.' in value else int(value) for value in text.split(',') if value.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Test a running server instead of launching one')
+    parser.add_argument('--real-models', action='store_true', help='Launch the app with the real model files')
+    parser.add_argument('--with-cache', action='store_true',
+                        help='Keep the result cache of the launched app enabled (repeated images skip inference)')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS[:2]),
+                        help=f"Comma-separated, from: {', '.join(ENDPOINTS)}")
+    parser.add_argument('--concurrency', help=f'Closed-loop client counts (default {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--rates', help='Open-loop request rates per second, instead of --concurrency')
+    parser.add_argument('--max-inflight', type=int, default=256, help='Open-loop client threads limit')
+    parser.add_argument('--duration', type=float, default=10.0, help='Measured seconds per level')
+    parser.add_argument('--warmup', type=float, default=2.0, help='Unmeasured seconds before each level')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Per-request timeout in seconds')
+    parser.add_argument('--images', help='Directory of JPEG/PNG images to replay (default: synthetic)')
+    parser.add_argument('--corpus-size', type=int, default=16)
+    parser.add_argument('--resolution', default='1280x720', help='Size of synthetic images')
+    parser.add_argument('--output', help='Write the report as JSON')
+    parser.add_argument('--html', help='Write the report as an HTML table')
+    parser.add_argument('--server-log', default=os.devnull, help='Where the launched server logs to')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.real_models, args.with_cache)
+        return
+
+    endpoints = [endpoint.strip() for endpoint in args.endpoints.split(',') if endpoint.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoint(s): {', '.join(sorted(unknown))}")
+    if args.rates and args.concurrency:
+        parser.error('give either --concurrency or --rates')
+    mode = 'rate' if args.rates else 'concurrency'
+    levels = parse_levels(args.rates or args.concurrency or DEFAULT_CONCURRENCY)
+
+    width, height = (int(value) for value in args.resolution.lower().split('x'))
+    request_bodies = build_requests(load_corpus(args.images, args.corpus_size, (width, height)))
+
+    process = None
+    base_url = args.url.rstrip('/') if args.url else None
+    if base_url is None:
+        port = free_port()
+        print(f"Starting app on port {port} with {'real' if args.real_models else 'stub'} models...",
+              file=sys.stderr)
+        process = launch_server(port, args.real_models, args.server_log, args.with_cache)
+        base_url = f'http://127.0.0.1:{port}'
+
+    report = {
+        'settings': {
+            'url': base_url, 'mode': mode, 'levels': levels, 'endpoints': endpoints,
+            'duration': args.duration, 'warmup': args.warmup,
+            'models': 'external' if args.url else ('real' if args.real_models else 'stub'),
+            'corpus': args.images or f'synthetic {args.resolution} x{args.corpus_size}',
+            'result_cache': 'external' if args.url else args.with_cache,
+            'client_cpus': os.cpu_count(),
+        },
+        'results': [],
+    }
+    print(f"\n{'endpoint':<32} {mode:>11} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>7} "
+          f"{'cached':>7}")
+    try:
+        for endpoint in endpoints:
+            def make_client(endpoint=endpoint):
+                return Client(base_url, endpoint, request_bodies, args.timeout)
+
+            for level in levels:
+                # Counted over the whole level, warmup included
+                counters = result_cache_counters(base_url)
+                if mode == 'rate':
+                    samples, start, end = run_open_loop(make_client, level, args.duration, args.warmup,
+                                                        args.max_inflight)
+                else:
+                    samples, start, end = run_closed_loop(make_client, level, args.duration, args.warmup)
+                result = dict(endpoint=endpoint, mode=mode, level=level, **summarize(samples, start, end))
+                result['cache_hit_ratio'] = cache_hit_ratio(counters, result_cache_counters(base_url))
+                report['results'].append(result)
+                hit_ratio = result['cache_hit_ratio']
+                print(f"{endpoint:<32} {level:>11} {result['achieved_rps']:>8.1f} "
+                      f"{result.get('p50_ms', 0):>6.1f}ms {result.get('p95_ms', 0):>6.1f}ms "
+                      f"{result.get('p99_ms', 0):>6.1f}ms {result['error_rate']:>7.1%} "
+                      f"{'-' if hit_ratio is None else f'{hit_ratio:.0%}':>7}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"✓ JSON report written to {args.output}")
+    if args.html:
+        with open(args.html, 'w') as file:
+            file.write(render_html(report))
+        print(f"✓ HTML report written to {args.html}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Real-time face, gender and skin tone analysis on a webcam or video file.
+
+Capture, analysis and display run on separate threads connected by
+single-slot queues, so when analysis is slower than the camera stale frames
+are dropped instead of queued and latency stays bounded. The face detector
+runs every --detect-every frames (or earlier when tracking confidence
+drops); in between, faces are followed by template matching. Gender is
+predicted in one batch per detection frame and smoothed per face.
+
+Usage:
+    python tools/realtime.py                          # webcam 0, with a window
+    python tools/realtime.py --source clip.mp4 --headless --report stats.json
+    python tools/realtime.py --source clip.mp4 --headless --stub-models --detect-every 1
+"""
+import argparse
+import json
+import os
+import sys
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import config
+from utils.realtime import RealtimeEngine, RealtimePipeline
+
+
+def load_models(stub_models):
+    if stub_models:
+        from utils.stub_models import StubFaceNet, StubGenderModel
+        return (StubFaceNet(latency_ms=config.STUB_FACE_LATENCY_MS),
+                StubGenderModel(config.STUB_GENDER_LATENCY_MS, config.STUB_GENDER_PER_ITEM_MS))
+
+    from utils.model_loader import load_face_detection_model, load_gender_model
+    face_net = load_face_detection_model(config.MODELS_DIR)
+    if face_net is None:
+        raise SystemExit("✗ Face detection model is required")
+    gender_model = load_gender_model(config.MODELS_DIR, config.GENDER_MODEL_BACKEND,
+                                     model_file=config.GENDER_MODEL_FILE,
+                                     num_threads=config.GENDER_MODEL_THREADS)
+    if gender_model is None:
+        print("⚠ Warning: Gender model not available, gender will be 'Unknown'")
+    return face_net, gender_model
+
+
+def parse_source(value):
+    return int(value) if value.isdigit() else value
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Real-time face analysis on a webcam or video file')
+    parser.add_argument('--source', default='0', help='Camera index or video file (default: 0)')
+    parser.add_argument('--headless', action='store_true', help='Do not open a window')
+    parser.add_argument('--detect-every', type=int, default=config.REALTIME_DETECT_EVERY,
+                        help='Run the face detector at least every K frames')
+    parser.add_argument('--min-track-score', type=float, default=config.REALTIME_MIN_TRACK_SCORE,
+                        help='Tracking confidence that triggers an early detection')
+    parser.add_argument('--smoothing', type=float, default=config.REALTIME_SMOOTHING,
+                        help='Weight of the newest observation per face (0-1)')
+    parser.add_argument('--pace', action='store_true',
+                        help='Read video files at their native frame rate and drop stale frames')
+    parser.add_argument('--max-frames', type=int, help='Stop after this many frames')
+    parser.add_argument('--stub-models', action='store_true',
+                        help='Use deterministic stand-in models (no model files needed)')
+    parser.add_argument('--verbose', action='store_true', help='Print the faces of every frame')
+    parser.add_argument('--report', help='Write statistics as JSON to this file')
+    args = parser.parse_args()
+
+    face_net, gender_model = load_models(args.stub_models)
+    engine = RealtimeEngine(
+        face_net,
+        gender_model.predict_batch if gender_model is not None else None,
+        detect_every=args.detect_every,
+        min_track_score=args.min_track_score,
+        confidence_threshold=config.FACE_DETECTION_CONFIDENCE,
+        nms_threshold=config.FACE_NMS_THRESHOLD,
+        max_faces=config.MAX_FACES,
+        gender_threshold=config.GENDER_PREDICTION_THRESHOLD,
+        smoothing=args.smoothing
+    )
+    pipeline = RealtimePipeline(engine, parse_source(args.source), pace=args.pace, max_frames=args.max_frames)
+
+    def on_result(index, frame, faces):
+        if args.verbose:
+            summary = ', '.join(f"#{face['id']} {face['gender']} {face['skin_tone']}" for face in faces)
+            print(f"frame {index:5d}: {summary or 'no faces'}")
+
+    try:
+        stats = pipeline.run(on_result=on_result, display=not args.headless)
+    except RuntimeError as e:
+        raise SystemExit(f"✗ {e}")
+    except KeyboardInterrupt:
+        pipeline.stop()
+        return
+
+    print(f"✓ {stats['frames_processed']} of {stats['frames_captured']} frames analyzed "
+          f"({stats['frames_dropped']} dropped) at {stats['fps']:.1f} fps")
+    print(f"  detector ran on {stats['detections']} frames; "
+          f"latency p50 {stats['latency_p50_ms']:.1f} ms, p95 {stats['latency_p95_ms']:.1f} ms")
+    if args.report:
+        with open(args.report, 'w') as file:
+            json.dump(stats, file, indent=2)
+        print(f"✓ Report written to {args.report}")
+
+
+if __name__ == '__main__':
+    main()